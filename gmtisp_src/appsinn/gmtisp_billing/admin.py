@@ -10,7 +10,11 @@ from swapper import load_model
 
 Organization = load_model('openwisp_users', 'Organization')
 from openwisp_users.multitenancy import MultitenantOrgFilter, MultitenantAdminMixin
-from openwisp_utils.mixins import SuperuserPermissionMixin, OrganizationDbAdminMixin
+from openwisp_utils.mixins import (
+    OrganizationDbAdminMixin,
+    ReplicaChangelistMixin,
+    SuperuserPermissionMixin,
+)
 from .signals import account_automatic_renewal
 from .models import (
     Plan,
@@ -22,6 +26,8 @@ from .models import (
     Order,
     Invoice,
     Payment,
+    PaymentEvent,
+    UserUsage,
 )
 
 class UserLinkMixin:
@@ -337,7 +343,7 @@ class OrderAdmin(MultitenantAdminMixin, SuperuserPermissionMixin, admin.ModelAdm
 
 
 @admin.register(Invoice)
-class InvoiceAdmin(MultitenantAdminMixin, SuperuserPermissionMixin, admin.ModelAdmin):
+class InvoiceAdmin(ReplicaChangelistMixin, MultitenantAdminMixin, SuperuserPermissionMixin, admin.ModelAdmin):
     list_display  = (
         'full_number',
         'issued',
@@ -360,7 +366,7 @@ class InvoiceAdmin(MultitenantAdminMixin, SuperuserPermissionMixin, admin.ModelA
 
 # ---------------------------------------------------------------- Plan payment
 @admin.register(Payment)
-class PaymentAdmin(MultitenantAdminMixin, SuperuserPermissionMixin, admin.ModelAdmin):
+class PaymentAdmin(ReplicaChangelistMixin, MultitenantAdminMixin, SuperuserPermissionMixin, admin.ModelAdmin):
     list_display = (
     'id',
     'user',
@@ -387,4 +393,60 @@ class PaymentAdmin(MultitenantAdminMixin, SuperuserPermissionMixin, admin.ModelA
             .queryset(request)
             .select_related('order', 'user')
         )
-    
\ No newline at end of file
+    
+
+
+def replay_payment_events(modeladmin, request, queryset):
+    from .tasks import process_payment_events
+
+    queryset.update(processed=None)
+    for provider, reference in queryset.values_list('provider', 'reference').distinct():
+        process_payment_events.delay(provider, reference)
+
+replay_payment_events.short_description = _('Replay selected payment events')
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ('reference', 'provider', 'event', 'created', 'processed', 'attempts')
+    list_filter = ('provider', 'event', 'created', 'processed')
+    search_fields = ('reference',)
+    readonly_fields = (
+        'provider', 'event', 'reference', 'payload', 'processed',
+        'attempts', 'error', 'created', 'modified',
+    )
+    actions = [replay_payment_events]
+
+    def has_add_permission(self, request, obj=None):
+        # events are only received through the webhooks
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+
+@admin.register(UserUsage)
+class UserUsageAdmin(MultitenantAdminMixin, UserLinkMixin, admin.ModelAdmin):
+    list_display = (
+        'user_link',
+        'total_download',
+        'total_upload',
+        'total_uptime',
+        'active_sessions',
+        'modified',
+    )
+    list_filter = (MultitenantOrgFilter,)
+    search_fields = ('user__username', 'user__email')
+    list_select_related = ('user',)
+    readonly_fields = (
+        'user', 'total_download', 'total_upload', 'total_uptime',
+        'active_sessions', 'active_sub_sessions', 'created', 'modified',
+    )
+    exclude = ('organization', 'attributes_details')
+
+    def has_add_permission(self, request, obj=None):
+        # usage is aggregated from the accounting data
+        return False
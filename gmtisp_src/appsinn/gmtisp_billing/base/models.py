@@ -2,6 +2,7 @@ from __future__ import unicode_literals
 
 import logging
 import warnings
+from functools import lru_cache
 import re
 import stdnum.eu.vat
 from urllib.parse import urljoin
@@ -10,7 +11,7 @@ from decimal import Decimal
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models, transaction
+from django.db import IntegrityError, models, transaction
 from django.dispatch.dispatcher import receiver
 try:
     from django.contrib.sites.models import Site
@@ -81,11 +82,87 @@ class AbstractUserUsage(OrgMixin, BaseMixin):
     class Meta:
         abstract = True
         ordering = ['-created']
+        verbose_name = _('User usage')
+        verbose_name_plural = _('User usage')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization', 'user'],
+                name='%(app_label)s_%(class)s_unique_org_user',
+            )
+        ]
 
     def __str__(self):
         return f"User ID: {self.user_id} - Download: {self.total_download} bytes, Upload: {self.total_upload} bytes"
 
 
+class AbstractUsageWatermark(BaseMixin):
+    """
+    Position reached by an incremental aggregation job,
+    the rows which changed before ``value`` were already folded.
+    """
+    name = models.CharField(_('name'), max_length=MAX_LENGTH, unique=True)
+    value = models.DateTimeField(_('value'), blank=True, null=True)
+
+    class Meta:
+        abstract = True
+        verbose_name = _('Usage watermark')
+        verbose_name_plural = _('Usage watermarks')
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+
+class AbstractUsageFoldedSession(BaseMixin):
+    """
+    Counters of an accounting session which were already folded into
+    the usage totals: when the session is closed again (duplicate Stop
+    packets, Interim-Update packets received after the Stop) only the
+    difference is folded.
+    """
+    unique_id = models.CharField(_('accounting unique ID'), max_length=32, unique=True)
+    upload = models.BigIntegerField(default=0)
+    download = models.BigIntegerField(default=0)
+    uptime = models.BigIntegerField(_('uptime (seconds)'), default=0)
+
+    class Meta:
+        abstract = True
+        verbose_name = _('Usage folded session')
+        verbose_name_plural = _('Usage folded sessions')
+
+    def __str__(self):
+        return self.unique_id
+
+
+class AbstractCompiledRadiusAttribute(BaseMixin):
+    """
+    Check or reply attribute of a RADIUS group which was written
+    by the compiler of the plan quotas (``gmtisp_billing.radius``):
+    only these attributes are updated or deleted by the compiler,
+    the ones set by hand are left untouched.
+    """
+    CHECK = 'check'
+    REPLY = 'reply'
+    KINDS = ((CHECK, _('check')), (REPLY, _('reply')))
+
+    group = models.ForeignKey('openwisp_radius.RadiusGroup', on_delete=models.CASCADE)
+    kind = models.CharField(_('kind'), max_length=5, choices=KINDS)
+    attribute = models.CharField(_('attribute'), max_length=64)
+
+    class Meta:
+        abstract = True
+        verbose_name = _('Compiled RADIUS attribute')
+        verbose_name_plural = _('Compiled RADIUS attributes')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'kind', 'attribute'],
+                name='%(app_label)s_%(class)s_unique_attribute',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.attribute}'
+
+
 # ----------------------------------------------------------- plans
 class AbstractPlan(OrgMixin, BaseMixin):
     '''
@@ -952,6 +1029,13 @@ def get_initial_number(older_invoices):
         + 1
     )
 
+@lru_cache(maxsize=16)
+def get_number_template(format):
+    '''
+    Compiles the template of the invoice full number once per process
+    '''
+    return Template(format)
+
 class AbstractInvoice(OrgMixin, BaseMixin):
     '''
     Single invoice document.
@@ -1108,7 +1192,7 @@ class AbstractInvoice(OrgMixin, BaseMixin):
             '{% if invoice.type == invoice.INVOICE_TYPES.PROFORMA %}PF{% else %}FV{% endif %}'
             "/{{ invoice.issued|date:'m/Y' }}",
         )
-        return Template(format).render(Context({'invoice': self}))
+        return get_number_template(format).render(Context({'invoice': self}))
 
     def set_issuer_invoice_data(self):
         '''
@@ -1150,12 +1234,14 @@ class AbstractInvoice(OrgMixin, BaseMixin):
         # TODO: Should allow shipping to other country? Not think so
         self.shipping_country = billing_info.country
 
-    def copy_from_order(self, order):
+    def copy_from_order(self, order, site_name=None):
         '''
         Filling orders details likes totals, taxes, etc and linking provided ``Order`` object with an invoice
 
         :param order: Order object
         :type order: Order
+        :param site_name: name of the current site, looked up when not provided
+        :type site_name: str
         '''
         self.order = order
         self.user = order.user
@@ -1165,27 +1251,36 @@ class AbstractInvoice(OrgMixin, BaseMixin):
         self.tax_total = order.total() - order.amount
         self.tax = order.tax
         self.currency = order.currency
-        if Site is not None:
-            self.item_description = '%s - %s' % (
-                Site.objects.get_current().name,
-                order.name,
-            )
+        if site_name is None and Site is not None:
+            site_name = Site.objects.get_current().name
+        if site_name is not None:
+            self.item_description = '%s - %s' % (site_name, order.name)
         else:
             self.item_description = order.name
 
     @classmethod
-    def create(cls, order, invoice_type):
+    def create(cls, order, invoice_type, billing_info=None, site_name=None):
+        '''
+        Creates an invoice of ``invoice_type`` for ``order``.
+
+        ``billing_info`` and ``site_name`` can be passed by callers which
+        already fetched them (eg: batch invoicing), otherwise they are
+        looked up for each call.
+
+        :return: the new invoice or None if the user has no billing info
+        '''
+        if billing_info is None:
+            BillingInfo = AbstractBillingInfo.get_concrete_model()
+            try:
+                billing_info = BillingInfo.objects.get(user=order.user)
+            except BillingInfo.DoesNotExist:
+                return
+
         language_code = get_user_language(order.user)
 
         if language_code is not None:
             translation.activate(language_code)
 
-        BillingInfo = AbstractBillingInfo.get_concrete_model()
-        try:
-            billing_info = BillingInfo.objects.get(user=order.user)
-        except BillingInfo.DoesNotExist:
-            return
-
         day = date.today()
         pday = order.completed
         if invoice_type == cls.INVOICE_TYPES['PROFORMA']:
@@ -1195,7 +1290,7 @@ class AbstractInvoice(OrgMixin, BaseMixin):
             issued=day, selling_date=order.completed, payment_date=pday
         )  # FIXME: 14 - this should set accordingly to ORDER_TIMEOUT in days
         invoice.type = invoice_type
-        invoice.copy_from_order(order)
+        invoice.copy_from_order(order, site_name=site_name)
         invoice.set_issuer_invoice_data()
         invoice.set_buyer_invoice_data(billing_info)
         invoice.clean()
@@ -1207,6 +1302,7 @@ class AbstractInvoice(OrgMixin, BaseMixin):
         invoice.save()
         if language_code is not None:
             translation.deactivate()
+        return invoice
 
     def send_invoice_by_email(self):
         if self.type in getattr(
@@ -1350,6 +1446,66 @@ class AbstractPayment(OrgMixin, BaseMixin):
             self.refund_payment()
         super().delete(*args, **kwargs)
 
+
+class AbstractPaymentEvent(BaseMixin):
+    '''
+    Append-only inbox of the webhook events sent by payment providers.
+
+    Events are stored as soon as they are received and processed later
+    by a worker, the unique constraint on (provider, event, reference)
+    drops the duplicate deliveries caused by provider retries.
+    '''
+    provider = models.CharField(_('provider'), max_length=32, db_index=True)
+    event = models.CharField(_('event'), max_length=MAX_LENGTH)
+    reference = models.CharField(_('reference'), max_length=255, db_index=True)
+    payload = models.JSONField(_('payload'))
+    processed = models.DateTimeField(_('processed'), null=True, blank=True, db_index=True)
+    attempts = models.PositiveIntegerField(_('attempts'), default=0)
+    error = models.TextField(_('error'), blank=True)
+
+    class Meta:
+        abstract = True
+        verbose_name = _('Payment event')
+        verbose_name_plural = _('Payment events')
+        ordering = ('created',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['provider', 'event', 'reference'],
+                name='%(app_label)s_%(class)s_unique_event',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.provider} {self.event} {self.reference}'
+
+    @property
+    def status(self):
+        return self.payload.get('data', {}).get('status')
+
+    @classmethod
+    def receive(cls, provider, event, reference, payload):
+        '''
+        Stores an event unless it was already received.
+
+        :return: tuple (event, created)
+        '''
+        try:
+            with transaction.atomic():
+                return (
+                    cls.objects.create(
+                        provider=provider,
+                        event=event,
+                        reference=reference,
+                        payload=payload,
+                    ),
+                    True,
+                )
+        except IntegrityError:
+            return (
+                cls.objects.get(provider=provider, event=event, reference=reference),
+                False,
+            )
+
 @receiver(account_automatic_renewal)
 def renew_accounts(sender, user, *args, **kwargs):
     userplan = user.userplan
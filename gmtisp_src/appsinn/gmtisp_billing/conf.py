@@ -6,3 +6,16 @@ TAXATION_POLICY = getattr(
     settings, "PLANS_TAXATION_POLICY", "gmtisp_billing.taxation.TAXATION_POLICY"
 )
 APP_VERBOSE_NAME = getattr(settings, "PLANS_APP_VERBOSE_NAME", "billing")
+
+# RADIUS check attributes enforcing the quota limits, by reset interval of the quota;
+# the attributes must be handled by the openwisp-radius counters
+QUOTA_TRAFFIC_CHECK_ATTRIBUTES = getattr(
+    settings,
+    "PLANS_QUOTA_TRAFFIC_CHECK_ATTRIBUTES",
+    {"daily": "Max-Daily-Session-Traffic", "monthly": "Max-Monthly-Session-Traffic"},
+)
+QUOTA_RADIUS_SYNC = getattr(settings, "PLANS_QUOTA_RADIUS_SYNC", True)
+
+# seconds during which users without a plan are remembered by the
+# account_status context processor, the cache is cleared when a plan is saved
+NO_USERPLAN_CACHE_TIMEOUT = getattr(settings, "PLANS_NO_USERPLAN_CACHE_TIMEOUT", 300)
@@ -1,9 +1,107 @@
-from django.urls import reverse
+import operator
+from functools import partial
 
+from django.core.cache import cache
+from django.urls import get_script_prefix, reverse
+from django.utils.functional import SimpleLazyObject, cached_property, new_method_proxy
+
+from openwisp_utils.utils import is_shared_cache
+
+from . import conf as app_settings
 from .base.models import AbstractUserPlan
 
 UserPlan = AbstractUserPlan.get_concrete_model()
 
+# {(url name, script prefix): url}
+_urls = {}
+
+
+def get_no_userplan_cache_key(user_pk):
+    return f'gmtisp-billing-no-userplan-{user_pk}'
+
+
+def _reverse(name):
+    key = (name, get_script_prefix())
+    if key not in _urls:
+        _urls[key] = reverse(name)
+    return _urls[key]
+
+
+class LazyValue(SimpleLazyObject):
+    """
+    ``SimpleLazyObject`` which supports all the comparisons,
+    the templates compare ``EXPIRE_IN_DAYS`` with ``>=`` and ``<=``
+    """
+
+    __le__ = new_method_proxy(operator.le)
+    __ge__ = new_method_proxy(operator.ge)
+
+
+class AccountStatus(object):
+    """
+    Account status of the user of a request, each value
+    is computed the first time it is read.
+
+    Users without a plan are remembered in the cache, so that
+    the following requests do not look the plan up again; only if
+    the cache is shared, since the entry is deleted when a plan is
+    created and the other processes would not see the deletion.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def userplan(self):
+        use_cache = is_shared_cache()
+        key = get_no_userplan_cache_key(self.user.pk)
+        if use_cache and cache.get(key):
+            return None
+        try:
+            return self.user.userplan
+        except UserPlan.DoesNotExist:
+            if use_cache:
+                cache.set(key, True, timeout=app_settings.NO_USERPLAN_CACHE_TIMEOUT)
+            return None
+
+    @cached_property
+    def expired(self):
+        return self.userplan.is_expired()
+
+    @cached_property
+    def not_active(self):
+        return not self.userplan.is_active() and not self.expired
+
+    @cached_property
+    def expire_in_days(self):
+        return self.userplan.days_left()
+
+    @property
+    def extend_url(self):
+        return _reverse('current_plan')
+
+    @property
+    def activate_url(self):
+        return _reverse('account_activation')
+
+    def get(self, attr):
+        # the variables are not set for users without a plan
+        if self.userplan is None:
+            return ''
+        return getattr(self, attr)
+
+
+def get_account_status(request):
+    """
+    Returns the account status of the user of ``request``,
+    it is created once per request
+    """
+    status = getattr(request, 'account_status', None)
+    if status is None or status.user is not request.user:
+        status = AccountStatus(request.user)
+        request.account_status = status
+    return status
+
 
 def account_status(request):
     """
@@ -16,21 +114,19 @@ def account_status(request):
      * ``EXTEND_URL = string``, URL to account extend page.
      * ``ACTIVATE_URL = string``, URL to account activation needed if  account is not active
 
+    The values are evaluated only when a template reads them.
     """
 
     if hasattr(request, "user") and request.user.is_authenticated:
-        try:
-            return {
-                "ACCOUNT_EXPIRED": request.user.userplan.is_expired(),
-                "ACCOUNT_NOT_ACTIVE": (
-                    not request.user.userplan.is_active()
-                    and not request.user.userplan.is_expired()
-                ),
-                "EXPIRE_IN_DAYS": request.user.userplan.days_left(),
-                "EXTEND_URL": reverse("current_plan"),
-                "ACTIVATE_URL": reverse("account_activation"),
-            }
-        except UserPlan.DoesNotExist:
-            pass
+        status = get_account_status(request)
+        return {
+            name: LazyValue(partial(status.get, attr))
+            for name, attr in (
+                ("ACCOUNT_EXPIRED", "expired"),
+                ("ACCOUNT_NOT_ACTIVE", "not_active"),
+                ("EXPIRE_IN_DAYS", "expire_in_days"),
+                ("EXTEND_URL", "extend_url"),
+                ("ACTIVATE_URL", "activate_url"),
+            )
+        }
     return {}
-
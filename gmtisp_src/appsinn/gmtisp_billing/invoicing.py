@@ -0,0 +1,233 @@
+import csv
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import render_to_string
+
+try:
+    from django.contrib.sites.models import Site
+except RuntimeError:
+    Site = None
+
+from .models import BillingInfo, Invoice, Order
+from .pdf import write_pdf
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 200
+MANIFEST_NAME = 'manifest.csv'
+MANIFEST_FIELDS = [
+    'invoice_id',
+    'full_number',
+    'type',
+    'issued',
+    'selling_date',
+    'order_id',
+    'username',
+    'buyer_name',
+    'buyer_tax_number',
+    'buyer_country',
+    'total_net',
+    'tax',
+    'tax_total',
+    'total',
+    'currency',
+    'html_file',
+    'pdf_file',
+    'sha256',
+]
+
+
+def get_invoice_export_root():
+    default = os.path.join(
+        getattr(settings, 'PRIVATE_STORAGE_ROOT', settings.MEDIA_ROOT), 'invoices'
+    )
+    return getattr(settings, 'PLANS_INVOICE_EXPORT_ROOT', default)
+
+
+def get_orders_for_invoicing(
+    invoice_type, start=None, end=None, order_ids=None, organization=None
+):
+    """
+    Returns the orders which are eligible for an invoice of ``invoice_type``,
+    with the user and the billing info joined in the same query.
+
+    Final invoices are issued for completed orders only and are filtered
+    by completion date, proforma invoices are filtered by creation date.
+    """
+    queryset = Order.objects.select_related(
+        'user', 'user__billinginfo', 'plan', 'quota', 'organization'
+    )
+    if invoice_type == Invoice.INVOICE_TYPES.INVOICE:
+        queryset = queryset.filter(status=Order.STATUS.COMPLETED)
+        date_field = 'completed'
+    else:
+        date_field = 'created'
+    if start:
+        queryset = queryset.filter(**{f'{date_field}__date__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{date_field}__date__lte': end})
+    if order_ids:
+        queryset = queryset.filter(pk__in=order_ids)
+    if organization:
+        queryset = queryset.filter(organization=organization)
+    return queryset.order_by(date_field, 'pk')
+
+
+def _get_site_name():
+    if Site is None:
+        return None
+    return Site.objects.get_current().name
+
+
+def _get_billing_info(user):
+    try:
+        return user.billinginfo
+    except BillingInfo.DoesNotExist:
+        return None
+
+
+def create_invoices(orders, invoice_type, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Creates invoices of ``invoice_type`` for ``orders`` which do not
+    have one yet, ``chunk_size`` orders per transaction.
+
+    ``orders`` should come from ``get_orders_for_invoicing`` so that
+    users and billing info are not fetched once per order.
+
+    :return: tuple (list of created invoices, number of skipped orders)
+    """
+    orders = orders.exclude(invoice__type=invoice_type)
+    order_ids = list(orders.values_list('pk', flat=True))
+    site_name = _get_site_name()
+    invoices = []
+    skipped = 0
+    for index in range(0, len(order_ids), chunk_size):
+        chunk = orders.filter(pk__in=order_ids[index : index + chunk_size])
+        with transaction.atomic():
+            for order in chunk:
+                billing_info = _get_billing_info(order.user)
+                if billing_info is None:
+                    skipped += 1
+                    continue
+                invoice = Invoice.create(
+                    order, invoice_type, billing_info=billing_info, site_name=site_name
+                )
+                invoices.append(invoice)
+        logger.info(
+            f'Invoicing: {len(invoices)} invoices created, '
+            f'{min(index + chunk_size, len(order_ids))}/{len(order_ids)} orders processed'
+        )
+    return invoices, skipped
+
+
+def render_invoice_html(invoice, template_name=None):
+    template_name = template_name or getattr(
+        settings, 'PLANS_INVOICE_TEMPLATE', 'gmtisp_billing/invoices/PL_EN.html'
+    )
+    context = {
+        'invoice': invoice,
+        'object': invoice,
+        'logo_url': getattr(settings, 'PLANS_INVOICE_LOGO_URL', None),
+        'auto_print': False,
+    }
+    return render_to_string(template_name, context)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_invoice_file_name(invoice):
+    number = invoice.full_number.replace('/', '-').replace(' ', '')
+    return f'{number}_{str(invoice.pk)[:8]}'
+
+
+def export_invoices(invoices, output_dir, pdf=True, processes=None):
+    """
+    Renders ``invoices`` to HTML (and PDF if ``pdf`` is ``True``)
+    in ``output_dir`` and writes a CSV manifest for the accounting
+    department next to the files.
+
+    Templates are rendered in this process, the HTML to PDF
+    conversion (the expensive part) runs in a pool of
+    ``processes`` worker processes.
+
+    :return: dict with the number of exported invoices, the path
+             of the manifest and the elapsed time in seconds
+    """
+    started = time.monotonic()
+    os.makedirs(output_dir, exist_ok=True)
+    base_url = getattr(settings, 'STATIC_ROOT', None) or output_dir
+    rows = []
+    pdf_jobs = []
+    for invoice in invoices:
+        file_name = get_invoice_file_name(invoice)
+        html = render_invoice_html(invoice)
+        html_path = os.path.join(output_dir, f'{file_name}.html')
+        with open(html_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        row = {
+            'invoice_id': invoice.pk,
+            'full_number': invoice.full_number,
+            'type': invoice.get_type_display(),
+            'issued': invoice.issued,
+            'selling_date': invoice.selling_date or '',
+            'order_id': invoice.order_id,
+            'username': invoice.user.username,
+            'buyer_name': invoice.buyer_name,
+            'buyer_tax_number': invoice.buyer_tax_number,
+            'buyer_country': invoice.buyer_country.code,
+            'total_net': invoice.total_net,
+            'tax': invoice.tax if invoice.tax is not None else '',
+            'tax_total': invoice.tax_total,
+            'total': invoice.total,
+            'currency': invoice.currency,
+            'html_file': os.path.basename(html_path),
+            'pdf_file': '',
+        }
+        if pdf:
+            pdf_path = os.path.join(output_dir, f'{file_name}.pdf')
+            row['pdf_file'] = os.path.basename(pdf_path)
+            pdf_jobs.append((html, pdf_path))
+        rows.append(row)
+
+    if pdf_jobs:
+        # the workers are spawned rather than forked, so that they do not
+        # inherit the database connections of the caller
+        with ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context('spawn')
+        ) as executor:
+            futures = [
+                executor.submit(write_pdf, html, path, base_url)
+                for html, path in pdf_jobs
+            ]
+            for future in futures:
+                future.result()
+
+    for row in rows:
+        row['sha256'] = _sha256(
+            os.path.join(output_dir, row['pdf_file'] or row['html_file'])
+        )
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(manifest_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return {
+        'count': len(rows),
+        'manifest': manifest_path,
+        'elapsed': time.monotonic() - started,
+    }
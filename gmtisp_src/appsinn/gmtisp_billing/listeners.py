@@ -1,9 +1,17 @@
+import logging
+
+from celery.exceptions import OperationalError
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch.dispatcher import receiver
 
+from . import conf as app_settings
+from . import tasks
+from .context_processors import get_no_userplan_cache_key
 from .signals import activate_user_plan, order_completed, user_activated
-from .models import Plan, UserPlan, Order, Invoice
+from .models import Plan, PlanQuota, Quota, UserPlan, Order, Invoice
 
 User = get_user_model()
 
@@ -57,6 +65,12 @@ def set_default_user_plan(sender, instance, created, **kwargs):
         UserPlan.create_for_user(instance)
 
 
+@receiver(post_save, sender=UserPlan)
+def clear_no_userplan_cache(sender, instance, created, **kwargs):
+    if created:
+        cache.delete(get_no_userplan_cache_key(instance.user_id))
+
+
 # Hook to django-registration to initialize plan automatically after user has confirm account
 
 @receiver(activate_user_plan)
@@ -103,3 +117,61 @@ try:
 
 except ImportError:
     pass
+
+
+logger = logging.getLogger(__name__)
+
+
+def _sync_quota_radius_attributes(plan_ids, group_ids=None):
+    if not app_settings.QUOTA_RADIUS_SYNC or not (plan_ids or group_ids):
+        return
+    plan_ids = [str(pk) for pk in plan_ids]
+    group_ids = [str(pk) for pk in group_ids or [] if pk]
+
+    def _sync():
+        try:
+            tasks.sync_quota_radius_attributes.delay(plan_ids, group_ids)
+        except OperationalError:
+            logger.warning('Celery broker is unreachable')
+
+    transaction.on_commit(_sync)
+
+
+@receiver(pre_save, sender=Plan)
+def plan_previous_radius_group(sender, instance, **kwargs):
+    if not app_settings.QUOTA_RADIUS_SYNC or instance._state.adding:
+        return
+    instance._previous_radius_group_id = (
+        Plan.objects.filter(pk=instance.pk)
+        .values_list('radius_group_id', flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Plan)
+def plan_radius_attributes(sender, instance, **kwargs):
+    previous_group_id = getattr(instance, '_previous_radius_group_id', None)
+    group_ids = []
+    if previous_group_id != instance.radius_group_id:
+        # the attributes of the plan are removed from its previous group
+        group_ids.append(previous_group_id)
+    _sync_quota_radius_attributes([instance.pk], group_ids)
+
+
+@receiver(post_delete, sender=Plan)
+def deleted_plan_radius_attributes(sender, instance, **kwargs):
+    _sync_quota_radius_attributes([], [instance.radius_group_id])
+
+
+@receiver(post_save, sender=Quota)
+def quota_radius_attributes(sender, instance, created, **kwargs):
+    if created:
+        return
+    plan_ids = PlanQuota.objects.filter(quota=instance).values_list('plan_id', flat=True)
+    _sync_quota_radius_attributes(list(plan_ids))
+
+
+@receiver(post_save, sender=PlanQuota)
+@receiver(post_delete, sender=PlanQuota)
+def plan_quota_radius_attributes(sender, instance, **kwargs):
+    _sync_quota_radius_attributes([instance.plan_id])
@@ -0,0 +1,24 @@
+from django.core.management import BaseCommand
+
+from ...usage import aggregate_usage, reset_usage
+
+
+class Command(BaseCommand):
+    help = 'Folds the accounting sessions closed since the last run into the user usage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Clear the usage totals and aggregate the whole accounting table',
+        )
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            reset_usage()
+        result = aggregate_usage(chunk_size=options['chunk_size'])
+        self.stdout.write(
+            f'{result["updated"]} users updated '
+            f'(sessions closed from {result["start"]} to {result["end"]})'
+        )
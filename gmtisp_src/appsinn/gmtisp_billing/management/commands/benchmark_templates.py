@@ -0,0 +1,89 @@
+import statistics
+import time
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.template import loader
+from django.template.autoreload import reset_loaders
+from django.test import RequestFactory
+from django.urls import reverse
+
+EMAILS = [
+    'change_plan',
+    'expired_account',
+    'extend_account',
+    'invoice_created',
+    'remind_expire',
+    'renew_cvv_3ds',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the render latency of the admin index and of the billing '
+        'e-mails, with the template cache empty (cold) and filled (warm)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100)
+        parser.add_argument(
+            '--username',
+            help='Superuser used to render the admin index (default: first one)',
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.filter(is_superuser=True)
+        if options['username']:
+            users = users.filter(username=options['username'])
+        user = users.order_by('date_joined').first()
+        if not user:
+            raise CommandError('A superuser is needed to render the admin index')
+        self.iterations = options['iterations']
+        self.stdout.write(f'{"template":<45}{"cold":>10}{"median":>10}{"p95":>10}')
+        self.benchmark('admin index', lambda: self.render_admin_index(user))
+        context = self.get_email_context(user)
+        for email in EMAILS:
+            for part in ('title', 'body'):
+                name = f'gmtisp_billing/mail/{email}_{part}.txt'
+                self.benchmark(name, lambda: loader.render_to_string(name, context))
+
+    def benchmark(self, label, render):
+        # the first render compiles the templates
+        reset_loaders()
+        try:
+            cold = self.measure(render)
+        except Exception as e:
+            self.stderr.write(f'{label}: {e}')
+            return
+        timings = sorted(self.measure(render) for _ in range(self.iterations))
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f'{label:<45}{cold:>8.2f}ms'
+            f'{statistics.median(timings):>8.2f}ms{p95:>8.2f}ms'
+        )
+
+    def measure(self, render):
+        started = time.perf_counter()
+        render()
+        return (time.perf_counter() - started) * 1000
+
+    def render_admin_index(self, user):
+        request = RequestFactory().get(reverse('admin:index'))
+        request.user = user
+        return admin.site.index(request).render()
+
+    def get_email_context(self, user):
+        userplan = getattr(user, 'userplan', None)
+        return {
+            'user': user,
+            'userplan': userplan,
+            'plan': getattr(userplan, 'plan', None),
+            'days': 3,
+            'invoice_type': 'Invoice',
+            'invoice_number': '1/FV/01/2024',
+            'url': '/',
+            'site_name': 'benchmark',
+            'site_domain': 'example.com',
+        }
@@ -0,0 +1,102 @@
+import os
+from datetime import date
+
+from django.core.management import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...invoicing import (
+    DEFAULT_CHUNK_SIZE,
+    create_invoices,
+    export_invoices,
+    get_invoice_export_root,
+    get_orders_for_invoicing,
+)
+from ...models import Invoice
+
+INVOICE_TYPES = {
+    'invoice': Invoice.INVOICE_TYPES.INVOICE,
+    'proforma': Invoice.INVOICE_TYPES.PROFORMA,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates missing invoices for the orders of a date range (or a list of '
+        'orders) and exports them as HTML/PDF files with a CSV manifest'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start', type=date.fromisoformat, help='First day (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--end', type=date.fromisoformat, help='Last day (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--orders', nargs='+', dest='order_ids', help='Order IDs to invoice'
+        )
+        parser.add_argument(
+            '--type', choices=INVOICE_TYPES.keys(), default='invoice', dest='type'
+        )
+        parser.add_argument(
+            '--output-dir',
+            help='Directory where files and the manifest are written '
+            '(defaults to a new directory in PLANS_INVOICE_EXPORT_ROOT)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=None,
+            help='Number of processes rendering PDFs (defaults to the CPU count)',
+        )
+        parser.add_argument(
+            '--no-pdf', action='store_false', dest='pdf', help='Export HTML only'
+        )
+
+    def handle(self, *args, **options):
+        if not any([options['start'], options['end'], options['order_ids']]):
+            raise CommandError('Provide a date range or a list of orders')
+        invoice_type = INVOICE_TYPES[options['type']]
+        orders = get_orders_for_invoicing(
+            invoice_type,
+            start=options['start'],
+            end=options['end'],
+            order_ids=options['order_ids'],
+        )
+
+        started = timezone.now()
+        created, skipped = create_invoices(
+            orders, invoice_type, chunk_size=options['chunk_size']
+        )
+        elapsed = (timezone.now() - started).total_seconds()
+        self.stdout.write(
+            f'{len(created)} invoices created in {elapsed:.2f}s '
+            f'({self._rate(len(created), elapsed)} invoices/s), '
+            f'{skipped} orders skipped (no billing info)'
+        )
+
+        output_dir = options['output_dir'] or os.path.join(
+            get_invoice_export_root(), started.strftime('%Y%m%d-%H%M%S')
+        )
+        invoices = (
+            Invoice.objects.filter(order__in=orders, type=invoice_type)
+            .select_related('user')
+            .order_by('issued', 'number')
+        )
+        result = export_invoices(
+            invoices,
+            output_dir,
+            pdf=options['pdf'],
+            processes=options['processes'],
+        )
+        self.stdout.write(
+            f'{result["count"]} invoices rendered in {result["elapsed"]:.2f}s '
+            f'({self._rate(result["count"], result["elapsed"])} invoices/s)'
+        )
+        self.stdout.write(f'Manifest written to {result["manifest"]}')
+
+    def _rate(self, count, elapsed):
+        if not elapsed:
+            return str(count)
+        return f'{count / elapsed:.1f}'
@@ -0,0 +1,58 @@
+from datetime import date
+
+from django.core.management import BaseCommand, CommandError
+
+from ...models import PaymentEvent
+from ...tasks import process_payment_events
+from ...webhooks import process_events
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays stored payment provider events, by default the events '
+        'are queued to the celery workers'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reference', nargs='+', dest='references', help='Payment references'
+        )
+        parser.add_argument(
+            '--since', type=date.fromisoformat, help='First day (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--failed', action='store_true', help='Only events which failed'
+        )
+        parser.add_argument('--provider', default=None)
+        parser.add_argument(
+            '--all', action='store_true', dest='all', help='Replay all the events'
+        )
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Process the events in this process instead of queueing them',
+        )
+
+    def handle(self, *args, **options):
+        if not any(
+            [options['references'], options['since'], options['failed'], options['all']]
+        ):
+            raise CommandError('Provide --reference, --since, --failed or --all')
+        events = PaymentEvent.objects.all()
+        if options['references']:
+            events = events.filter(reference__in=options['references'])
+        if options['since']:
+            events = events.filter(created__date__gte=options['since'])
+        if options['failed']:
+            events = events.exclude(error='')
+        if options['provider']:
+            events = events.filter(provider=options['provider'])
+
+        count = events.update(processed=None)
+        references = list(events.values_list('provider', 'reference').distinct())
+        for provider, reference in references:
+            if options['sync']:
+                process_events(provider, reference)
+            else:
+                process_payment_events.delay(provider, reference)
+        self.stdout.write(f'{count} events of {len(references)} payments replayed')
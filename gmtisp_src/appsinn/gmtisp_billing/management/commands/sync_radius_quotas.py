@@ -0,0 +1,12 @@
+from django.core.management import BaseCommand
+
+from ...models import Plan
+from ...radius import sync_plans
+
+
+class Command(BaseCommand):
+    help = 'Writes the quotas of the plans to the checks and replies of their RADIUS groups'
+
+    def handle(self, *args, **options):
+        changed = sync_plans(Plan.objects.select_related('radius_group'))
+        self.stdout.write(f'RADIUS attributes of {len(changed)} groups updated')
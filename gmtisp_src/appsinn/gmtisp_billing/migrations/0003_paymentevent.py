@@ -0,0 +1,41 @@
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gmtisp_billing', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, null=True, verbose_name='created')),
+                ('modified', models.DateTimeField(auto_now=True, null=True, verbose_name='modified')),
+                ('provider', models.CharField(db_index=True, max_length=32, verbose_name='provider')),
+                ('event', models.CharField(max_length=67, verbose_name='event')),
+                ('reference', models.CharField(db_index=True, max_length=255, verbose_name='reference')),
+                ('payload', models.JSONField(verbose_name='payload')),
+                ('processed', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='processed')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='attempts')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+            ],
+            options={
+                'verbose_name': 'Payment event',
+                'verbose_name_plural': 'Payment events',
+                'ordering': ('created',),
+                'abstract': False,
+                'swappable': 'GMTISP_BILLING_PAYMENTEVENT_MODEL',
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('provider', 'event', 'reference'),
+                        name='gmtisp_billing_paymentevent_unique_event',
+                    )
+                ],
+            },
+        ),
+    ]
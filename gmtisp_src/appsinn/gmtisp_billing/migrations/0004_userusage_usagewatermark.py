@@ -0,0 +1,62 @@
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openwisp_users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gmtisp_billing', '0003_paymentevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageWatermark',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, null=True, verbose_name='created')),
+                ('modified', models.DateTimeField(auto_now=True, null=True, verbose_name='modified')),
+                ('name', models.CharField(max_length=67, unique=True, verbose_name='name')),
+                ('value', models.DateTimeField(blank=True, null=True, verbose_name='value')),
+            ],
+            options={
+                'verbose_name': 'Usage watermark',
+                'verbose_name_plural': 'Usage watermarks',
+                'abstract': False,
+                'swappable': 'GMTISP_BILLING_USAGEWATERMARK_MODEL',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserUsage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, null=True, verbose_name='created')),
+                ('modified', models.DateTimeField(auto_now=True, null=True, verbose_name='modified')),
+                ('active_sessions', models.IntegerField(default=0)),
+                ('active_sub_sessions', models.IntegerField(default=0)),
+                ('total_download', models.BigIntegerField(default=0)),
+                ('total_upload', models.BigIntegerField(default=0)),
+                ('total_uptime', models.DurationField(default='0:00:00', verbose_name='Total Uptime')),
+                ('attributes_details', models.CharField(blank=True, max_length=67, null=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='openwisp_users.organization', verbose_name='organization')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User usage',
+                'verbose_name_plural': 'User usage',
+                'ordering': ['-created'],
+                'abstract': False,
+                'swappable': 'GMTISP_BILLING_USERUSAGE_MODEL',
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('organization', 'user'),
+                        name='gmtisp_billing_userusage_unique_org_user',
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gmtisp_billing', '0004_userusage_usagewatermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageFoldedSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, null=True, verbose_name='created')),
+                ('modified', models.DateTimeField(auto_now=True, null=True, verbose_name='modified')),
+                ('unique_id', models.CharField(max_length=32, unique=True, verbose_name='accounting unique ID')),
+                ('upload', models.BigIntegerField(default=0)),
+                ('download', models.BigIntegerField(default=0)),
+                ('uptime', models.BigIntegerField(default=0, verbose_name='uptime (seconds)')),
+            ],
+            options={
+                'verbose_name': 'Usage folded session',
+                'verbose_name_plural': 'Usage folded sessions',
+                'abstract': False,
+                'swappable': 'GMTISP_BILLING_USAGEFOLDEDSESSION_MODEL',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gmtisp_billing', '0005_usagefoldedsession'),
+        migrations.swappable_dependency(settings.OPENWISP_RADIUS_RADIUSGROUP_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompiledRadiusAttribute',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, null=True, verbose_name='created')),
+                ('modified', models.DateTimeField(auto_now=True, null=True, verbose_name='modified')),
+                ('kind', models.CharField(choices=[('check', 'check'), ('reply', 'reply')], max_length=5, verbose_name='kind')),
+                ('attribute', models.CharField(max_length=64, verbose_name='attribute')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.OPENWISP_RADIUS_RADIUSGROUP_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Compiled RADIUS attribute',
+                'verbose_name_plural': 'Compiled RADIUS attributes',
+                'abstract': False,
+                'swappable': 'GMTISP_BILLING_COMPILEDRADIUSATTRIBUTE_MODEL',
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('group', 'kind', 'attribute'),
+                        name='gmtisp_billing_compiledradiusattribute_unique_attribute',
+                    )
+                ],
+            },
+        ),
+    ]
@@ -15,6 +15,11 @@ from .base.models import (
     AbstractRecurringUserPlan,
     AbstractUserPlan,
     AbstractPayment,
+    AbstractPaymentEvent,
+    AbstractUserUsage,
+    AbstractUsageWatermark,
+    AbstractUsageFoldedSession,
+    AbstractCompiledRadiusAttribute,
 )
 
 
@@ -80,3 +85,33 @@ class Payment(AbstractPayment):
     class Meta(AbstractPayment.Meta):
         abstract = False
         swappable = swappable_setting('gmtisp_billing', 'Payment')
+
+
+class PaymentEvent(AbstractPaymentEvent):
+    class Meta(AbstractPaymentEvent.Meta):
+        abstract = False
+        swappable = swappable_setting('gmtisp_billing', 'PaymentEvent')
+
+
+class UserUsage(AbstractUserUsage):
+    class Meta(AbstractUserUsage.Meta):
+        abstract = False
+        swappable = swappable_setting('gmtisp_billing', 'UserUsage')
+
+
+class UsageWatermark(AbstractUsageWatermark):
+    class Meta(AbstractUsageWatermark.Meta):
+        abstract = False
+        swappable = swappable_setting('gmtisp_billing', 'UsageWatermark')
+
+
+class UsageFoldedSession(AbstractUsageFoldedSession):
+    class Meta(AbstractUsageFoldedSession.Meta):
+        abstract = False
+        swappable = swappable_setting('gmtisp_billing', 'UsageFoldedSession')
+
+
+class CompiledRadiusAttribute(AbstractCompiledRadiusAttribute):
+    class Meta(AbstractCompiledRadiusAttribute.Meta):
+        abstract = False
+        swappable = swappable_setting('gmtisp_billing', 'CompiledRadiusAttribute')
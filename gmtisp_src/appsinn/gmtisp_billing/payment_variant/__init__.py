@@ -1,12 +1,12 @@
 import json
-import requests
 import logging
-from django.conf import settings
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 
 from gmtisp_billing.models import Order, Payment#, PaymentStatus
 
+from .client import get_paystack_client
+
 
 logger = logging.getLogger(__name__)
 
@@ -40,10 +40,6 @@ class PaystackGateway(BasePaymentGateway):
             transaction_id=f"{request.user.id}-{order.id}",  # Generate a unique transaction ID
         )
 
-        headers = {
-            "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json"
-        }
         data = {
             "email": payment.user.email,
             "amount": int(payment.amount * 100),
@@ -51,7 +47,7 @@ class PaystackGateway(BasePaymentGateway):
             "callback_url": payment.get_callback_url(),
         }
 
-        response = requests.post('https://api.paystack.co/transaction/initialize', json=data, headers=headers)
+        response = get_paystack_client().initialize_transaction(data)
         if response.status_code == 200:
             payment.transaction_id = response.json()['data']['reference']
             payment.save()
@@ -70,10 +66,7 @@ class PaystackGateway(BasePaymentGateway):
 
         payment = get_object_or_404(Payment, transaction_id=reference)
 
-        response = requests.get(f'https://api.paystack.co/transaction/verify/{reference}', headers={
-            "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json"
-        })
+        response = get_paystack_client().verify_transaction(reference)
 
         if response.json()['data']['status'] == 'success':
             payment.status = "confirmed"
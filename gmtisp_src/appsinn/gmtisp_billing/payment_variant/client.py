@@ -0,0 +1,197 @@
+"""
+HTTP clients used to talk to the payment providers.
+
+Each client keeps one ``requests.Session`` per process, so that the
+connections to the provider are pooled and kept alive between
+checkouts instead of paying a new TLS handshake on every call.
+"""
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# calls which can be repeated safely, the others are retried
+# only when the connection could not be established
+IDEMPOTENT_METHODS = frozenset(['HEAD', 'GET', 'PUT', 'DELETE', 'OPTIONS', 'TRACE'])
+
+
+class EndpointMetrics:
+    """
+    In-process latency and error counters, one entry per
+    (provider, endpoint) pair.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = defaultdict(
+            lambda: {'count': 0, 'errors': 0, 'total_time': 0.0, 'max_time': 0.0}
+        )
+
+    def record(self, provider, endpoint, elapsed, error=False):
+        with self._lock:
+            data = self._data[(provider, endpoint)]
+            data['count'] += 1
+            data['errors'] += int(error)
+            data['total_time'] += elapsed
+            data['max_time'] = max(data['max_time'], elapsed)
+
+    def snapshot(self):
+        """
+        Returns a copy of the counters, with the average latency
+        """
+        with self._lock:
+            result = {}
+            for key, data in self._data.items():
+                result[key] = dict(data, avg_time=data['total_time'] / data['count'])
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+
+metrics = EndpointMetrics()
+
+
+class ProviderClient:
+    """
+    Base HTTP client of a payment provider.
+
+    The session is created lazily and recreated after a fork, because
+    pooled connections must not be shared between processes.
+    """
+
+    provider = None
+
+    def __init__(
+        self,
+        base_url,
+        headers=None,
+        timeout=(3.05, 15),
+        max_retries=3,
+        backoff_factor=0.3,
+        backoff_jitter=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        pool_maxsize=10,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self.status_forcelist = status_forcelist
+        self.pool_maxsize = pool_maxsize
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session = self._create_session()
+                    self._pid = os.getpid()
+        return self._session
+
+    def _create_session(self):
+        retries = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            backoff_jitter=self.backoff_jitter,
+            status_forcelist=self.status_forcelist,
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retries
+        )
+        session = requests.Session()
+        session.headers.update(self.headers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def request(self, method, path, endpoint=None, **kwargs):
+        """
+        Sends a request to ``path`` (relative to ``base_url``).
+
+        ``endpoint`` is the name under which metrics are recorded,
+        it defaults to ``path``; pass it when the path contains
+        variable parts (eg: a transaction reference).
+        """
+        endpoint = endpoint or path
+        kwargs.setdefault('timeout', self.timeout)
+        url = f'{self.base_url}/{path.lstrip("/")}'
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            metrics.record(self.provider, endpoint, time.monotonic() - started, True)
+            logger.warning(f'{self.provider} {method} {endpoint} failed', exc_info=True)
+            raise
+        elapsed = time.monotonic() - started
+        metrics.record(self.provider, endpoint, elapsed, response.status_code >= 500)
+        logger.debug(
+            f'{self.provider} {method} {endpoint}: '
+            f'HTTP {response.status_code} in {elapsed:.3f}s'
+        )
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+
+class PaystackClient(ProviderClient):
+    provider = 'paystack'
+
+    def __init__(self, secret_key=None, base_url=None, **kwargs):
+        secret_key = secret_key or settings.PAYSTACK_SECRET_KEY
+        base_url = base_url or getattr(
+            settings, 'PAYSTACK_API_URL', 'https://api.paystack.co'
+        )
+        kwargs.setdefault('timeout', getattr(settings, 'PAYSTACK_TIMEOUT', (3.05, 15)))
+        headers = {
+            'Authorization': f'Bearer {secret_key}',
+            'Content-Type': 'application/json',
+        }
+        super().__init__(base_url, headers=headers, **kwargs)
+
+    def initialize_transaction(self, data):
+        return self.post('/transaction/initialize', json=data)
+
+    def verify_transaction(self, reference):
+        return self.get(
+            f'/transaction/verify/{reference}', endpoint='/transaction/verify'
+        )
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_paystack_client():
+    """
+    Returns the shared Paystack client of this process
+    """
+    with _clients_lock:
+        if PaystackClient.provider not in _clients:
+            _clients[PaystackClient.provider] = PaystackClient()
+        return _clients[PaystackClient.provider]
@@ -0,0 +1,143 @@
+"""
+Local stand-in for Paystack, used by the tests and for
+trying the webhook flow without a Paystack account.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.urls import reverse
+
+from ..webhooks import get_paystack_signature
+
+
+class FakePaystack:
+    """
+    Builds signed webhook deliveries the way Paystack does.
+    """
+
+    def __init__(self, secret_key='sk_test_fake'):
+        self.secret_key = secret_key
+
+    def event(self, reference, event='charge.success', status='success', amount=0):
+        return {
+            'event': event,
+            'data': {
+                'reference': reference,
+                'status': status,
+                'amount': amount,
+                'currency': 'GHS',
+            },
+        }
+
+    def sign(self, body):
+        return get_paystack_signature(body, secret_key=self.secret_key)
+
+    def deliver(self, client, payload, signature=None):
+        """
+        Posts ``payload`` to the webhook endpoint with the django test ``client``.
+        """
+        body = json.dumps(payload).encode('utf-8')
+        return client.post(
+            reverse('paystack_webhook'),
+            data=body,
+            content_type='application/json',
+            HTTP_X_PAYSTACK_SIGNATURE=signature or self.sign(body),
+        )
+
+
+class _PaystackAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        with server.lock:
+            server.requests.append((self.command, self.path, body))
+            server.client_ports.add(self.client_address[1])
+            fail = server.failures > 0
+            if fail:
+                server.failures -= 1
+        if fail:
+            return self._respond(503, {'status': False, 'message': 'Unavailable'})
+        if self.command == 'POST' and self.path == '/transaction/initialize':
+            reference = body.get('reference')
+            return self._respond(
+                200,
+                {
+                    'status': True,
+                    'data': {
+                        'reference': reference,
+                        'authorization_url': f'https://checkout.paystack.test/{reference}',
+                    },
+                },
+            )
+        if self.command == 'GET' and self.path.startswith('/transaction/verify/'):
+            reference = self.path.rsplit('/', 1)[-1]
+            return self._respond(
+                200,
+                {
+                    'status': True,
+                    'data': {
+                        'reference': reference,
+                        'status': server.statuses.get(reference, 'success'),
+                    },
+                },
+            )
+        self._respond(404, {'status': False, 'message': 'Not found'})
+
+    def _respond(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakePaystackServer(ThreadingHTTPServer):
+    """
+    Serves the Paystack transaction API on a local port, usage::
+
+        with FakePaystackServer() as server:
+            client = PaystackClient('sk_test_fake', base_url=server.url)
+
+    ``failures`` is the number of requests which are answered
+    with HTTP 503 before the server starts to respond normally,
+    ``statuses`` maps references to the status returned by verify.
+    ``client_ports`` collects the ports of the client sockets, it
+    tells how many connections were opened by the client.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, failures=0, statuses=None):
+        super().__init__(('127.0.0.1', 0), _PaystackAPIHandler)
+        self.failures = failures
+        self.statuses = statuses or {}
+        self.requests = []
+        self.client_ports = set()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,16 @@
+"""
+HTML to PDF conversion run in the worker processes of
+``gmtisp_billing.invoicing.export_invoices``.
+
+The workers are started with the "spawn" method, hence they do not
+inherit the database connections of the exporting process; this
+module must not import django models, since django is not set up
+in the workers.
+"""
+
+
+def write_pdf(html, path, base_url):
+    from weasyprint import HTML
+
+    HTML(string=html, base_url=base_url).write_pdf(target=path)
+    return path
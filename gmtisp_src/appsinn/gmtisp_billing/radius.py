@@ -0,0 +1,278 @@
+"""
+Compiles the quotas of the plans into the check and reply
+attributes of the RADIUS group of each plan.
+
+Only the attributes written by the compiler (recorded as
+``CompiledRadiusAttribute``) are updated or deleted, the other
+attributes of the groups, eg: the ones set by hand, are left untouched.
+
+``Quota.uptime_limit`` is the validity of the plan (enforced by the
+expiration of the user plan), not a limit of the sessions, hence
+it is not compiled into a session-time check.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+from swapper import load_model
+
+from . import conf as app_settings
+from .models import CompiledRadiusAttribute, Plan, PlanQuota
+
+logger = logging.getLogger(__name__)
+
+RadiusAccounting = load_model('openwisp_radius', 'RadiusAccounting')
+RadiusGroup = load_model('openwisp_radius', 'RadiusGroup')
+RadiusGroupCheck = load_model('openwisp_radius', 'RadiusGroupCheck')
+RadiusGroupReply = load_model('openwisp_radius', 'RadiusGroupReply')
+RadiusUserGroup = load_model('openwisp_radius', 'RadiusUserGroup')
+
+RATE_LIMIT_ATTRIBUTE = 'Mikrotik-Rate-Limit'
+DOWNLOAD_LIMIT_ATTRIBUTE = 'Mikrotik-Xmit-Limit'
+UPLOAD_LIMIT_ATTRIBUTE = 'Mikrotik-Recv-Limit'
+GIGAWORD = 2**32
+
+
+def get_managed_check_attributes():
+    return set(app_settings.QUOTA_TRAFFIC_CHECK_ATTRIBUTES.values())
+
+
+def get_managed_reply_attributes():
+    attributes = {RATE_LIMIT_ATTRIBUTE}
+    for attribute in [DOWNLOAD_LIMIT_ATTRIBUTE, UPLOAD_LIMIT_ATTRIBUTE]:
+        attributes.update([attribute, f'{attribute}-Gigawords'])
+    return attributes
+
+
+def _pair(rx, tx):
+    return f'{rx}/{tx}'
+
+
+def get_rate_limit(quota):
+    """
+    Returns the value of the MikroTik rate limit attribute:
+    ``rx/tx [burst-rx/burst-tx [threshold-rx/threshold-tx
+    [time-rx/time-tx [priority [min-rx/min-tx]]]]]``
+    """
+    if not quota.rate_limit_rx and not quota.rate_limit_tx:
+        return None
+    parts = [
+        _pair(quota.rate_limit_rx, quota.rate_limit_tx),
+        _pair(quota.rate_limit_burst_rx, quota.rate_limit_burst_tx),
+        _pair(quota.rate_limit_burst_threshold_rx, quota.rate_limit_burst_threshold_tx),
+        _pair(quota.rate_limit_burst_time_rx, quota.rate_limit_burst_time_tx),
+        # 8 is the lowest priority and the default of RouterOS
+        str(quota.rate_limit_priority or 8),
+        _pair(quota.rate_limit_min_rx, quota.rate_limit_min_tx),
+    ]
+    # the trailing parts which are not set are omitted
+    defaults = ['0/0', '0/0', '0/0', '8', '0/0']
+    while len(parts) > 1 and parts[-1] == defaults[len(parts) - 2]:
+        parts.pop()
+    return ' '.join(parts)
+
+
+def _set_octets(replies, attribute, value):
+    # RADIUS integers are 32 bits long, larger values need gigawords
+    replies[attribute] = ('=', str(value % GIGAWORD))
+    if value >= GIGAWORD:
+        replies[f'{attribute}-Gigawords'] = ('=', str(value // GIGAWORD))
+
+
+def compile_quota(quota, checks, replies):
+    """
+    Adds the attributes of ``quota`` to the ``checks``
+    and ``replies`` dicts ({attribute: (op, value)})
+    """
+    interval = quota.reset_counters_interval
+    traffic_attribute = app_settings.QUOTA_TRAFFIC_CHECK_ATTRIBUTES.get(interval)
+    if quota.transfer_limit and traffic_attribute:
+        checks[traffic_attribute] = (':=', str(quota.transfer_limit))
+    if quota.download_limit:
+        _set_octets(replies, DOWNLOAD_LIMIT_ATTRIBUTE, quota.download_limit)
+    if quota.upload_limit:
+        _set_octets(replies, UPLOAD_LIMIT_ATTRIBUTE, quota.upload_limit)
+    rate_limit = get_rate_limit(quota)
+    if rate_limit:
+        replies[RATE_LIMIT_ATTRIBUTE] = ('=', rate_limit)
+
+
+def compile_plans(plans):
+    """
+    Returns the attributes of the RADIUS groups of ``plans``:
+    ``{group_id: (group_name, checks, replies)}``.
+
+    When a plan has more quotas, the quotas with higher
+    priority override the others. The groups of plans without
+    quotas get no attributes, hence the attributes written for
+    quotas which were removed from the plan are deleted.
+    """
+    plans = [plan for plan in plans if plan.radius_group_id]
+    plan_quotas = {}
+    for plan_quota in (
+        PlanQuota.objects.filter(plan__in=plans)
+        .select_related('quota')
+        .order_by('-quota__priority', 'created')
+    ):
+        plan_quotas.setdefault(plan_quota.plan_id, []).append(plan_quota.quota)
+    compiled = {}
+    for plan in plans:
+        group = plan.radius_group
+        _, checks, replies = compiled.setdefault(group.pk, (group.name, {}, {}))
+        for quota in plan_quotas.get(plan.pk, []):
+            compile_quota(quota, checks, replies)
+    return compiled
+
+
+def _apply(model, kind, compiled, index, managed):
+    """
+    Diffs the ``compiled`` attributes of the groups with the
+    rows of ``model`` and applies the difference in bulk.
+
+    The rows which are not compiled anymore are deleted only if
+    the compiler wrote them, the compiled rows are recorded.
+
+    :return: set of the IDs of the groups whose attributes changed
+    """
+    owned = {
+        (group_id, attribute): pk
+        for pk, group_id, attribute in CompiledRadiusAttribute.objects.filter(
+            group_id__in=compiled, kind=kind
+        ).values_list('pk', 'group_id', 'attribute')
+    }
+    existing = {}
+    to_delete = []
+    for row in model.objects.filter(group_id__in=compiled, attribute__in=managed):
+        key = (row.group_id, row.attribute)
+        if key not in owned and row.attribute not in compiled[row.group_id][index]:
+            # not written by the compiler
+            continue
+        if key in existing:
+            # duplicated attributes are not valid in a group
+            to_delete.append(row.pk)
+        else:
+            existing[key] = row
+    to_create, to_update = [], []
+    changed = set()
+    compiled_keys = set()
+    now = timezone.now()
+    for group_id, values in compiled.items():
+        group_name, attributes = values[0], values[index]
+        for attribute, (op, value) in attributes.items():
+            compiled_keys.add((group_id, attribute))
+            row = existing.pop((group_id, attribute), None)
+            if row is None:
+                to_create.append(
+                    model(
+                        group_id=group_id,
+                        groupname=group_name,
+                        attribute=attribute,
+                        op=op,
+                        value=value,
+                    )
+                )
+            elif row.op != op or row.value != value:
+                row.op, row.value, row.modified = op, value, now
+                to_update.append(row)
+            else:
+                continue
+            changed.add(group_id)
+    for (group_id, _), row in existing.items():
+        to_delete.append(row.pk)
+        changed.add(group_id)
+    model.objects.bulk_create(to_create)
+    model.objects.bulk_update(to_update, ['op', 'value', 'modified'])
+    if to_delete:
+        model.objects.filter(pk__in=to_delete).delete()
+    _record(kind, owned, compiled_keys)
+    return changed
+
+
+def _record(kind, owned, compiled_keys):
+    """
+    Updates the records of the attributes written by the compiler
+    """
+    stale = [pk for key, pk in owned.items() if key not in compiled_keys]
+    if stale:
+        CompiledRadiusAttribute.objects.filter(pk__in=stale).delete()
+    CompiledRadiusAttribute.objects.bulk_create(
+        [
+            CompiledRadiusAttribute(group_id=group_id, kind=kind, attribute=attribute)
+            for group_id, attribute in compiled_keys
+            if (group_id, attribute) not in owned
+        ]
+    )
+
+
+def sync_plans(plans, group_ids=()):
+    """
+    Writes the compiled attributes of ``plans`` to the checks and
+    replies of their RADIUS groups, rows are only written if they differ.
+
+    ``group_ids`` are the groups which some plans stopped using (the
+    plan was deleted or moved to another group): they are compiled
+    from the plans which still use them or cleared if there are none.
+
+    :return: dict {group ID: reply attributes} of the groups
+             whose attributes changed
+    """
+    plans = list(plans)
+    group_ids = [pk for pk in group_ids if pk]
+    if group_ids:
+        plans += Plan.objects.filter(radius_group_id__in=group_ids).exclude(
+            pk__in=[plan.pk for plan in plans]
+        ).select_related('radius_group')
+    compiled = compile_plans(plans)
+    for group in RadiusGroup.objects.filter(pk__in=group_ids).exclude(
+        pk__in=compiled
+    ):
+        compiled[group.pk] = (group.name, {}, {})
+    if not compiled:
+        return {}
+    with transaction.atomic():
+        changed = _apply(
+            RadiusGroupCheck,
+            CompiledRadiusAttribute.CHECK,
+            compiled,
+            1,
+            get_managed_check_attributes(),
+        )
+        changed |= _apply(
+            RadiusGroupReply,
+            CompiledRadiusAttribute.REPLY,
+            compiled,
+            2,
+            get_managed_reply_attributes(),
+        )
+    logger.info(f'RADIUS attributes of {len(changed)} groups updated')
+    return {
+        group_id: {
+            attribute: value for attribute, (_, value) in compiled[group_id][2].items()
+        }
+        for group_id in changed
+    }
+
+
+def get_users_with_open_sessions(group_ids):
+    """
+    Returns (user ID, group ID) tuples of the members of the
+    groups which have at least one open accounting session.
+    """
+    open_sessions = RadiusAccounting.objects.filter(stop_time__isnull=True).values(
+        'username'
+    )
+    return (
+        RadiusUserGroup.objects.filter(
+            group_id__in=group_ids,
+            user_id__isnull=False,
+            username__in=open_sessions,
+        )
+        .values_list('user_id', 'group_id')
+        .distinct()
+    )
+
+
+def get_plans_of_quotas(quota_ids):
+    return Plan.objects.filter(planquota__quota_id__in=quota_ids).select_related(
+        'radius_group'
+    ).distinct()
@@ -1,6 +1,7 @@
 import datetime
 import logging
 
+from celery import shared_task
 from django.conf import settings
 from django.contrib.auth import get_user_model
 
@@ -66,3 +67,54 @@ def expire_account():
             userplan__active=True, userplan__expire__in=days
         ):
             user.userplan.remind_expire_soon()
+
+
+@shared_task
+def process_payment_events(provider, reference):
+    from .webhooks import process_events
+
+    return process_events(provider, reference)
+
+
+@shared_task
+def process_pending_payment_events():
+    """
+    Retries the payment events which were not processed, either
+    because the worker was not reachable when they were received
+    or because processing failed.
+    """
+    from .webhooks import get_pending_references, process_events
+
+    max_attempts = getattr(settings, "PLANS_PAYMENT_EVENT_MAX_ATTEMPTS", 10)
+    for provider, reference in get_pending_references(max_attempts=max_attempts):
+        process_events(provider, reference)
+
+
+@shared_task
+def aggregate_usage():
+    from .usage import aggregate_usage
+
+    return aggregate_usage()['updated']
+
+
+@shared_task
+def sync_quota_radius_attributes(plan_ids, group_ids=None):
+    """
+    Syncs the RADIUS attributes of the groups of the plans (and of the
+    groups which the plans stopped using) and sends a CoA request to
+    the users of the groups whose attributes changed
+    """
+    from openwisp_radius.tasks import perform_change_of_authorization
+
+    from .models import Plan
+    from .radius import get_users_with_open_sessions, sync_plans
+
+    plans = Plan.objects.filter(pk__in=plan_ids).select_related("radius_group")
+    changed = sync_plans(plans, group_ids or [])
+    for user_id, group_id in get_users_with_open_sessions(changed.keys()):
+        perform_change_of_authorization.delay(
+            user_id=user_id,
+            old_group_id=str(group_id),
+            new_group_id=str(group_id),
+            extra_attributes=changed[group_id],
+        )
@@ -1,15 +1,45 @@
 # tests.py
 
-from django.test import TestCase, RequestFactory
+import csv
+import os
+import tempfile
+from io import StringIO
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
 from django.contrib.admin.sites import AdminSite
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
 
 from openwisp_users.models import Organization
-from .models import Plan, UserPlan
+from swapper import load_model
+
+from .models import (
+    BillingInfo, CompiledRadiusAttribute, Invoice, Order, Payment, PaymentEvent, Plan, PlanQuota,
+    Quota, UserPlan, UserUsage,
+)
 from .admin import PlanAdmin, UserPlanAdmin
+from .base.models import get_number_template
+from .context_processors import account_status, get_no_userplan_cache_key
+from .invoicing import MANIFEST_NAME, create_invoices, export_invoices, get_orders_for_invoicing
+from .payment_variant.client import PaystackClient, metrics
+from .payment_variant.fake_paystack import FakePaystack, FakePaystackServer
+from .radius import compile_quota, sync_plans
+from .usage import aggregate_usage, reset_usage
+from .webhooks import process_events
 from openwisp_utils.utils import get_db_for_organization
 
 User = get_user_model()
+RadiusAccounting = load_model('openwisp_radius', 'RadiusAccounting')
+RadiusGroup = load_model('openwisp_radius', 'RadiusGroup')
+RadiusGroupCheck = load_model('openwisp_radius', 'RadiusGroupCheck')
+RadiusGroupReply = load_model('openwisp_radius', 'RadiusGroupReply')
 
 class MockRequest:
     def __init__(self, user):
@@ -76,3 +106,401 @@ class OrganizationAdminTests(TestCase):
         self.assertEqual(
             UserPlan.objects.using(get_db_for_organization(self.org1)).count(), 1
         )
+
+
+class BatchInvoicingTests(TestCase):
+
+    def setUp(self):
+        self.org = Organization.objects.create(name='GIES', slug='gies')
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='password')
+        BillingInfo.objects.create(
+            user=self.user, organization=self.org, name='Buyer',
+            street='Street 1', zipcode='00-000', city='Accra', country='GH',
+        )
+        self.plan = Plan.objects.create(name='Plan 1', slug='plan-1', price='10.00', organization=self.org)
+        self.quota = Quota.objects.create(name='quota-1', organization=self.org)
+
+    def _create_completed_order(self):
+        return Order.objects.create(
+            user=self.user, organization=self.org, plan=self.plan, quota=self.quota,
+            amount=Decimal('10.00'), tax=Decimal('23.00'), status=Order.STATUS.COMPLETED, completed=timezone.now(),
+        )
+
+    def test_create_invoices_skips_invoiced_orders(self):
+        order1 = self._create_completed_order()
+        self._create_completed_order()
+        Invoice.create(order1, Invoice.INVOICE_TYPES.INVOICE)
+        orders = get_orders_for_invoicing(Invoice.INVOICE_TYPES.INVOICE)
+        created, skipped = create_invoices(orders, Invoice.INVOICE_TYPES.INVOICE, chunk_size=1)
+        self.assertEqual(len(created), 1)
+        self.assertEqual(skipped, 0)
+        self.assertEqual(Invoice.invoices.count(), 2)
+        created, skipped = create_invoices(orders, Invoice.INVOICE_TYPES.INVOICE)
+        self.assertEqual(created, [])
+
+    def test_invoice_number_template_is_cached(self):
+        invoice = Invoice.create(self._create_completed_order(), Invoice.INVOICE_TYPES.INVOICE)
+        get_number_template.cache_clear()
+        self.assertEqual(invoice.get_full_number(), invoice.get_full_number())
+        info = get_number_template.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 1))
+        with self.subTest('A new format is compiled'):
+            with override_settings(PLANS_INVOICE_NUMBER_FORMAT='{{ invoice.number }}/X'):
+                self.assertEqual(invoice.get_full_number(), f'{invoice.number}/X')
+            self.assertEqual(get_number_template.cache_info().misses, 2)
+
+    def test_benchmark_templates_command(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_templates', stdout=StringIO())
+        User.objects.create_superuser(username='admin', email='admin@example.com', password='tester')
+        stdout, stderr = StringIO(), StringIO()
+        call_command('benchmark_templates', iterations=2, stdout=stdout, stderr=stderr)
+        output = stdout.getvalue() + stderr.getvalue()
+        self.assertIn('median', stdout.getvalue())
+        # the templates which cannot be rendered are reported
+        self.assertIn('admin index', output)
+        self.assertIn('gmtisp_billing/mail/invoice_created_body.txt', output)
+
+    def test_export_invoices_writes_manifest(self):
+        invoice = Invoice.create(self._create_completed_order(), Invoice.INVOICE_TYPES.INVOICE)
+        with tempfile.TemporaryDirectory() as output_dir:
+            result = export_invoices(Invoice.invoices.all(), output_dir, pdf=False)
+            self.assertEqual(result['count'], 1)
+            with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual(rows[0]['full_number'], invoice.full_number)
+            self.assertTrue(os.path.exists(os.path.join(output_dir, rows[0]['html_file'])))
+
+
+@override_settings(PAYSTACK_SECRET_KEY='sk_test_fake')
+class PaystackWebhookTests(TestCase):
+
+    def setUp(self):
+        self.paystack = FakePaystack('sk_test_fake')
+        self.org = Organization.objects.create(name='GIES', slug='gies')
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='password')
+        plan = Plan.objects.create(name='Plan 1', slug='plan-1', price='10.00', organization=self.org)
+        quota = Quota.objects.create(name='quota-1', organization=self.org)
+        PlanQuota.objects.create(plan=plan, quota=quota, organization=self.org)
+        # completing the order extends the plan of the buyer
+        UserPlan.objects.create(user=self.user, plan=plan, organization=self.org, active=False)
+        self.order = Order.objects.create(
+            user=self.user, organization=self.org, plan=plan, quota=quota, amount=Decimal('10.00'),
+        )
+        self.payment = Payment.objects.create(
+            user=self.user, order=self.order, organization=self.org, amount=Decimal('10.00'),
+            method='Paystack', status=Payment.WAITING, transaction_ref='ref-1',
+        )
+
+    def test_invalid_signature(self):
+        response = self.paystack.deliver(self.client, self.paystack.event('ref-1'), signature='wrong')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(PaymentEvent.objects.count(), 0)
+
+    @mock.patch('gmtisp_billing.tasks.process_payment_events.delay')
+    def test_duplicate_delivery_stored_once(self, delay):
+        payload = self.paystack.event('ref-1')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.paystack.deliver(self.client, payload).status_code, 200)
+            self.assertEqual(self.paystack.deliver(self.client, payload).status_code, 200)
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+        delay.assert_called_once_with('paystack', 'ref-1')
+
+    @mock.patch('gmtisp_billing.tasks.process_payment_events.delay')
+    def test_process_events_confirms_payment(self, delay):
+        self.paystack.deliver(self.client, self.paystack.event('ref-1'))
+        self.assertEqual(process_events('paystack', 'ref-1'), 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, self.payment.CONFIRMED)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.STATUS.COMPLETED)
+        self.assertIsNotNone(UserPlan.objects.get(user=self.user).expire)
+        self.assertIsNotNone(PaymentEvent.objects.get().processed)
+        # already processed events are not applied again
+        self.assertEqual(process_events('paystack', 'ref-1'), 0)
+
+
+class PaystackClientTests(SimpleTestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def _get_client(self, server):
+        return PaystackClient('sk_test_fake', base_url=server.url, backoff_factor=0.01)
+
+    def test_connection_is_reused(self):
+        with FakePaystackServer() as server:
+            client = self._get_client(server)
+            for reference in ['ref-1', 'ref-2', 'ref-3']:
+                response = client.verify_transaction(reference)
+                self.assertEqual(response.json()['data']['reference'], reference)
+        self.assertEqual(len(server.client_ports), 1)
+
+    def test_idempotent_calls_are_retried(self):
+        with FakePaystackServer(failures=2) as server:
+            response = self._get_client(server).verify_transaction('ref-1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(server.requests), 3)
+        data = metrics.snapshot()[('paystack', '/transaction/verify')]
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['errors'], 0)
+
+    def test_post_is_not_retried(self):
+        with FakePaystackServer(failures=1) as server:
+            response = self._get_client(server).initialize_transaction({'reference': 'ref-1'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(metrics.snapshot()[('paystack', '/transaction/initialize')]['errors'], 1)
+
+
+class UsageAggregationTests(TestCase):
+
+    def setUp(self):
+        self.org = Organization.objects.create(name='GIES', slug='gies')
+        self.user = User.objects.create_user(username='tester', email='tester@example.com', password='password')
+
+    def _create_session(self, unique_id, stop_time=None, **kwargs):
+        options = dict(
+            unique_id=unique_id, session_id=unique_id, username='tester', organization=self.org,
+            nas_ip_address='127.0.0.1', input_octets=100, output_octets=200, session_time=60,
+            stop_time=stop_time,
+        )
+        options.update(kwargs)
+        return RadiusAccounting.objects.create(**options)
+
+    def test_closed_sessions_are_folded_once(self):
+        now = timezone.now()
+        self._create_session('s1', stop_time=now - timedelta(hours=2))
+        self._create_session('s2', stop_time=now - timedelta(hours=1))
+        self._create_session('s3')
+        aggregate_usage(until=now - timedelta(minutes=30))
+        aggregate_usage(until=now - timedelta(minutes=20))
+        usage = UserUsage.objects.get(user=self.user, organization=self.org)
+        self.assertEqual(usage.total_upload, 200)
+        self.assertEqual(usage.total_download, 400)
+        self.assertEqual(usage.total_uptime, timedelta(seconds=120))
+        self.assertEqual(usage.active_sessions, 1)
+
+        self._create_session('s4', stop_time=now - timedelta(minutes=10))
+        self.assertEqual(aggregate_usage(until=now)['updated'], 1)
+        usage.refresh_from_db()
+        self.assertEqual(usage.total_download, 600)
+
+    def test_duplicate_stop(self):
+        now = timezone.now()
+        session = self._create_session('s1', stop_time=now - timedelta(hours=2))
+        aggregate_usage(until=now - timedelta(hours=1))
+        # a retransmitted Stop moves stop_time forward, past the watermark
+        session.stop_time = now - timedelta(minutes=30)
+        session.save()
+        self.assertEqual(aggregate_usage(until=now)['updated'], 0)
+        usage = UserUsage.objects.get(user=self.user, organization=self.org)
+        self.assertEqual(usage.total_upload, 100)
+        self.assertEqual(usage.total_download, 200)
+        self.assertEqual(usage.total_uptime, timedelta(seconds=60))
+
+    def test_interim_update_after_stop(self):
+        now = timezone.now()
+        session = self._create_session('s1', stop_time=now - timedelta(hours=3))
+        aggregate_usage(until=now - timedelta(hours=2))
+        # a late Interim-Update reopens the session with grown counters
+        session.stop_time = None
+        session.input_octets = 150
+        session.output_octets = 300
+        session.session_time = 90
+        session.save()
+        aggregate_usage(until=now - timedelta(hours=1))
+        usage = UserUsage.objects.get(user=self.user, organization=self.org)
+        self.assertEqual(usage.total_download, 200)
+        self.assertEqual(usage.active_sessions, 1)
+        # then it is closed again
+        session.stop_time = now - timedelta(minutes=30)
+        session.save()
+        aggregate_usage(until=now)
+        usage.refresh_from_db()
+        self.assertEqual(usage.total_upload, 150)
+        self.assertEqual(usage.total_download, 300)
+        self.assertEqual(usage.total_uptime, timedelta(seconds=90))
+        self.assertEqual(usage.active_sessions, 0)
+
+    def test_reset_usage(self):
+        now = timezone.now()
+        self._create_session('s1', stop_time=now - timedelta(hours=2))
+        aggregate_usage(until=now)
+        reset_usage()
+        aggregate_usage(until=now)
+        usage = UserUsage.objects.get(user=self.user, organization=self.org)
+        self.assertEqual(usage.total_download, 200)
+
+
+class QuotaRadiusSyncTests(TestCase):
+
+    def setUp(self):
+        self.org = Organization.objects.create(name='GIES', slug='gies')
+        self.group = RadiusGroup.objects.create(name='gies-plan-1', organization=self.org)
+        self.plan = Plan.objects.create(
+            name='Plan 1', slug='plan-1', organization=self.org, radius_group=self.group
+        )
+        self.quota = Quota.objects.create(
+            name='quota-1', organization=self.org, transfer_limit=2**33,
+            download_limit=2**33, reset_counters_interval='daily',
+            rate_limit_rx=1000000, rate_limit_tx=2000000,
+        )
+        self.quota.refresh_from_db()
+        self.plan_quota = PlanQuota.objects.create(
+            plan=self.plan, quota=self.quota, organization=self.org
+        )
+
+    def test_compile_quota(self):
+        checks, replies = {}, {}
+        compile_quota(self.quota, checks, replies)
+        self.assertEqual(checks['Max-Daily-Session-Traffic'], (':=', str(2**33)))
+        # the uptime limit is the validity of the plan, not a session limit
+        self.assertNotIn('Max-Daily-Session', checks)
+        self.assertEqual(replies['Mikrotik-Xmit-Limit'], ('=', '0'))
+        self.assertEqual(replies['Mikrotik-Xmit-Limit-Gigawords'], ('=', '2'))
+        self.assertEqual(replies['Mikrotik-Rate-Limit'], ('=', '1000000/2000000'))
+
+    def test_sync_plans_applies_differences_only(self):
+        RadiusGroupCheck.objects.create(
+            group=self.group, groupname=self.group.name, attribute='Simultaneous-Use', op=':=', value='1'
+        )
+        changed = sync_plans([self.plan])
+        self.assertIn(self.group.pk, changed)
+        self.assertEqual(RadiusGroupCheck.objects.filter(group=self.group).count(), 2)
+        self.assertEqual(RadiusGroupReply.objects.filter(group=self.group).count(), 3)
+        self.assertEqual(sync_plans([self.plan]), {})
+
+        self.quota.download_limit = 0
+        self.quota.save()
+        self.assertIn(self.group.pk, sync_plans([self.plan]))
+        self.assertEqual(RadiusGroupReply.objects.filter(group=self.group).count(), 1)
+        # attributes which are not managed by billing are preserved
+        self.assertTrue(RadiusGroupCheck.objects.filter(attribute='Simultaneous-Use').exists())
+
+    def test_sync_plans_without_quotas(self):
+        sync_plans([self.plan])
+        self.plan_quota.delete()
+        self.assertIn(self.group.pk, sync_plans([self.plan]))
+        self.assertFalse(RadiusGroupCheck.objects.filter(group=self.group).exists())
+        self.assertFalse(RadiusGroupReply.objects.filter(group=self.group).exists())
+
+    def test_sync_plans_preserves_attributes_set_by_hand(self):
+        users_group = RadiusGroup.objects.create(name='gies-custom', organization=self.org)
+        Plan.objects.create(
+            name='Plan 2', slug='plan-2', organization=self.org, radius_group=users_group
+        )
+        check = RadiusGroupCheck.objects.create(
+            group=users_group, groupname=users_group.name,
+            attribute='Max-Daily-Session-Traffic', op=':=', value='3000000000',
+        )
+        RadiusGroupReply.objects.create(
+            group=users_group, groupname=users_group.name,
+            attribute='Mikrotik-Rate-Limit', op='=', value='1M/1M',
+        )
+        monthly = RadiusGroupCheck.objects.create(
+            group=self.group, groupname=self.group.name,
+            attribute='Max-Monthly-Session-Traffic', op=':=', value='1',
+        )
+        # the group of the plan without quotas is not touched
+        self.assertNotIn(users_group.pk, sync_plans(Plan.objects.all()))
+        check.refresh_from_db()
+        self.assertEqual(check.value, '3000000000')
+        self.assertTrue(RadiusGroupReply.objects.filter(group=users_group).exists())
+        self.plan_quota.delete()
+        sync_plans([self.plan])
+        # only the attributes written by the compiler are deleted
+        self.assertEqual(list(RadiusGroupCheck.objects.filter(group=self.group)), [monthly])
+        self.assertFalse(CompiledRadiusAttribute.objects.filter(group=self.group).exists())
+
+    def test_sync_plans_radius_group_changed(self):
+        sync_plans([self.plan])
+        new_group = RadiusGroup.objects.create(name='gies-plan-1-new', organization=self.org)
+        self.plan.radius_group = new_group
+        self.plan.save()
+        changed = sync_plans([self.plan], [self.group.pk])
+        self.assertEqual(set(changed), {self.group.pk, new_group.pk})
+        self.assertFalse(RadiusGroupCheck.objects.filter(group=self.group).exists())
+        self.assertFalse(RadiusGroupReply.objects.filter(group=self.group).exists())
+        self.assertEqual(RadiusGroupReply.objects.filter(group=new_group).count(), 3)
+
+    @mock.patch('gmtisp_billing.tasks.sync_quota_radius_attributes.delay')
+    def test_radius_group_changed_listener(self, delay):
+        new_group = RadiusGroup.objects.create(name='gies-plan-1-new', organization=self.org)
+        self.plan.radius_group = new_group
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan.save()
+        delay.assert_called_once_with([str(self.plan.pk)], [str(self.group.pk)])
+
+
+class AccountStatusTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.org = Organization.objects.create(name='GIES', slug='gies')
+        self.user = User.objects.create_user(username='tester', email='tester@example.com', password='password')
+        UserPlan.objects.filter(user=self.user).delete()
+
+    def _get_request(self):
+        request = RequestFactory().get('/')
+        # a fresh instance, as the one returned by the authentication middleware
+        request.user = User.objects.get(pk=self.user.pk)
+        return request
+
+    def _get_context(self):
+        return account_status(self._get_request())
+
+    def test_values_are_lazy(self):
+        plan = Plan.objects.create(name='Plan 1', slug='plan-1', price='10.00', organization=self.org)
+        UserPlan.objects.create(
+            user=self.user, plan=plan, organization=self.org, active=True,
+            expire=timezone.now() + timedelta(days=5, hours=1),
+        )
+        with self.assertNumQueries(1):
+            context = self._get_context()
+        with self.assertNumQueries(1):
+            self.assertFalse(context['ACCOUNT_EXPIRED'])
+            self.assertFalse(context['ACCOUNT_NOT_ACTIVE'])
+            self.assertEqual(context['EXPIRE_IN_DAYS'], 5)
+        self.assertEqual(str(context['EXTEND_URL']), reverse('current_plan'))
+        self.assertEqual(str(context['ACTIVATE_URL']), reverse('account_activation'))
+
+    @mock.patch('gmtisp_billing.context_processors.is_shared_cache', mock.Mock(return_value=True))
+    def test_users_without_plan_are_cached(self):
+        with self.assertNumQueries(2):
+            self.assertFalse(self._get_context()['ACCOUNT_EXPIRED'])
+        with self.assertNumQueries(1):
+            context = self._get_context()
+            self.assertFalse(context['ACCOUNT_EXPIRED'])
+            self.assertEqual(str(context['EXTEND_URL']), '')
+
+        with self.subTest('A new plan clears the cache'):
+            plan = Plan.objects.create(name='Plan 1', slug='plan-1', price='10.00', organization=self.org)
+            UserPlan.objects.create(user=self.user, plan=plan, organization=self.org, active=False)
+            self.assertTrue(self._get_context()['ACCOUNT_NOT_ACTIVE'])
+
+    def test_users_without_plan_local_cache(self):
+        # the other processes would not see the deletion of the entry
+        for _ in range(2):
+            with self.assertNumQueries(2):
+                self.assertFalse(self._get_context()['ACCOUNT_EXPIRED'])
+        self.assertIsNone(cache.get(get_no_userplan_cache_key(self.user.pk)))
+
+    def test_expiration_messages(self):
+        plan = Plan.objects.create(name='Plan 1', slug='plan-1', price='10.00', organization=self.org)
+        userplan = UserPlan.objects.create(
+            user=self.user, plan=plan, organization=self.org, active=True,
+            expire=timezone.now() + timedelta(days=5, hours=1),
+        )
+        template = 'gmtisp_billing/plans/expiration_messages.html'
+        html = render_to_string(template, request=self._get_request())
+        self.assertIn('Your account will expire soon (in 5 days)', html)
+        self.assertIn(reverse('current_plan'), html)
+        self.assertNotIn('Your account has expired', html)
+
+        with self.subTest('No warning for distant expiration'):
+            userplan.expire = timezone.now() + timedelta(days=30)
+            userplan.save()
+            html = render_to_string(template, request=self._get_request())
+            self.assertNotIn('Your account will expire soon', html)
@@ -0,0 +1,287 @@
+"""
+Incremental aggregation of the RADIUS accounting data into ``UserUsage``.
+
+Every run picks the radacct rows which were closed between the previous
+watermark and now (minus a safety lag that leaves time to in-flight
+accounting transactions to commit), so the accounting table is never
+rescanned. ``stop_time`` is used as the watermark column: it is indexed
+and the accounting API (as well as ``close_stale_sessions``) sets it to
+the server time when the session is closed.
+
+A session can be closed more than once: duplicate Stop packets move its
+``stop_time`` forward and Interim-Update packets received after the Stop
+reopen it. The counters already folded are stored per session
+(``UsageFoldedSession``), hence only what changed since the previous
+fold is added to the totals.
+
+The number of active sessions is recomputed on each run from the
+open sessions, which are few compared to the closed ones.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from swapper import load_model
+
+from .models import UsageFoldedSession, UsageWatermark, UserUsage
+
+logger = logging.getLogger(__name__)
+
+RadiusAccounting = load_model('openwisp_radius', 'RadiusAccounting')
+User = get_user_model()
+
+WATERMARK_NAME = 'radacct-usage'
+
+
+def get_aggregation_lag():
+    return timedelta(seconds=getattr(settings, 'PLANS_USAGE_AGGREGATION_LAG', 60))
+
+
+def get_chunk_size():
+    return getattr(settings, 'PLANS_USAGE_AGGREGATION_CHUNK_SIZE', 1000)
+
+
+def get_folded_session_retention():
+    return timedelta(days=getattr(settings, 'PLANS_USAGE_FOLDED_SESSION_RETENTION', 90))
+
+
+def _get_closed_sessions(start, end):
+    """
+    Returns the traffic and uptime of the sessions closed
+    in the (``start``, ``end``] window.
+    """
+    queryset = RadiusAccounting.objects.filter(stop_time__lte=end)
+    if start:
+        queryset = queryset.filter(stop_time__gt=start)
+    return queryset.values_list(
+        'unique_id',
+        'organization_id',
+        'username',
+        # input octets are received by the NAS, hence sent by the user
+        'input_octets',
+        'output_octets',
+        'session_time',
+    ).order_by()
+
+
+def _get_user_ids(usernames):
+    return dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+
+def _get_session_deltas(sessions):
+    """
+    Returns the traffic and uptime of ``sessions`` which were not folded
+    yet, grouped by organization and username, and records them as folded
+    """
+    folded = UsageFoldedSession.objects.in_bulk(
+        [session[0] for session in sessions], field_name='unique_id'
+    )
+    totals = {}
+    to_update, to_create = [], []
+    for unique_id, organization_id, username, upload, download, uptime in sessions:
+        current = (upload or 0, download or 0, uptime or 0)
+        record = folded.get(unique_id)
+        if record is None:
+            record = UsageFoldedSession(unique_id=unique_id)
+            to_create.append(record)
+        else:
+            to_update.append(record)
+        previous = (record.upload, record.download, record.uptime)
+        # counters never decrease, lower values (eg: out of order
+        # packets) must not be folded again when they grow back
+        delta = [max(value - old, 0) for value, old in zip(current, previous)]
+        record.upload, record.download, record.uptime = (
+            max(value, old) for value, old in zip(current, previous)
+        )
+        if not any(delta):
+            continue
+        row = totals.setdefault(
+            (organization_id, username), {'upload': 0, 'download': 0, 'uptime': 0}
+        )
+        row['upload'] += delta[0]
+        row['download'] += delta[1]
+        row['uptime'] += delta[2]
+    now = timezone.now()
+    for record in to_update:
+        record.modified = now
+    UsageFoldedSession.objects.bulk_create(to_create)
+    UsageFoldedSession.objects.bulk_update(
+        to_update, ['upload', 'download', 'uptime', 'modified']
+    )
+    return totals
+
+
+def _fold_chunk(sessions):
+    """
+    Adds the traffic and uptime of ``sessions`` which were not folded yet
+    to the usage of the users, creating the missing ``UserUsage`` objects.
+    """
+    totals = _get_session_deltas(sessions)
+    user_ids = _get_user_ids({username for _, username in totals})
+    deltas = {}
+    for (organization_id, username), row in totals.items():
+        user_id = user_ids.get(username)
+        if user_id is None:
+            continue
+        deltas[(organization_id, user_id)] = row
+    if not deltas:
+        return 0
+    existing = {
+        (usage.organization_id, usage.user_id): usage
+        for usage in UserUsage.objects.filter(
+            organization_id__in={key[0] for key in deltas},
+            user_id__in={key[1] for key in deltas},
+        )
+    }
+    to_update, to_create = [], []
+    for key, row in deltas.items():
+        usage = existing.get(key)
+        if usage is None:
+            usage = UserUsage(organization_id=key[0], user_id=key[1])
+            to_create.append(usage)
+        else:
+            to_update.append(usage)
+        usage.total_upload += row['upload']
+        usage.total_download += row['download']
+        usage.total_uptime = _as_timedelta(usage.total_uptime) + timedelta(
+            seconds=row['uptime']
+        )
+    now = timezone.now()
+    for usage in to_update:
+        usage.modified = now
+    UserUsage.objects.bulk_create(to_create)
+    UserUsage.objects.bulk_update(
+        to_update, ['total_upload', 'total_download', 'total_uptime', 'modified']
+    )
+    return len(deltas)
+
+
+def _as_timedelta(value):
+    # unsaved instances hold the string default of the field
+    if isinstance(value, timedelta):
+        return value
+    hours, minutes, seconds = value.split(':')
+    return timedelta(hours=int(hours), minutes=int(minutes), seconds=float(seconds))
+
+
+def _update_active_sessions(chunk_size):
+    open_sessions = (
+        RadiusAccounting.objects.filter(stop_time__isnull=True)
+        .values('organization_id', 'username')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    active = {}
+    for row in open_sessions.iterator(chunk_size=chunk_size):
+        active.setdefault(row['username'], []).append(
+            (row['organization_id'], row['count'])
+        )
+    user_ids = {}
+    usernames = list(active)
+    for index in range(0, len(usernames), chunk_size):
+        user_ids.update(_get_user_ids(usernames[index : index + chunk_size]))
+    counts = {}
+    for username, values in active.items():
+        if username in user_ids:
+            for organization_id, count in values:
+                counts[(organization_id, user_ids[username])] = count
+
+    to_update = []
+    seen = set()
+    usages = UserUsage.objects.filter(active_sessions__gt=0).only(
+        'id', 'organization_id', 'user_id', 'active_sessions'
+    )
+    for usage in usages.iterator(chunk_size=chunk_size):
+        seen.add((usage.organization_id, usage.user_id))
+        count = counts.get((usage.organization_id, usage.user_id), 0)
+        if usage.active_sessions != count:
+            usage.active_sessions = count
+            to_update.append(usage)
+    missing = [key for key in counts if key not in seen]
+    for index in range(0, len(missing), chunk_size):
+        keys = missing[index : index + chunk_size]
+        existing = {
+            (usage.organization_id, usage.user_id): usage
+            for usage in UserUsage.objects.filter(
+                user_id__in={key[1] for key in keys}
+            ).only('id', 'organization_id', 'user_id', 'active_sessions')
+        }
+        to_create = []
+        for key in keys:
+            usage = existing.get(key)
+            if usage is None:
+                to_create.append(
+                    UserUsage(
+                        organization_id=key[0],
+                        user_id=key[1],
+                        active_sessions=counts[key],
+                    )
+                )
+            else:
+                usage.active_sessions = counts[key]
+                to_update.append(usage)
+        UserUsage.objects.bulk_create(to_create)
+    UserUsage.objects.bulk_update(to_update, ['active_sessions'], batch_size=chunk_size)
+
+
+def aggregate_usage(chunk_size=None, until=None):
+    """
+    Folds the accounting sessions closed since the last run into
+    ``UserUsage`` and refreshes the number of active sessions.
+
+    The run happens in a single transaction which holds a lock on the
+    watermark: concurrent runs wait for each other and a failed run
+    does not move the watermark, so sessions are never counted twice.
+
+    :return: dict with the aggregation window and the number of
+             usage objects which were updated
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    end = until or timezone.now() - get_aggregation_lag()
+    with transaction.atomic():
+        UsageWatermark.objects.get_or_create(name=WATERMARK_NAME)
+        watermark = UsageWatermark.objects.select_for_update().get(
+            name=WATERMARK_NAME
+        )
+        start = watermark.value
+        if start and start >= end:
+            return {'start': start, 'end': start, 'updated': 0}
+        updated = 0
+        chunk = []
+        rows = _get_closed_sessions(start, end)
+        for row in rows.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                updated += _fold_chunk(chunk)
+                chunk = []
+        if chunk:
+            updated += _fold_chunk(chunk)
+        _update_active_sessions(chunk_size)
+        # sessions are not closed again after such a long time
+        UsageFoldedSession.objects.filter(
+            modified__lt=end - get_folded_session_retention()
+        ).delete()
+        watermark.value = end
+        watermark.save()
+    logger.info(f'Usage aggregated from {start} to {end}: {updated} users updated')
+    return {'start': start, 'end': end, 'updated': updated}
+
+
+def reset_usage():
+    """
+    Clears the usage totals and the watermark,
+    the next run aggregates the whole accounting table.
+    """
+    with transaction.atomic():
+        UserUsage.objects.update(
+            total_download=0,
+            total_upload=0,
+            total_uptime=timedelta(0),
+            active_sessions=0,
+        )
+        UsageFoldedSession.objects.all().delete()
+        UsageWatermark.objects.filter(name=WATERMARK_NAME).update(value=None)
@@ -618,8 +618,15 @@ class PaymentDeleteView(LoginRequiredMixin, MultiTenantMixin, SuperuserPermissio
 # Paystack
 import requests
 import logging
+from celery.exceptions import OperationalError
+from django.db import transaction
 from django.utils.timezone import now
 
+from .models import PaymentEvent
+from .payment_variant.client import get_paystack_client
+from .tasks import process_payment_events
+from .webhooks import PAYSTACK, verify_paystack_signature
+
 logger = logging.getLogger(__name__)
 
 def paystack_initiate_payment(request, order_id=None):
@@ -657,13 +664,13 @@ def paystack_initiate_payment(request, order_id=None):
         "callback_url": request.build_absolute_uri(reverse('verify_payment'))
     }
 
-    headers = {
-        "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json"
-    }
-
     # Send request to Paystack to initialize payment
-    response = requests.post('https://api.paystack.co/transaction/initialize', json=payment_data, headers=headers)
+    try:
+        response = get_paystack_client().initialize_transaction(payment_data)
+    except requests.RequestException as e:
+        logger.error(f"Payment initiation failed: {e}")
+        payment.delete()
+        return JsonResponse({'error': 'Payment initiation failed'}, status=502)
 
     if response.status_code == 200:
         response_data = response.json()
@@ -683,13 +690,8 @@ def paystack_verify_payment(request):
     if not reference:
         return JsonResponse({'error': 'Reference is required'}, status=400)
 
-    headers = {
-        "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json"
-    }
-
     try:
-        response = requests.get(f'https://api.paystack.co/transaction/verify/{reference}', headers=headers)
+        response = get_paystack_client().verify_transaction(reference)
         response.raise_for_status()
         response_data = response.json()
 
@@ -739,45 +741,45 @@ def paystack_verify_payment(request):
 
 @csrf_exempt
 def paystack_webhook_view(request):
-    if request.method == 'POST':
-        try:
-            event_data = json.loads(request.body)
-            reference = event_data.get('data', {}).get('reference')
-
-            if not reference:
-                return JsonResponse({'error': 'Invalid data'}, status=400)
-
-            payment = get_object_or_404(Payment, transaction_ref=reference)
+    """
+    Stores the event in the payment event inbox and returns immediately,
+    the event is applied to the payment by a celery worker.
+    Deliveries are deduplicated on (event, reference) so that the
+    retries of Paystack are acknowledged without being processed twice.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
 
-            # Extract payment status from webhook data
-            payment_status = event_data.get('data', {}).get('status')
+    signature = request.headers.get('X-Paystack-Signature')
+    if not verify_paystack_signature(request.body, signature):
+        logger.warning('Paystack webhook received with an invalid signature')
+        return JsonResponse({'error': 'Invalid signature'}, status=401)
 
-            if payment_status == 'success':
-                # Update payment status to confirmed
-                payment.status = payment.CONFIRMED
-                payment.payment_date = now()  # Update payment date to current time
-                payment.save()
+    try:
+        event_data = json.loads(request.body)
+    except json.JSONDecodeError:
+        logger.error('Invalid payload received', exc_info=True)
+        return JsonResponse({'error': 'Invalid payload'}, status=400)
 
-                # Complete the associated order
-                payment.order.complete_order()  # Assuming you have a related order
-                # Optionally trigger additional tasks
-                create_user_profile_in_mikrotik.delay(payment.user.id)
+    reference = (event_data.get('data') or {}).get('reference')
+    if not reference:
+        return JsonResponse({'error': 'Invalid data'}, status=400)
 
-                return JsonResponse({'status': 'success'}, status=200)
-            else:
-                # Mark payment as failed if not successful
-                payment.status = payment.FAILED
-                payment.save()
-                return JsonResponse({'status': 'failed'}, status=200)
+    event, created = PaymentEvent.receive(
+        PAYSTACK, event_data.get('event', ''), reference, event_data
+    )
+    if created:
+        transaction.on_commit(lambda: _queue_payment_events(PAYSTACK, reference))
+    return JsonResponse({'status': 'received'}, status=200)
 
-        except json.JSONDecodeError:
-            logger.error('Invalid payload received', exc_info=True)
-            return JsonResponse({'error': 'Invalid payload'}, status=400)
-        except Exception as e:
-            logger.error(f"Error processing webhook: {e}", exc_info=True)
-            return JsonResponse({'error': 'Internal server error'}, status=500)
 
-    return JsonResponse({'error': 'Method not allowed'}, status=405)
+def _queue_payment_events(provider, reference):
+    try:
+        process_payment_events.delay(provider, reference)
+    except OperationalError:
+        # the event is stored, it will be picked up
+        # by the process_pending_payment_events task
+        logger.warning('Celery broker is unreachable')
 
 # Payment success page view
 def payment_success(request):
@@ -0,0 +1,115 @@
+import hashlib
+import hmac
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+
+from .models import Payment, PaymentEvent
+
+logger = logging.getLogger(__name__)
+
+PAYSTACK = 'paystack'
+
+
+class PaymentEventError(Exception):
+    pass
+
+
+def get_paystack_signature(body, secret_key=None):
+    secret_key = secret_key or settings.PAYSTACK_SECRET_KEY
+    return hmac.new(secret_key.encode('utf-8'), body, hashlib.sha512).hexdigest()
+
+
+def verify_paystack_signature(body, signature):
+    """
+    Paystack signs the raw request body with HMAC-SHA512 using
+    the secret key and sends it in the ``X-Paystack-Signature`` header.
+    """
+    if not signature or not getattr(settings, 'PAYSTACK_SECRET_KEY', None):
+        return False
+    return hmac.compare_digest(get_paystack_signature(body), signature)
+
+
+def apply_paystack_event(event, payment):
+    """
+    Applies a Paystack event to its payment, it is safe to apply
+    the same event more than once (eg: when replaying events).
+    """
+    if payment is None:
+        raise PaymentEventError(f'No payment found with reference "{event.reference}"')
+    if event.status == 'success':
+        if payment.status != payment.CONFIRMED:
+            payment.status = payment.CONFIRMED
+            payment.payment_date = now()
+            payment.save()
+        if payment.order:
+            # complete_order() is a no-op for orders which are already completed
+            payment.order.complete_order()
+    elif payment.status == payment.WAITING:
+        # never downgrade a payment which was already confirmed
+        payment.status = payment.FAILED
+        payment.save()
+
+
+EVENT_HANDLERS = {
+    PAYSTACK: apply_paystack_event,
+}
+
+
+def process_events(provider, reference):
+    """
+    Processes the pending events of a payment in the order in which
+    they were received.
+
+    The payment row is locked for the whole run, so workers handling
+    different payments run concurrently while the events of the same
+    payment are never applied in parallel or out of order.
+    Processing stops at the first failing event, the remaining ones
+    are picked up by the next run.
+
+    :return: number of processed events
+    """
+    handler = EVENT_HANDLERS[provider]
+    processed = 0
+    with transaction.atomic():
+        # the order is a nullable relation, only the payment row can be
+        # locked (postgres refuses to lock the nullable side of a join)
+        payment = (
+            Payment.objects.select_for_update(of=('self',))
+            .select_related('order')
+            .filter(transaction_ref=reference)
+            .first()
+        )
+        events = (
+            PaymentEvent.objects.select_for_update()
+            .filter(provider=provider, reference=reference, processed__isnull=True)
+            .order_by('created')
+        )
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    handler(event, payment)
+            except Exception as e:
+                logger.exception(f'Error while processing payment event "{event}"')
+                event.error = str(e)
+                event.save(update_fields=['attempts', 'error', 'modified'])
+                break
+            event.processed = now()
+            event.error = ''
+            event.save(update_fields=['attempts', 'error', 'processed', 'modified'])
+            processed += 1
+    return processed
+
+
+def get_pending_references(max_attempts=None):
+    """
+    Returns (provider, reference) tuples of the payments
+    which have events waiting to be processed.
+    """
+    queryset = PaymentEvent.objects.filter(processed__isnull=True)
+    if max_attempts is not None:
+        queryset = queryset.filter(attempts__lt=max_attempts)
+    return queryset.values_list('provider', 'reference').distinct()
@@ -4,49 +4,235 @@
 
 # gmtisp_enduser/services.py
 
+"""
+Client of the OpenWISP REST API used by the end-user portal.
+
+The client sends the calls through a transport: ``InProcessTransport``
+dispatches them to the API views of this project without leaving the
+process, ``HTTPTransport`` sends them over HTTP and is meant for portals
+deployed separately from the API. The transport is chosen with the
+``ENDUSER_API_TRANSPORT`` setting (``'inprocess'`` or ``'http'``).
+"""
+
+import json
+import logging
 import os
+import time
+
 import requests
-import logging
+from django.conf import settings
+from django.http.request import split_domain_port
+from django.test.client import RequestFactory
+from django.urls import resolve
 from requests.exceptions import HTTPError
 
+logger = logging.getLogger(__name__)
+
 BASE_URL = os.getenv('API_BASE_URL', 'http://127.0.0.1:8000/api/v1/')
+API_PREFIX = '/api/v1/'
 
-class OpenWispAPIClient:
-    def __init__(self, base_url=BASE_URL, username=None, password=None):
+
+class HTTPTransport:
+    name = 'http'
+
+    def __init__(self, base_url=BASE_URL, timeout=(3.05, 15)):
         self.base_url = base_url
+        self.timeout = timeout
         self.session = requests.Session()
+
+    def send(
+        self,
+        method,
+        endpoint,
+        headers=None,
+        json=None,
+        remote_addr=None,
+        host=None,
+        secure=False,
+    ):
+        # the host of the API is the one of ``base_url``
+        response = self.session.request(
+            method,
+            f'{self.base_url}{endpoint}',
+            headers=headers,
+            json=json,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.status_code, (response.json() if response.content else None)
+
+
+class InProcessTransport:
+    """
+    Calls the API views directly: the request goes through the
+    same authentication, permissions and serializers of the API,
+    but skips the HTTP round trip and the django middlewares.
+    """
+
+    name = 'inprocess'
+
+    def __init__(self, prefix=API_PREFIX):
+        self.prefix = prefix
+        # builds the request objects passed to the views
+        self.factory = RequestFactory()
+
+    def send(
+        self,
+        method,
+        endpoint,
+        headers=None,
+        json=None,
+        remote_addr=None,
+        host=None,
+        secure=False,
+    ):
+        path = f'{self.prefix}{endpoint}'
+        extra = {
+            f'HTTP_{key.upper().replace("-", "_")}': value
+            for key, value in (headers or {}).items()
+        }
+        if remote_addr:
+            # the API throttles the requests by client address
+            extra['REMOTE_ADDR'] = remote_addr
+        # the absolute URLs built by the API (eg: links sent by email)
+        # use the host of the originating request, not "testserver"
+        host = host or _get_default_host()
+        extra['HTTP_HOST'] = host
+        extra['SERVER_NAME'] = split_domain_port(host)[0] or host
+        request = self.factory.generic(
+            method,
+            path,
+            data=_dumps(json),
+            content_type='application/json',
+            secure=secure,
+            **extra,
+        )
+        match = resolve(path)
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code >= 400:
+            raise HTTPError(
+                f'{response.status_code} Error for {method} {path}', response=response
+            )
+        return response.status_code, _loads(response.content)
+
+
+def _get_default_host():
+    """
+    Returns the first host of ``ALLOWED_HOSTS`` which is not a pattern,
+    it is used when the call does not come from a request
+    """
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def _dumps(data):
+    return json.dumps(data) if data is not None else ''
+
+
+def _loads(content):
+    return json.loads(content) if content else None
+
+
+_transports = {}
+
+
+def get_transport(name=None):
+    """
+    Returns the transport shared by the clients of this process
+    """
+    name = name or getattr(settings, 'ENDUSER_API_TRANSPORT', 'inprocess')
+    if name not in _transports:
+        transport_class = {
+            HTTPTransport.name: HTTPTransport,
+            InProcessTransport.name: InProcessTransport,
+        }[name]
+        _transports[name] = transport_class()
+    return _transports[name]
+
+
+class OpenWispAPIClient:
+    def __init__(
+        self,
+        transport=None,
+        username=None,
+        password=None,
+        remote_addr=None,
+        host=None,
+        secure=False,
+    ):
+        self.transport = transport or get_transport()
+        self.remote_addr = remote_addr
+        self.host = host
+        self.secure = secure
+        self.token = None
+        # (method, endpoint, status, seconds) of each call
+        self.timings = []
         if username and password:
             self.authenticate(username, password)
 
+    @classmethod
+    def for_request(cls, request, **kwargs):
+        """
+        Returns a client which calls the API on behalf of ``request``
+        """
+        return cls(
+            remote_addr=request.META.get('REMOTE_ADDR'),
+            host=request.get_host(),
+            secure=request.is_secure(),
+            **kwargs,
+        )
+
     def authenticate(self, username: str, password: str) -> None:
-        auth_url = f"{self.base_url}api/token/"
         try:
-            response = self.session.post(auth_url, data={'username': username, 'password': password})
-            response.raise_for_status()
-            self.token = response.json().get('token')
-            self.session.headers.update({'Authorization': f'Token {self.token}'})
+            data = self.request(
+                'POST', 'users/token/', json={'username': username, 'password': password}
+            )
         except HTTPError as e:
-            logging.error(f"Authentication failed: {e}")
+            logger.error(f"Authentication failed: {e}")
             raise
+        self.token = data.get('token')
 
     def request(self, method: str, endpoint: str, **kwargs) -> dict:
-        url = f"{self.base_url}{endpoint}"
+        headers = {}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        started = time.monotonic()
+        status = None
         try:
-            response = self.session.request(method, url, **kwargs)
-            response.raise_for_status()
-            return response.json()
+            status, data = self.transport.send(
+                method,
+                endpoint,
+                headers=headers,
+                remote_addr=self.remote_addr,
+                host=self.host,
+                secure=self.secure,
+                **kwargs,
+            )
+            return data
         except HTTPError as e:
-            logging.error(f"Request failed: {e}")
+            status = getattr(e.response, 'status_code', None)
+            logger.error(f"Request failed: {e}")
             raise
+        finally:
+            elapsed = time.monotonic() - started
+            self.timings.append((method, endpoint, status, elapsed))
+            logger.debug(
+                f'{self.transport.name} {method} {endpoint}: '
+                f'{status} in {elapsed:.3f}s'
+            )
 
     def get_user(self, user_id: str) -> dict:
-        return self.request('GET', f'users/{user_id}/')  # Consistent path
+        return self.request('GET', f'users/user/{user_id}/')
 
     def create_user(self, user_data: dict) -> dict:
-        return self.request('POST', 'users/', json=user_data)  # Consistent path
+        return self.request('POST', 'users/user/', json=user_data)
 
     def update_user(self, user_id: str, user_data: dict) -> dict:
-        return self.request('PUT', f'users/{user_id}/', json=user_data)  # Consistent path
+        return self.request('PUT', f'users/user/{user_id}/', json=user_data)
 
     def delete_user(self, user_id: str) -> None:
-        self.request('DELETE', f'users/{user_id}/')  # Consistent path
+        self.request('DELETE', f'users/user/{user_id}/')
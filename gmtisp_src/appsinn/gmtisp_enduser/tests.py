@@ -1,8 +1,9 @@
 # gmtisp_enduser/tests.py
 
-from django.test import TestCase, Client
+from django.test import Client, RequestFactory, TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from unittest.mock import patch
 from requests.exceptions import HTTPError
 
@@ -43,3 +44,67 @@ class LoginViewTests(TestCase):
         self.assertEqual(self.client.session.get('email'), self.email)
         # self.assertEqual(self.client.session.get('first_name'), 'Test')
         # self.assertEqual(self.client.session.get('last_name'), 'User')
+
+
+class InProcessTransportTests(TestCase):
+    def setUp(self):
+        # the throttle counters of the API are stored in the cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.admin = User.objects.create_superuser(
+            username='admin', password='tester', email='admin@you.com'
+        )
+
+    def _get_client(self):
+        from .services import InProcessTransport, OpenWispAPIClient
+
+        return OpenWispAPIClient(transport=InProcessTransport())
+
+    def test_authenticate(self):
+        client = self._get_client()
+        client.authenticate('admin', 'tester')
+        self.assertTrue(client.token)
+        method, endpoint, status, elapsed = client.timings[0]
+        self.assertEqual((method, endpoint, status), ('POST', 'users/token/', 200))
+        self.assertGreaterEqual(elapsed, 0)
+
+    def test_authenticate_failure(self):
+        client = self._get_client()
+        with self.assertRaises(HTTPError):
+            client.authenticate('admin', 'wrong')
+        self.assertIsNone(client.token)
+        self.assertEqual(client.timings[0][2], 400)
+
+    def test_get_user(self):
+        client = self._get_client()
+        client.authenticate('admin', 'tester')
+        user = client.get_user(self.admin.pk)
+        self.assertEqual(user['username'], 'admin')
+        self.assertEqual(len(client.timings), 2)
+
+    def test_request_host(self):
+        from .services import InProcessTransport, OpenWispAPIClient
+
+        transport = InProcessTransport()
+        request = RequestFactory().get('/', secure=True, HTTP_HOST='127.0.0.1:8443')
+        with self.settings(ALLOWED_HOSTS=['127.0.0.1']):
+            client = OpenWispAPIClient.for_request(request, transport=transport)
+            with patch.object(
+                transport.factory, 'generic', wraps=transport.factory.generic
+            ) as generic:
+                client.authenticate('admin', 'tester')
+        kwargs = generic.call_args.kwargs
+        self.assertEqual(kwargs['HTTP_HOST'], '127.0.0.1:8443')
+        self.assertEqual(kwargs['SERVER_NAME'], '127.0.0.1')
+        self.assertTrue(kwargs['secure'])
+
+        with self.subTest('calls made outside of requests use ALLOWED_HOSTS'):
+            client = self._get_client()
+            with patch.object(
+                client.transport.factory,
+                'generic',
+                wraps=client.transport.factory.generic,
+            ) as generic, self.settings(ALLOWED_HOSTS=['*', 'portal.example.com']):
+                with self.assertRaises(HTTPError):
+                    client.authenticate('admin', 'wrong')
+            self.assertEqual(generic.call_args.kwargs['HTTP_HOST'], 'portal.example.com')
@@ -19,7 +19,7 @@ class LoginView(View):
     def post(self, request):
         username = request.POST.get('username')
         password = request.POST.get('password')
-        client = OpenWispAPIClient()
+        client = OpenWispAPIClient.for_request(request)
 
         try:
             client.authenticate(username, password)
@@ -37,7 +37,7 @@ class ProfileView(View):
             messages.error(request, 'You need to log in to view your profile.')
             return redirect('login')
 
-        client = OpenWispAPIClient()
+        client = OpenWispAPIClient.for_request(request)
         try:
             user_details = client.get_user(user_id)
             return render(request, 'gmtisp_enduser/profile.html', {'user': user_details})
@@ -0,0 +1,106 @@
+"""
+Write-behind tracker of the last activity of the users of the RADIUS API.
+
+The activity of a user is recorded at most once every
+``OPENWISP_RADIUS_USER_ACTIVITY_INTERVAL`` seconds in a queue stored in
+the cache (a change of language is always recorded), ``flush`` writes
+the queued values to ``last_login`` and ``language`` with one UPDATE
+per batch.
+
+The readers of ``last_login`` (eg: ``unverify_inactive_users`` and
+``delete_inactive_users``) call ``flush`` before querying the users,
+they run in the celery workers, hence the queue is used only if
+``OPENWISP_RADIUS_USER_ACTIVITY_WRITE_BEHIND`` is enabled and the
+cache is shared by the processes, otherwise the activity is written
+right away (still at most once per interval).
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Case, CharField, DateTimeField, F, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from openwisp_utils.utils import is_shared_cache
+
+from . import settings as app_settings
+from .cache_queue import CacheQueue
+
+activity_events = CacheQueue('radius_user_activity')
+
+
+def is_write_behind():
+    """
+    Returns ``True`` if the activity is queued instead of written
+    """
+    return app_settings.USER_ACTIVITY_WRITE_BEHIND and is_shared_cache()
+
+
+def touch(user_pk, when=None, language=None):
+    """
+    Records that the user was active at ``when`` (default: now),
+    ``language`` is passed only if the language of the user changed
+    """
+    when = when or timezone.now()
+    recorded = cache.add(
+        f'radius-user-activity-{user_pk}',
+        1,
+        timeout=app_settings.USER_ACTIVITY_INTERVAL,
+    )
+    if not recorded and not language:
+        return
+    if not is_write_behind():
+        fields = {'last_login': when}
+        if language:
+            fields['language'] = language
+        get_user_model().objects.filter(pk=user_pk).update(**fields)
+        return
+    activity_events.push((str(user_pk), when, language))
+
+
+def _write_activity(last_seen, languages):
+    """
+    Updates ``last_login`` of the users in ``last_seen``
+    ({user_pk: datetime}) unless it is more recent already,
+    and ``language`` of the users in ``languages`` ({user_pk: language})
+    """
+    User = get_user_model()
+    last_login = Case(
+        *[When(pk=pk, then=Value(when)) for pk, when in last_seen.items()],
+        output_field=DateTimeField(),
+    )
+    fields = {'last_login': Greatest(Coalesce(F('last_login'), last_login), last_login)}
+    if languages:
+        fields['language'] = Case(
+            *[When(pk=pk, then=Value(lang)) for pk, lang in languages.items()],
+            default=F('language'),
+            output_field=CharField(),
+        )
+    return User.objects.filter(pk__in=last_seen.keys()).update(**fields)
+
+
+def flush(batch_size=1000):
+    """
+    Writes the queued activity, returns the number of updated users
+    """
+    if not activity_events.acquire(timeout=app_settings.USER_ACTIVITY_INTERVAL * 5):
+        # another flush is running
+        return 0
+    updated = 0
+    try:
+        while True:
+            events = activity_events.pop(batch_size)
+            if not events:
+                break
+            last_seen = {}
+            languages = {}
+            latest_language = {}
+            for user_pk, when, language in events:
+                last_seen[user_pk] = max(when, last_seen.get(user_pk, when))
+                # the most recent change of language wins
+                if language and when >= latest_language.get(user_pk, when):
+                    latest_language[user_pk] = when
+                    languages[user_pk] = language
+            updated += _write_activity(last_seen, languages)
+    finally:
+        activity_events.release()
+    return updated
@@ -19,6 +19,7 @@ from openwisp_utils.admin import (
     ReadOnlyAdmin,
     TimeReadonlyAdminMixin,
 )
+from openwisp_utils.mixins import ReplicaChangelistMixin
 
 from . import settings as app_settings
 from .base.admin_filters import RegisteredUserFilter
@@ -123,7 +124,9 @@ BaseAccounting = ReadOnlyAdmin if not app_settings.EDITABLE_ACCOUNTING else Mode
 
 
 @admin.register(RadiusAccounting)
-class RadiusAccountingAdmin(OrganizationFirstMixin, BaseAccounting):
+class RadiusAccountingAdmin(
+    ReplicaChangelistMixin, OrganizationFirstMixin, BaseAccounting
+):
     list_display = [
         'session_id',
         'organization',
@@ -311,7 +314,9 @@ BasePostAuth = ReadOnlyAdmin if not app_settings.EDITABLE_POSTAUTH else ModelAdm
 
 
 @admin.register(RadiusPostAuth)
-class RadiusPostAuthAdmin(OrganizationFirstMixin, BasePostAuth):
+class RadiusPostAuthAdmin(
+    ReplicaChangelistMixin, OrganizationFirstMixin, BasePostAuth
+):
     list_display = [
         'username',
         'organization',
@@ -0,0 +1,59 @@
+"""
+Async versions of the API views used by FreeRADIUS, meant to be
+served by an ASGI server (eg: ``uvicorn gmtisp.asgi:application``)
+with ``OPENWISP_RADIUS_FREERADIUS_ASYNC_VIEWS`` enabled.
+
+Django REST framework views are synchronous: the async views run them
+in a pool of ``OPENWISP_RADIUS_FREERADIUS_ASYNC_THREADS`` threads, so
+that the event loop of a process keeps accepting requests while the
+database and cache round trips of the ones being processed are in
+progress, and the number of database connections of the process stays
+bounded by the size of the pool.
+"""
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from .. import settings as app_settings
+from . import freeradius_views
+
+executor = ThreadPoolExecutor(
+    max_workers=app_settings.FREERADIUS_ASYNC_THREADS,
+    thread_name_prefix='freeradius',
+)
+
+
+def _run_view(view, request, *args, **kwargs):
+    # the connections of the threads of the pool are not managed
+    # by the request_started/request_finished signals of django
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        # templates and serializers are rendered in the pool too
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def as_async(view):
+    """
+    Returns an async view which runs ``view`` in the thread pool
+    """
+    run_view = sync_to_async(
+        functools.partial(_run_view, view), thread_sensitive=False, executor=executor
+    )
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await run_view(request, *args, **kwargs)
+
+    return async_view
+
+
+authorize = as_async(freeradius_views.authorize)
+postauth = as_async(freeradius_views.postauth)
+accounting = as_async(freeradius_views.accounting)
@@ -7,7 +7,7 @@ import drf_link_header_pagination
 import swapper
 from django.contrib.auth.models import AnonymousUser
 from django.core.cache import cache
-from django.db import IntegrityError
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, router
 from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from django_filters import rest_framework as filters
@@ -26,6 +26,7 @@ from rest_framework.generics import CreateAPIView, GenericAPIView, ListCreateAPI
 from rest_framework.response import Response
 
 from openwisp_users.backends import UsersAuthenticationBackend
+from openwisp_utils.routers import activate_organization, deactivate_organization
 
 from .. import registration
 from .. import settings as app_settings
@@ -118,17 +119,32 @@ class FreeradiusApiAuthentication(BaseAuthentication):
             # Username is either None or not a MAC addresss
             return username, request
         calling_station_id = RE_MAC_ADDR.match(username)[0]
-        # Get the most recent open session for the roaming user
-        open_session = (
-            RadiusAccounting.objects.select_related('organization__radius_settings')
+        # Get the most recent open session for the roaming user from the
+        # default database and from the one of the organization of the
+        # request (activated by OrganizationDatabaseMixin), if it has its own
+        aliases = dict.fromkeys(
+            [DEFAULT_DB_ALIAS, router.db_for_read(RadiusAccounting)]
+        )
+        open_sessions = (
+            RadiusAccounting.objects.using(alias)
             .filter(calling_station_id=calling_station_id, stop_time=None)
+            .only('username', 'organization_id', 'start_time')
             .order_by('-start_time')
             .first()
+            for alias in aliases
         )
-        if (
-            not open_session
-            or not open_session.organization.radius_settings.mac_addr_roaming_enabled
-        ):
+        open_session = max(
+            filter(None, open_sessions),
+            key=lambda session: session.start_time,
+            default=None,
+        )
+        if not open_session:
+            return None, None
+        # the settings are stored only in the default database
+        radius_settings = OrganizationRadiusSettings.objects.filter(
+            organization_id=open_session.organization_id
+        ).first()
+        if not radius_settings or not radius_settings.mac_addr_roaming_enabled:
             return None, None
         username = open_session.username
         if hasattr(request.data, '_mutable'):
@@ -225,7 +241,43 @@ class FreeradiusApiAuthentication(BaseAuthentication):
         return uuid, token
 
 
-class AuthorizeView(GenericAPIView, IDVerificationHelper):
+class OrganizationDatabaseMixin(object):
+    """
+    Routes the accounting and post-auth queries of the request
+    to the database of the organization which sent it
+    """
+
+    _organization_db_token = None
+
+    def _activate_organization(self, organization_id):
+        self._deactivate_organization()
+        self._organization_db_token = activate_organization(organization_id)
+
+    def _deactivate_organization(self):
+        if self._organization_db_token is not None:
+            deactivate_organization(self._organization_db_token)
+            self._organization_db_token = None
+
+    def initial(self, request, *args, **kwargs):
+        # the organization sent with the request is activated before
+        # the authentication, which can read the accounting data
+        try:
+            uuid = FreeradiusApiAuthentication().get_uuid_token(request)[0]
+        except ParseError:
+            uuid = None
+        if uuid:
+            self._activate_organization(uuid)
+        super().initial(request, *args, **kwargs)
+        # eg: the organization of the radius token of the user
+        if request.auth and str(request.auth) != str(uuid):
+            self._activate_organization(request.auth)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        self._deactivate_organization()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class AuthorizeView(OrganizationDatabaseMixin, GenericAPIView, IDVerificationHelper):
     authentication_classes = (FreeradiusApiAuthentication,)
     accept_attributes = {'control:Auth-Type': 'Accept'}
     accept_status = 200
@@ -418,7 +470,7 @@ class AccountingViewPagination(drf_link_header_pagination.LinkHeaderPagination):
     max_page_size = 100
 
 
-class AccountingView(ListCreateAPIView):
+class AccountingView(OrganizationDatabaseMixin, ListCreateAPIView):
     """
     HEADER: Pagination is provided using a Link header
             https://developer.github.com/v3/guides/traversing-with-pagination/
@@ -528,7 +580,7 @@ class AccountingView(ListCreateAPIView):
 accounting = AccountingView.as_view()
 
 
-class PostAuthView(CreateAPIView):
+class PostAuthView(OrganizationDatabaseMixin, CreateAPIView):
     authentication_classes = (FreeradiusApiAuthentication,)
     serializer_class = RadiusPostAuthSerializer
 
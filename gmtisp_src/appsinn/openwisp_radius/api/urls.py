@@ -88,6 +88,16 @@ def get_api_urls(api_views=None):
                 api_views.radius_accounting,
                 name='radius_accounting_list',
             ),
+            path(
+                'radius/sessions/export/',
+                api_views.radius_accounting_export,
+                name='radius_accounting_export',
+            ),
+            path(
+                'radius/postauth/export/',
+                api_views.radius_postauth_export,
+                name='radius_postauth_export',
+            ),
         ]
     else:
         return []
@@ -1,3 +1,4 @@
+import hashlib
 import logging
 
 import swapper
@@ -11,9 +12,10 @@ from django.contrib.auth import get_user_model
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
 from django.db.utils import IntegrityError
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.utils.translation import gettext_lazy as _
@@ -46,13 +48,17 @@ from openwisp_users.api.mixins import FilterByOrganizationManaged, ProtectedAPIM
 from openwisp_users.api.permissions import IsOrganizationManager
 from openwisp_users.api.views import ChangePasswordView as BasePasswordChangeView
 from openwisp_users.backends import UsersAuthenticationBackend
+from openwisp_users.tenancy import get_tenancy_context
+from openwisp_utils.mixins import ReplicaReadMixin
 
+from .. import activity, rate_limits
 from .. import settings as app_settings
 from ..exceptions import (
     PhoneTokenException,
     SmsAttemptCooldownException,
     UserAlreadyVerified,
 )
+from ..exports import FORMATS, ExportError, get_export_filename, stream_export
 from ..utils import generate_pdf, get_organization_radius_settings, load_model
 from . import freeradius_views
 from .freeradius_views import AccountingFilter, AccountingViewPagination
@@ -68,9 +74,12 @@ from .serializers import (
 from .swagger import ObtainTokenRequest, ObtainTokenResponse, RegisterResponse
 from .utils import ErrorDictMixin, IDVerificationHelper
 
-authorize = freeradius_views.authorize
-postauth = freeradius_views.postauth
-accounting = freeradius_views.accounting
+if app_settings.FREERADIUS_ASYNC_VIEWS:
+    from .async_views import accounting, authorize, postauth  # noqa
+else:
+    authorize = freeradius_views.authorize
+    postauth = freeradius_views.postauth
+    accounting = freeradius_views.accounting
 
 _TOKEN_AUTH_FAILED = _('Token authentication failed')
 renew_required = app_settings.DISPOSABLE_RADIUS_USER_TOKEN
@@ -81,6 +90,7 @@ Organization = swapper.load_model('openwisp_users', 'Organization')
 OrganizationUser = swapper.load_model('openwisp_users', 'OrganizationUser')
 PhoneToken = load_model('PhoneToken')
 RadiusAccounting = load_model('RadiusAccounting')
+RadiusPostAuth = load_model('RadiusPostAuth')
 RadiusToken = load_model('RadiusToken')
 RadiusBatch = load_model('RadiusBatch')
 RadiusUserGroup = load_model('RadiusUserGroup')
@@ -175,8 +185,13 @@ class UserDetailsUpdaterMixin(object):
         if user.language != language:
             user.language = language
             update_fields.append('language')
+        else:
+            language = None
         user.last_login = timezone.now()
-        user.save(update_fields=update_fields)
+        if not activity.is_write_behind():
+            user.save(update_fields=update_fields)
+            return
+        activity.touch(user.pk, user.last_login, language=language)
 
 
 class RadiusTokenMixin(object):
@@ -360,6 +375,95 @@ class ValidateAuthTokenView(
     throttle_scope = 'validate_auth_token'
     serializer_class = ValidateTokenSerializer
 
+    # values which the response depends on
+    state_fields = (
+        'key',
+        'user_id',
+        'user__username',
+        'user__email',
+        'user__phone_number',
+        'user__first_name',
+        'user__last_name',
+        'user__birth_date',
+        'user__location',
+        'user__is_active',
+        'user__is_staff',
+        'user__password',
+        'user__password_updated',
+        'user__registered_user__is_verified',
+        'user__registered_user__method',
+        'user__radius_token__key',
+        'user__radius_token__organization_id',
+        'user__radius_token__can_auth',
+    )
+
+    def _get_cache_key(self, request_token):
+        token_hash = hashlib.sha256(request_token.encode()).hexdigest()
+        return f'validate-auth-token-{self.organization.pk}-{token_hash}'
+
+    def _get_state(self, request_token):
+        """
+        Returns the state of the token, its user and their radius token
+        read with one query, or ``None`` if the token does not exist
+        """
+        latest_phone_number = (
+            PhoneToken.objects.filter(user=OuterRef('user'))
+            .order_by('-created')
+            .values('phone_number')[:1]
+        )
+        state = dict(
+            zip(
+                self.state_fields + ('latest_phone_number',),
+                UserToken.objects.filter(key=request_token)
+                .annotate(latest_phone_number=Subquery(latest_phone_number))
+                .values_list(*self.state_fields, 'latest_phone_number')
+                .first()
+                or (),
+            )
+        )
+        return state or None
+
+    def _get_fingerprint(self, state):
+        values = (
+            sorted(state.items()),
+            str(self.organization.pk),
+            get_language_from_request(self.request),
+            # the response tells whether the password has expired
+            timezone.localdate(),
+        )
+        return hashlib.sha256(repr(values).encode()).hexdigest()
+
+    def _get_cached_response(self, request_token):
+        """
+        Returns the last response given for ``request_token`` if nothing
+        which the response depends on has changed since then and the
+        radius token can still be used to authenticate in this organization
+        """
+        if not app_settings.VALIDATE_AUTH_TOKEN_CACHE_TIMEOUT:
+            return None
+        cached = cache.get(self._get_cache_key(request_token))
+        if not cached:
+            return None
+        state = self._get_state(request_token)
+        if (
+            not state
+            or not state['user__radius_token__can_auth']
+            or state['user__radius_token__organization_id'] != self.organization.pk
+            or self._get_fingerprint(state) != cached['fingerprint']
+        ):
+            return None
+        return state['user_id'], cached['response']
+
+    def _cache_response(self, request_token, response):
+        if not app_settings.VALIDATE_AUTH_TOKEN_CACHE_TIMEOUT:
+            return
+        state = self._get_state(request_token)
+        cache.set(
+            self._get_cache_key(request_token),
+            {'fingerprint': self._get_fingerprint(state), 'response': response},
+            timeout=app_settings.VALIDATE_AUTH_TOKEN_CACHE_TIMEOUT,
+        )
+
     @swagger_auto_schema(request_body=ValidateTokenSerializer)
     def post(self, request, *args, **kwargs):
         """
@@ -368,6 +472,13 @@ class ValidateAuthTokenView(
         request_token = request.data.get('token')
         response = {'response_code': 'BLANK_OR_INVALID_TOKEN'}
         if request_token:
+            cached_response = self._get_cached_response(request_token)
+            if cached_response:
+                # captive portals poll this endpoint: a user who is
+                # already logged in gets the same answer without writes
+                user_id, response = cached_response
+                activity.touch(user_id)
+                return Response(response, 200)
             try:
                 token = UserToken.objects.select_related(
                     'user', 'user__registered_user'
@@ -399,6 +510,7 @@ class ValidateAuthTokenView(
                 token_data['response_code'] = 'AUTH_TOKEN_VALIDATION_SUCCESSFUL'
                 response.update(token_data)
                 self.update_user_details(token.user)
+                self._cache_response(request_token, response)
                 return Response(response, 200)
         return Response(response, 401)
 
@@ -639,14 +751,39 @@ class CreatePhoneTokenView(
             return Response(
                 {'non_field_errors': [str(e)], 'cooldown': e.cooldown}, status=400
             )
-        phone_token.save()
+        # the cooldown is reserved before sending, so that concurrent requests
+        # cannot send more tokens, and released if the token is not sent
+        try:
+            with transaction.atomic():
+                phone_token.save()
+        except Exception:
+            if rate_limits.is_enabled():
+                rate_limits.sms_cooldown.cancel(self._get_cooldown_key(phone_number))
+            raise
         return Response(
             {'cooldown': org_cooldown},
             status=201,
         )
 
+    def _get_cooldown_key(self, phone_number):
+        return f'{self.request.user.pk}:{phone_number}'
+
     def enforce_sms_request_cooldown(self, cooldown, phone_number):
         # enforce SMS_COOLDOWN
+        if rate_limits.is_enabled():
+            remaining_cooldown = rate_limits.sms_cooldown.start(
+                self._get_cooldown_key(phone_number), cooldown
+            )
+        else:
+            remaining_cooldown = self._get_remaining_cooldown(cooldown, phone_number)
+        if remaining_cooldown:
+            raise SmsAttemptCooldownException(
+                _('Wait before requesting another SMS token.'),
+                cooldown=remaining_cooldown,
+            )
+
+
+    def _get_remaining_cooldown(self, cooldown, phone_number):
         datetime_now = timezone.now()
         last_phone_token = (
             PhoneToken.objects.filter(
@@ -657,14 +794,10 @@ class CreatePhoneTokenView(
             .only('created')
             .first()
         )
-        if last_phone_token:
-            remaining_cooldown = cooldown - round(
-                (datetime_now - last_phone_token.created).total_seconds()
-            )
-            raise SmsAttemptCooldownException(
-                _('Wait before requesting another SMS token.'),
-                cooldown=remaining_cooldown,
-            )
+        if not last_phone_token:
+            return 0
+        elapsed = (datetime_now - last_phone_token.created).total_seconds()
+        return max(cooldown - round(elapsed), 1)
 
 
 create_phone_token = CreatePhoneTokenView.as_view()
@@ -836,7 +969,9 @@ class RadiusAccountingFilter(AccountingFilter):
         """,
     ),
 )
-class RadiusAccountingView(ProtectedAPIMixin, FilterByOrganizationManaged, ListAPIView):
+class RadiusAccountingView(
+    ReplicaReadMixin, ProtectedAPIMixin, FilterByOrganizationManaged, ListAPIView
+):
     throttle_scrope = 'radius_accounting_list'
     serializer_class = RadiusAccountingSerializer
     pagination_class = AccountingViewPagination
@@ -846,3 +981,107 @@ class RadiusAccountingView(ProtectedAPIMixin, FilterByOrganizationManaged, ListA
 
 
 radius_accounting = RadiusAccountingView.as_view()
+
+
+class BaseExportView(ThrottledAPIMixin, ProtectedAPIMixin, GenericAPIView):
+    """
+    Streams the rows of ``kind`` (see ``openwisp_radius.exports``)
+    of the organizations managed by the user
+    """
+
+    kind = None
+
+    def get_organization_ids(self):
+        slugs = self.request.query_params.getlist('organization')
+        user = self.request.user
+        if user.is_superuser:
+            if not slugs:
+                return None
+            return list(
+                Organization.objects.filter(slug__in=slugs).values_list('pk', flat=True)
+            )
+        managed = {
+            str(pk)
+            for pk in get_tenancy_context(self.request).get('organizations_managed')
+        }
+        if not slugs:
+            return list(managed)
+        organization_ids = [
+            str(pk)
+            for pk in Organization.objects.filter(slug__in=slugs).values_list(
+                'pk', flat=True
+            )
+        ]
+        if not set(organization_ids).issubset(managed):
+            raise PermissionDenied(
+                _('You are not an administrator of the requested organizations.')
+            )
+        return organization_ids
+
+    def get(self, request, *args, **kwargs):
+        # "format" is reserved to the content negotiation of DRF
+        output_format = request.query_params.get('output', 'csv')
+        compress = request.query_params.get('compress') == 'gzip'
+        try:
+            stream = stream_export(
+                self.kind,
+                format=output_format,
+                compress=compress,
+                organization_ids=self.get_organization_ids(),
+                start=request.query_params.get('start'),
+                end=request.query_params.get('end'),
+                username=request.query_params.get('username'),
+            )
+        except ExportError as e:
+            raise ParseError(str(e))
+        filename = get_export_filename(self.kind, output_format, compress)
+        response = StreamingHttpResponse(
+            stream,
+            content_type=(
+                'application/gzip' if compress else FORMATS[output_format][0]
+            ),
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+@method_decorator(
+    name='get',
+    decorator=swagger_auto_schema(
+        operation_description="""
+        Streams the RADIUS sessions of the organizations managed by the
+        user as CSV (default) or NDJSON (`output=ndjson`), compressed
+        with gzip if `compress=gzip`. The sessions can be filtered by
+        `organization` (slug, repeatable), `start` and `end` (ISO 8601
+        date or datetime of the start of the session, `end` is excluded)
+        and `username`.
+        """,
+        responses={200: '(File Byte Stream)'},
+    ),
+)
+class RadiusAccountingExportView(BaseExportView):
+    kind = 'accounting'
+    queryset = RadiusAccounting.objects.none()
+
+
+radius_accounting_export = RadiusAccountingExportView.as_view()
+
+
+@method_decorator(
+    name='get',
+    decorator=swagger_auto_schema(
+        operation_description="""
+        Streams the post-auth log (without passwords) of the organizations
+        managed by the user, it accepts the same parameters of the export
+        of the RADIUS sessions, `start` and `end` filter the date of the
+        authentication.
+        """,
+        responses={200: '(File Byte Stream)'},
+    ),
+)
+class RadiusPostAuthExportView(BaseExportView):
+    kind = 'postauth'
+    queryset = RadiusPostAuth.objects.none()
+
+
+radius_postauth_export = RadiusPostAuthExportView.as_view()
@@ -11,6 +11,7 @@ from openwisp_utils.api.apps import ApiAppConfig
 from openwisp_utils.utils import default_or_test
 
 from . import settings as app_settings
+from .nas_registry import nas_changed_handler
 from .receivers import (
     close_previous_radius_accounting_sessions,
     convert_radius_called_station_id,
@@ -73,6 +74,7 @@ class OpenwispRadiusConfig(ApiAppConfig):
         RadiusToken = load_model('RadiusToken')
         RadiusAccounting = load_model('RadiusAccounting')
         RadiusUserGroup = load_model('RadiusUserGroup')
+        Nas = load_model('Nas')
         User = get_user_model()
         from openwisp_radius.api.freeradius_views import AccountingView
 
@@ -132,6 +134,16 @@ class OpenwispRadiusConfig(ApiAppConfig):
             sender=RadiusUserGroup,
             dispatch_uid='radius_user_group_change_coa',
         )
+        post_save.connect(
+            nas_changed_handler,
+            sender=Nas,
+            dispatch_uid='openwisp_radius_nas_post_save_registry',
+        )
+        post_delete.connect(
+            nas_changed_handler,
+            sender=Nas,
+            dispatch_uid='openwisp_radius_nas_post_delete_registry',
+        )
         if app_settings.CONVERT_CALLED_STATION_ON_CREATE:
             post_save.connect(
                 convert_radius_called_station_id,
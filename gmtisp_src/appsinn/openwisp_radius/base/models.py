@@ -36,7 +36,7 @@ from openwisp_utils.fields import (
     FallbackTextField,
 )
 
-from .. import exceptions
+from .. import activity, exceptions, rate_limits
 from .. import settings as app_settings
 from ..settings import (
     BATCH_DEFAULT_PASSWORD_LENGTH,
@@ -46,7 +46,6 @@ from ..settings import (
     DEFAULT_PASSWORD_RESET_URL,
 )
 from ..utils import (
-    SmsMessage,
     find_available_username,
     generate_sms_token,
     get_sms_default_valid_until,
@@ -518,6 +517,8 @@ class AbstractRadiusAccounting(OrgMixin, models.Model):
         db_table = 'radacct'
         verbose_name = _('accounting')
         verbose_name_plural = _('accountings')
+        # used by the exports, which filter by organization and time range
+        indexes = [models.Index(fields=['organization', 'start_time'])]
         abstract = True
 
     def __str__(self):
@@ -811,6 +812,12 @@ class AbstractRadiusPostAuth(OrgMixin, UUIDModel):
         db_table = 'radpostauth'
         verbose_name = _('post auth')
         verbose_name_plural = _('post auth log')
+        # used by the exports, which filter by organization or
+        # username and time range
+        indexes = [
+            models.Index(fields=['organization', 'date']),
+            models.Index(fields=['username', 'date']),
+        ]
         abstract = True
 
     def __str__(self):
@@ -1376,31 +1383,39 @@ class AbstractPhoneToken(TimeStampedEditableModel):
                 }
             )
 
+    def _get_daily_tokens(self):
+        date_start = timezone.localdate()
+        date_end = date_start + timedelta(days=1)
+        PhoneToken = load_model('PhoneToken')
+        return PhoneToken.objects.filter(created__range=[date_start, date_end])
+
     def _validate_max_attempts(self):
         """
         Enforce limits on the creation of phone tokens to prevent abuse
-        which can lead to excessive expenditure for sending SMS
+        which can lead to excessive expenditure for sending SMS;
+        the tokens of the last 24 hours are counted in the cache if it
+        is shared, otherwise the tokens of the day in the database
         """
-        date_start = timezone.localdate()
-        date_end = date_start + timedelta(days=1)
-        PhoneToken = load_model('PhoneToken')
-        qs = PhoneToken.objects.filter(created__range=[date_start, date_end])
         # limit generation of tokens per day by user
-        user_token_count = qs.filter(user=self.user).count()
+        if rate_limits.is_enabled():
+            user_token_count = rate_limits.sms_user_daily.count(self.user.pk)
+        else:
+            user_token_count = self._get_daily_tokens().filter(user=self.user).count()
         if user_token_count >= app_settings.SMS_TOKEN_MAX_USER_DAILY:
             logger.warning(
                 f'The user {self.user} has reached the maximum daily SMS limit.'
             )
             raise ValidationError(_('Maximum daily limit reached.'))
         # limit generation of tokens per day by ip
-        ip_token_count = qs.filter(ip=self.ip).count()
+        if rate_limits.is_enabled():
+            ip_token_count = rate_limits.sms_ip_daily.count(self.ip)
+        else:
+            ip_token_count = self._get_daily_tokens().filter(ip=self.ip).count()
         if ip_token_count >= app_settings.SMS_TOKEN_MAX_IP_DAILY:
             logger.warning(
-                logger.warning(
-                    _(
-                        f'User {self.user} has reached the maximum '
-                        f'daily SMS limit from ip address {self.ip}'
-                    )
+                _(
+                    f'User {self.user} has reached the maximum '
+                    f'daily SMS limit from ip address {self.ip}'
                 )
             )
             raise ValidationError(
@@ -1411,12 +1426,25 @@ class AbstractPhoneToken(TimeStampedEditableModel):
         created = self._state.adding
         result = super().save(*args, **kwargs)
         if created:
+            if rate_limits.is_enabled():
+                rate_limits.sms_user_daily.incr(self.user.pk, when=self.created)
+                rate_limits.sms_ip_daily.incr(self.ip, when=self.created)
             self.send_token()
         return result
 
     def send_token(self):
+        """
+        Queues the SMS containing the token, the SMS gateway
+        is called by the celery workers
+        """
+        from ..tasks import send_sms
+
         OrganizationUser = swapper.load_model('openwisp_users', 'OrganizationUser')
-        org_user = OrganizationUser.objects.filter(user=self.user).first()
+        org_user = (
+            OrganizationUser.objects.filter(user=self.user)
+            .select_related('organization__radius_settings')
+            .first()
+        )
         if not org_user:
             raise exceptions.NoOrgException(
                 _('The user {user} is not member of any organization').format(
@@ -1425,14 +1453,14 @@ class AbstractPhoneToken(TimeStampedEditableModel):
             )
         org_radius_settings = org_user.organization.radius_settings
         message = _(org_radius_settings.sms_message).format(
-            organization=org_radius_settings.organization.name, code=self.token
+            organization=org_user.organization.name, code=self.token
         )
-        sms_message = SmsMessage(
+        send_sms.delay(
             body=str(message),
             from_phone=str(org_radius_settings.sms_sender),
             to=[str(self.phone_number)],
+            meta_data=org_radius_settings.sms_meta_data,
         )
-        sms_message.send(meta_data=org_radius_settings.sms_meta_data)
 
     def is_valid(self, token):
         self.attempts += 1
@@ -1520,6 +1548,8 @@ class AbstractRegisteredUser(models.Model):
     def unverify_inactive_users(cls):
         if not app_settings.UNVERIFY_INACTIVE_USERS:
             return
+        # writes the activity queued by the API before reading last_login
+        activity.flush()
         # Exclude users who have unspecified, manual, or email
         # registration method because such users don't have an option
         # to re-verify. See https://github.com/openwisp/openwisp-radius/issues/517
@@ -1533,6 +1563,7 @@ class AbstractRegisteredUser(models.Model):
     def delete_inactive_users(cls):
         if not app_settings.DELETE_INACTIVE_USERS:
             return
+        activity.flush()
         cutoff_date = timezone.now() - timedelta(
             days=app_settings.DELETE_INACTIVE_USERS
         )
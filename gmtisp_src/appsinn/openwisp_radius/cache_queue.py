@@ -0,0 +1,77 @@
+"""
+Queue of events stored in the cache, written by the request handlers
+and consumed in batches by periodic tasks.
+
+The events are appended to a sequence: the tail counter is incremented
+by the producers, the head counter is advanced by the consumer. The cache
+must be shared by the web and the celery processes (eg: redis).
+"""
+import logging
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class CacheQueue(object):
+    event_timeout = 60 * 60 * 24
+
+    def __init__(self, name):
+        self.name = name
+        self.head_key = f'{name}_head'
+        self.tail_key = f'{name}_tail'
+        self.lock_key = f'{name}_lock'
+        # index of the event which was missing in the last pop
+        self.missing_key = f'{name}_missing'
+
+    def _event_key(self, index):
+        return f'{self.name}_{index}'
+
+    def push(self, event):
+        cache.add(self.tail_key, 0, timeout=None)
+        try:
+            index = cache.incr(self.tail_key)
+        except ValueError:
+            # the tail was evicted between add and incr
+            cache.add(self.tail_key, 0, timeout=None)
+            index = cache.incr(self.tail_key)
+        cache.set(self._event_key(index), event, timeout=self.event_timeout)
+
+    def pending(self):
+        return cache.get(self.tail_key, 0) - cache.get(self.head_key, 0)
+
+    def acquire(self, timeout):
+        return cache.add(self.lock_key, 1, timeout=timeout)
+
+    def release(self):
+        cache.delete(self.lock_key)
+
+    def pop(self, limit):
+        """
+        Returns up to ``limit`` events from the head of the queue.
+
+        Must be called while holding the lock. An event can be missing
+        because the producer which incremented the tail did not store it
+        yet: the pop stops before it, but skips it the next time, when
+        it can be assumed that the event was lost (evicted or expired).
+        """
+        head = cache.get(self.head_key, 0)
+        tail = min(cache.get(self.tail_key, 0), head + limit)
+        if tail <= head:
+            return []
+        indexes = range(head + 1, tail + 1)
+        stored = cache.get_many([self._event_key(index) for index in indexes])
+        events = []
+        for index in indexes:
+            key = self._event_key(index)
+            if key in stored:
+                events.append(stored[key])
+            elif cache.get(self.missing_key) == index:
+                logger.warning(f'Event {index} of {self.name} was lost, skipping it')
+            else:
+                cache.set(self.missing_key, index, timeout=self.event_timeout)
+                break
+            head = index
+        cache.set(self.head_key, head, timeout=None)
+        cache.delete_many([self._event_key(index) for index in indexes if index <= head])
+        return events
@@ -1,10 +1,11 @@
 import logging
 from abc import ABC, abstractmethod
 
-from django.db import connection
+from django.db import connections, router
 from django.utils.translation import gettext_lazy as _
 
 from .. import settings as app_settings
+from ..utils import load_model
 from .exceptions import MaxQuotaReached, SkipCheck
 from .resets import resets
 
@@ -85,7 +86,11 @@ class BaseCounter(ABC):
         The SQL query is executed with raw SQL for maximum flexibility and
         adherence to freeradius.
         """
-        with connection.cursor() as cursor:
+        # the sessions may be stored in the database of the organization
+        alias = router.db_for_read(
+            load_model('RadiusAccounting'), organization_id=self.organization_id
+        )
+        with connections[alias].cursor() as cursor:
             start_time, end_time = self.get_reset_timestamps()
             cursor.execute(self.sql, self.get_sql_params(start_time, end_time))
             row = cursor.fetchone()
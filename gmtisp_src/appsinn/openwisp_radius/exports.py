@@ -0,0 +1,228 @@
+"""
+Streaming export of the accounting sessions and of the post-auth log.
+
+The rows are read with server-side cursors (``iterator(chunk_size=...)``)
+as tuples and rendered as CSV or NDJSON a batch at a time, optionally
+compressed with gzip on the fly, hence the memory used does not depend
+on the number of exported rows. The filters (organization, time range
+and username) use the indexes of ``radacct`` and ``radpostauth``.
+
+The rows are read from the replica of the database if configured and
+from the databases of the organizations which have their own
+(see ``openwisp_utils.routers``).
+"""
+import csv
+import zlib
+from datetime import date, datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from openwisp_utils.routers import get_organization_aliases, is_routed, use_replica
+
+from . import settings as app_settings
+from .utils import load_model
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+# {kind: (model name, time field, excluded fields)}
+EXPORTS = {
+    'accounting': ('RadiusAccounting', 'start_time', ()),
+    'postauth': ('RadiusPostAuth', 'date', ('password',)),
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def get_export_model(kind):
+    try:
+        return load_model(EXPORTS[kind][0])
+    except KeyError:
+        raise ExportError(f'"{kind}" cannot be exported')
+
+
+def get_export_fields(kind):
+    """
+    Returns the exported columns of ``kind``
+    """
+    model = get_export_model(kind)
+    excluded = EXPORTS[kind][2]
+    return [
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.name not in excluded
+    ]
+
+
+def parse_time(value, end=False):
+    """
+    Parses an ISO 8601 date or datetime, the dates are the
+    beginning of the day or, if ``end`` is true, of the next day
+    """
+    if not value or isinstance(value, datetime):
+        return value or None
+    try:
+        # parse_datetime accepts dates as well
+        day = parse_date(value)
+        parsed = None if day else parse_datetime(value)
+    except ValueError:
+        day = parsed = None
+    if day:
+        if end:
+            day = date.fromordinal(day.toordinal() + 1)
+        parsed = datetime(day.year, day.month, day.day)
+    elif parsed is None:
+        raise ExportError(f'"{value}" is not a valid date or datetime')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _get_databases(model, organization_ids):
+    """
+    Returns {alias: organization ids} of the databases storing the
+    rows of ``organization_ids`` (all the organizations if ``None``)
+    """
+    with use_replica():
+        if organization_ids is None:
+            databases = {router.db_for_read(model): None}
+            if is_routed(model):
+                for alias in get_organization_aliases():
+                    databases[alias] = None
+            return databases
+        databases = {}
+        for organization_id in organization_ids:
+            alias = router.db_for_read(model, organization_id=organization_id)
+            databases.setdefault(alias, []).append(organization_id)
+        return databases
+
+
+def get_export_querysets(
+    kind, organization_ids=None, start=None, end=None, username=None
+):
+    """
+    Returns the querysets (one per database) of the rows of ``kind``
+    of ``organization_ids`` (all if ``None``) whose time is in
+    [``start``, ``end``), ordered by time
+    """
+    model = get_export_model(kind)
+    time_field = EXPORTS[kind][1]
+    queryset = model.objects.all()
+    if start:
+        queryset = queryset.filter(**{f'{time_field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{time_field}__lt': end})
+    if username:
+        queryset = queryset.filter(username=username)
+    queryset = queryset.order_by(time_field, 'pk').values_list(
+        *get_export_fields(kind)
+    )
+    querysets = []
+    for alias, ids in _get_databases(model, organization_ids).items():
+        alias_queryset = queryset.using(alias)
+        if ids is not None:
+            alias_queryset = alias_queryset.filter(organization_id__in=ids)
+        querysets.append(alias_queryset)
+    return querysets
+
+
+def _format_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class _Echo(object):
+    """
+    File-like object which returns the written value, see
+    https://docs.djangoproject.com/en/stable/howto/outputting-csv/
+    """
+
+    def write(self, value):
+        return value
+
+
+def render_csv(fields, rows, batch_size):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow([_format_value(value) for value in row]))
+        if len(batch) >= batch_size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def render_ndjson(fields, rows, batch_size):
+    encoder = DjangoJSONEncoder()
+    batch = []
+    for row in rows:
+        batch.append(encoder.encode(dict(zip(fields, row))))
+        if len(batch) >= batch_size:
+            yield '\n'.join(batch) + '\n'
+            batch = []
+    if batch:
+        yield '\n'.join(batch) + '\n'
+
+
+RENDERERS = {'csv': render_csv, 'ndjson': render_ndjson}
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(
+    kind,
+    format='csv',
+    compress=False,
+    chunk_size=None,
+    organization_ids=None,
+    start=None,
+    end=None,
+    username=None,
+):
+    """
+    Returns an iterator over the bytes of the export
+    """
+    if format not in RENDERERS:
+        raise ExportError(f'"{format}" is not a supported format')
+    chunk_size = chunk_size or app_settings.EXPORT_CHUNK_SIZE
+    querysets = get_export_querysets(
+        kind,
+        organization_ids=organization_ids,
+        start=parse_time(start),
+        end=parse_time(end, end=True),
+        username=username,
+    )
+
+    def rows():
+        for queryset in querysets:
+            yield from queryset.iterator(chunk_size=chunk_size)
+
+    chunks = (
+        chunk.encode()
+        for chunk in RENDERERS[format](get_export_fields(kind), rows(), chunk_size)
+    )
+    if compress:
+        return gzip_stream(chunks)
+    return chunks
+
+
+def get_export_filename(kind, format, compress=False):
+    extension = FORMATS[format][1]
+    filename = f'{kind}-{timezone.now():%Y%m%d%H%M%S}.{extension}'
+    return f'{filename}.gz' if compress else filename
@@ -1,8 +1,11 @@
+from celery.schedules import crontab
 from django.apps import AppConfig
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models import Count, Sum
 from django.db.models.functions import Cast, Round
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.utils.timezone import localdate
 from django.utils.translation import gettext_lazy as _
 from openwisp_monitoring.monitoring.configuration import (
@@ -26,6 +29,7 @@ class OpenwispRadiusMonitoringConfig(AppConfig):
         self.register_dashboard_charts()
         self.register_radius_metrics()
         self.connect_signal_receivers()
+        self.add_celery_beat_schedule()
 
     def register_dashboard_charts(self):
         register_dashboard_chart(
@@ -110,12 +114,59 @@ class OpenwispRadiusMonitoringConfig(AppConfig):
                 _register_chart_configuration_choice(chart_key, chart_config)
 
     def connect_signal_receivers(self):
+        from . import counters
         from .receivers import post_save_radiusaccounting
 
         RadiusAccounting = load_model('openwisp_radius', 'RadiusAccounting')
+        RegisteredUser = load_model('openwisp_radius', 'RegisteredUser')
+        OrganizationUser = load_model('openwisp_users', 'OrganizationUser')
+        User = get_user_model()
 
         post_save.connect(
             post_save_radiusaccounting,
             sender=RadiusAccounting,
             dispatch_uid='post_save_radiusaccounting_radius_acc_metric',
         )
+        for signal, receiver, sender in [
+            (post_save, counters.user_post_save, User),
+            (post_delete, counters.user_post_delete, User),
+            (pre_save, counters.registered_user_pre_save, RegisteredUser),
+            (post_save, counters.registered_user_post_save, RegisteredUser),
+            (post_delete, counters.registered_user_post_delete, RegisteredUser),
+            (post_save, counters.organization_user_post_save, OrganizationUser),
+            (post_delete, counters.organization_user_post_delete, OrganizationUser),
+        ]:
+            signal.connect(
+                receiver,
+                sender=sender,
+                dispatch_uid=f'user_signup_counters_{receiver.__name__}',
+            )
+
+    def add_celery_beat_schedule(self):
+        from . import settings as app_settings
+
+        schedule = getattr(settings, 'CELERY_BEAT_SCHEDULE', {})
+        schedule.setdefault(
+            'reconcile_user_signup_counters',
+            {
+                'task': (
+                    'openwisp_radius.integrations.monitoring.tasks'
+                    '.reconcile_user_signup_counters'
+                ),
+                'schedule': crontab(hour=2, minute=0),
+                'relative': True,
+            },
+        )
+        if app_settings.BATCH_ACCOUNTING_METRICS:
+            schedule.setdefault(
+                'write_radius_accounting_metrics',
+                {
+                    'task': (
+                        'openwisp_radius.integrations.monitoring.tasks'
+                        '.write_accounting_metrics'
+                    ),
+                    'schedule': app_settings.ACCOUNTING_METRICS_INTERVAL,
+                    'relative': True,
+                },
+            )
+        setattr(settings, 'CELERY_BEAT_SCHEDULE', schedule)
@@ -0,0 +1,134 @@
+"""
+Running totals of the user signups, kept in ``UserSignupCounter``.
+
+The receivers below update the totals when users, registrations and
+organization memberships are created, changed or deleted, so that the
+hourly metrics task does not need to count all the users. Missed updates
+(eg: queryset updates, which do not send signals) are corrected by
+``reconcile``, which is executed nightly.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from swapper import load_model
+
+from .models import ALL_ORGANIZATIONS, UserSignupCounter
+
+RegisteredUser = load_model('openwisp_radius', 'RegisteredUser')
+OrganizationUser = load_model('openwisp_users', 'OrganizationUser')
+
+
+def add(organization_id, method, delta):
+    counter_qs = UserSignupCounter.objects.filter(
+        organization_id=str(organization_id), method=method
+    )
+    if counter_qs.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            UserSignupCounter.objects.create(
+                organization_id=str(organization_id), method=method, count=delta
+            )
+    except IntegrityError:
+        # created concurrently
+        counter_qs.update(count=F('count') + delta)
+
+
+def _get_method(user_id):
+    return (
+        RegisteredUser.objects.filter(user_id=user_id)
+        .values_list('method', flat=True)
+        .first()
+    ) or ''
+
+
+def _get_organization_ids(user_id):
+    return OrganizationUser.objects.filter(user_id=user_id).values_list(
+        'organization_id', flat=True
+    )
+
+
+def get_totals():
+    """
+    Returns the totals of all the organizations, keyed by method,
+    and the totals of each organization, keyed by (organization, method).
+    """
+    if not UserSignupCounter.objects.exists():
+        reconcile()
+    totals_for_all = {}
+    totals_for_orgs = {}
+    for organization_id, method, count in UserSignupCounter.objects.values_list(
+        'organization_id', 'method', 'count'
+    ):
+        if organization_id == ALL_ORGANIZATIONS:
+            totals_for_all[method] = count
+        else:
+            totals_for_orgs[(organization_id, method)] = count
+    return totals_for_all, totals_for_orgs
+
+
+def reconcile():
+    """
+    Replaces the stored totals with the ones counted from the database
+    """
+    from .tasks import _get_user_signups_for_all, _get_user_signups_for_orgs
+
+    counters = [
+        UserSignupCounter(organization_id=ALL_ORGANIZATIONS, method=method, count=count)
+        for method, count in _get_user_signups_for_all().items()
+    ]
+    counters.extend(
+        UserSignupCounter(organization_id=str(org_id), method=method, count=count)
+        for (org_id, method), count in _get_user_signups_for_orgs().items()
+    )
+    with transaction.atomic():
+        UserSignupCounter.objects.all().delete()
+        UserSignupCounter.objects.bulk_create(counters)
+
+
+def user_post_save(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add(ALL_ORGANIZATIONS, '', 1)
+
+
+def user_post_delete(instance, **kwargs):
+    # the registration and the memberships of the user are deleted
+    # before the user, their receivers have moved the user to the
+    # unspecified method and out of its organizations already
+    add(ALL_ORGANIZATIONS, '', -1)
+
+
+def registered_user_pre_save(instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._counted_method = (
+        RegisteredUser.objects.filter(pk=instance.pk)
+        .values_list('method', flat=True)
+        .first()
+    ) or ''
+
+
+def registered_user_post_save(instance, raw=False, **kwargs):
+    if raw:
+        return
+    _move(instance.user_id, instance._counted_method, instance.method)
+
+
+def registered_user_post_delete(instance, **kwargs):
+    _move(instance.user_id, instance.method, '')
+
+
+def _move(user_id, old_method, new_method):
+    if old_method == new_method:
+        return
+    for organization_id in [ALL_ORGANIZATIONS, *_get_organization_ids(user_id)]:
+        add(organization_id, old_method, -1)
+        add(organization_id, new_method, 1)
+
+
+def organization_user_post_save(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add(instance.organization_id, _get_method(instance.user_id), 1)
+
+
+def organization_user_post_delete(instance, **kwargs):
+    add(instance.organization_id, _get_method(instance.user_id), -1)
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.3 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('openwisp_radius_monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSignupCounter',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'organization_id',
+                    models.CharField(max_length=36, verbose_name='organization'),
+                ),
+                (
+                    'method',
+                    models.CharField(
+                        blank=True,
+                        max_length=64,
+                        verbose_name='registration method',
+                    ),
+                ),
+                ('count', models.IntegerField(default=0, verbose_name='count')),
+            ],
+            options={
+                'verbose_name': 'user signup counter',
+                'verbose_name_plural': 'user signup counters',
+                'unique_together': {('organization_id', 'method')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+ALL_ORGANIZATIONS = '__all__'
+
+
+class UserSignupCounter(models.Model):
+    """
+    Running total of the users registered with a method, in an
+    organization or in all of them (``ALL_ORGANIZATIONS``).
+
+    Updated by the signal receivers in ``counters.py`` and
+    reconciled nightly by ``reconcile_user_signup_counters``.
+    """
+
+    organization_id = models.CharField(_('organization'), max_length=36)
+    method = models.CharField(_('registration method'), max_length=64, blank=True)
+    count = models.IntegerField(_('count'), default=0)
+
+    class Meta:
+        verbose_name = _('user signup counter')
+        verbose_name_plural = _('user signup counters')
+        unique_together = ('organization_id', 'method')
+
+    def __str__(self):
+        return f'{self.organization_id} {self.method}: {self.count}'
@@ -1,18 +1,23 @@
 from django.db import transaction
 
+from . import settings as app_settings
 from . import tasks
 
 
 def post_save_radiusaccounting(instance, *args, **kwargs):
     if instance.stop_time is None:
         return
-    transaction.on_commit(
-        lambda: tasks.post_save_radiusaccounting.delay(
-            username=instance.username,
-            organization_id=str(instance.organization_id),
-            input_octets=instance.input_octets,
-            output_octets=instance.output_octets,
-            calling_station_id=instance.calling_station_id,
-            called_station_id=instance.called_station_id,
-        )
+    event = dict(
+        username=instance.username,
+        organization_id=str(instance.organization_id),
+        input_octets=instance.input_octets,
+        output_octets=instance.output_octets,
+        calling_station_id=instance.calling_station_id,
+        called_station_id=instance.called_station_id,
+        # the points are written later, in batches
+        time=instance.stop_time,
     )
+    if app_settings.BATCH_ACCOUNTING_METRICS:
+        transaction.on_commit(lambda: tasks.accounting_events.push(event))
+    else:
+        transaction.on_commit(lambda: tasks.post_save_radiusaccounting.delay(**event))
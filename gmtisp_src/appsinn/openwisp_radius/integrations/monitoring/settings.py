@@ -1,4 +1,7 @@
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from openwisp_utils.utils import is_shared_cache
 
 
 def get_settings_value(option, default):
@@ -9,3 +12,25 @@ SHARED_ACCOUNTING = get_settings_value(
     'SHARED_ACCOUNTING',
     False,
 )
+# When enabled, the metrics of the closed sessions are buffered in the
+# cache and written in batches by the "write_accounting_metrics" task.
+# The cache must be shared between the web and the celery processes,
+# hence it is enabled by default only if the cache is shared.
+BATCH_ACCOUNTING_METRICS = get_settings_value(
+    'BATCH_ACCOUNTING_METRICS',
+    is_shared_cache(),
+)
+ACCOUNTING_METRICS_INTERVAL = get_settings_value(
+    'ACCOUNTING_METRICS_INTERVAL',
+    60,
+)
+ACCOUNTING_METRICS_BATCH_SIZE = get_settings_value(
+    'ACCOUNTING_METRICS_BATCH_SIZE',
+    1000,
+)
+
+if BATCH_ACCOUNTING_METRICS and not is_shared_cache():  # pragma: no cover
+    raise ImproperlyConfigured(
+        'OPENWISP_RADIUS_MONITORING_BATCH_ACCOUNTING_METRICS requires a cache '
+        'shared by the web and the celery processes (eg: redis or memcached).'
+    )
@@ -3,10 +3,16 @@ import logging
 from celery import shared_task
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Count, Q
+from django.db.models import Count
+from django.db.models.functions import Upper
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from swapper import load_model
 
+from openwisp_radius.cache_queue import CacheQueue
+from openwisp_utils.routers import use_replica
+
+from . import counters
 from . import settings as app_settings
 from .utils import clean_registration_method, sha1_hash
 
@@ -21,6 +27,9 @@ User = get_user_model()
 
 logger = logging.getLogger(__name__)
 
+# closed sessions whose metrics are not written yet
+accounting_events = CacheQueue('radius_monitoring_acc')
+
 
 def _get_user_signup_metric(organization_id, registration_method):
     metric, _ = Metric._get_or_create(
@@ -52,103 +61,90 @@ def _get_total_user_signup_metric(organization_id, registration_method):
     return metric
 
 
-def _write_user_signup_metric_for_all(metric_key):
-    metric_data = []
-    start_time = timezone.now() - timezone.timedelta(hours=1)
-    end_time = timezone.now()
-    if metric_key == 'user_signups':
-        get_metric_func = _get_user_signup_metric
-    else:
-        get_metric_func = _get_total_user_signup_metric
-    # Get the total number of registered users
-    registered_user_query = RegisteredUser.objects.exclude(
-        user__date_joined__gt=end_time,
-    )
-    if metric_key == 'user_signups':
-        registered_user_query = registered_user_query.filter(
-            user__date_joined__gt=start_time,
-            user__date_joined__lte=end_time,
-        )
-    total_registered_users = dict(
-        registered_user_query.values_list('method').annotate(
-            count=Count('user', distinct=True)
-        )
-    )
+@use_replica()
+def _get_user_signups_for_all(start_time=None, end_time=None):
+    """
+    Returns the number of users registered with each method,
+    the users registered outside the time range are excluded if given.
+    """
+    registered_user_query = RegisteredUser.objects.all()
     # Some manually created users, like superuser may not have a
     # RegisteredUser object. We would could them with "unspecified" method
     users_without_registereduser_query = User.objects.filter(
         registered_user__isnull=True
     )
-    if metric_key == 'user_signups':
+    if start_time:
+        registered_user_query = registered_user_query.filter(
+            user__date_joined__gt=start_time,
+            user__date_joined__lte=end_time,
+        )
         users_without_registereduser_query = users_without_registereduser_query.filter(
             date_joined__gt=start_time,
             date_joined__lte=end_time,
         )
-    users_without_registereduser = users_without_registereduser_query.count()
-
-    # Add the number of users which do not have a related RegisteredUser
-    # to the number of users which registered using "unspecified" method.
-    try:
-        total_registered_users[''] = (
-            total_registered_users[''] + users_without_registereduser
+    signups = dict(
+        registered_user_query.values_list('method').annotate(
+            count=Count('user', distinct=True)
         )
-    except KeyError:
-        total_registered_users[''] = users_without_registereduser
-
-    for method, count in total_registered_users.items():
-        method = clean_registration_method(method)
-        metric = get_metric_func(organization_id='__all__', registration_method=method)
-        metric_data.append((metric, {'value': count}))
-    Metric.batch_write(metric_data)
-
-
-def _write_user_signup_metrics_for_orgs(metric_key):
-    metric_data = []
-    start_time = timezone.now() - timezone.timedelta(hours=1)
-    end_time = timezone.now()
-    if metric_key == 'user_signups':
-        get_metric_func = _get_user_signup_metric
-    else:
-        get_metric_func = _get_total_user_signup_metric
-
-    # Get the registration data for the past hour.
-    # The query returns a tuple of organization_id, registration_method and
-    # count of users who registered with that organization and method.
-    registered_users_query = RegisteredUser.objects.exclude(
-        user__openwisp_users_organizationuser__created__gt=end_time,
     )
+    # Add the number of users which do not have a related RegisteredUser
+    # to the number of users which registered using "unspecified" method.
+    signups[''] = signups.get('', 0) + users_without_registereduser_query.count()
+    return signups
 
-    if metric_key == 'user_signups':
-        registered_users_query = registered_users_query.filter(
-            user__openwisp_users_organizationuser__created__gt=start_time,
-            user__openwisp_users_organizationuser__created__lte=end_time,
-        )
-    registered_users = registered_users_query.values_list(
-        'user__openwisp_users_organizationuser__organization_id', 'method'
-    ).annotate(count=Count('user_id', distinct=True))
 
+@use_replica()
+def _get_user_signups_for_orgs(start_time=None, end_time=None):
+    """
+    Returns the number of users registered with each method in each
+    organization, keyed by (organization_id, method), the users which
+    joined the organization outside the time range are excluded if given.
+    """
+    registered_users_query = RegisteredUser.objects.all()
     # There could be users which were manually created (e.g. superuser)
     # which do not have related RegisteredUser object. Add the count
     # of such users with the "unspecified" method.
     users_without_registereduser_query = OrganizationUser.objects.filter(
         user__registered_user__isnull=True
     )
-    if metric_key == 'user_signups':
+    if start_time:
+        registered_users_query = registered_users_query.filter(
+            user__openwisp_users_organizationuser__created__gt=start_time,
+            user__openwisp_users_organizationuser__created__lte=end_time,
+        )
         users_without_registereduser_query = users_without_registereduser_query.filter(
             created__gt=start_time, created__lte=end_time
         )
-    users_without_registereduser = dict(
-        users_without_registereduser_query.values_list('organization_id').annotate(
-            count=Count('user_id', distinct=True)
-        )
-    )
+    # The query returns a tuple of organization_id, registration_method and
+    # count of users who registered with that organization and method,
+    # the organization_id is None for users which are not member of any.
+    signups = {
+        (str(org_id), method): count
+        for org_id, method, count in registered_users_query.values_list(
+            'user__openwisp_users_organizationuser__organization_id', 'method'
+        ).annotate(count=Count('user_id', distinct=True))
+        if org_id is not None
+    }
+    for org_id, count in users_without_registereduser_query.values_list(
+        'organization_id'
+    ).annotate(count=Count('user_id', distinct=True)):
+        key = (str(org_id), '')
+        signups[key] = signups.get(key, 0) + count
+    return signups
+
 
-    for org_id, registration_method, count in registered_users:
-        registration_method = clean_registration_method(registration_method)
-        if registration_method == 'unspecified':
-            count += users_without_registereduser.get(org_id, 0)
+def _write_user_signup_metrics(get_metric_func, signups_for_all, signups_for_orgs):
+    metric_data = []
+    for method, count in signups_for_all.items():
+        metric = get_metric_func(
+            organization_id='__all__',
+            registration_method=clean_registration_method(method),
+        )
+        metric_data.append((metric, {'value': count}))
+    for (org_id, method), count in signups_for_orgs.items():
         metric = get_metric_func(
-            organization_id=org_id, registration_method=registration_method
+            organization_id=org_id,
+            registration_method=clean_registration_method(method),
         )
         metric_data.append((metric, {'value': count}))
     Metric.batch_write(metric_data)
@@ -164,93 +160,211 @@ def write_user_registration_metrics():
         - User Signups: This shows the number of new users who
             have registered using different methods
         - Total User Signups: This shows the total number of
-            users registered using different methods
+            users registered using different methods, read from
+            the running totals kept in ``UserSignupCounter``
     """
-    _write_user_signup_metric_for_all(metric_key='user_signups')
-    _write_user_signup_metric_for_all(metric_key='tot_user_signups')
-    _write_user_signup_metrics_for_orgs(metric_key='user_signups')
-    _write_user_signup_metrics_for_orgs(metric_key='tot_user_signups')
+    end_time = timezone.now()
+    start_time = end_time - timezone.timedelta(hours=1)
+    _write_user_signup_metrics(
+        _get_user_signup_metric,
+        _get_user_signups_for_all(start_time, end_time),
+        _get_user_signups_for_orgs(start_time, end_time),
+    )
+    _write_user_signup_metrics(_get_total_user_signup_metric, *counters.get_totals())
 
 
 @shared_task
-def post_save_radiusaccounting(
-    username,
-    organization_id,
-    input_octets,
-    output_octets,
-    calling_station_id,
-    called_station_id,
-    time=None,
-):
-    try:
-        registration_method = (
-            RegisteredUser.objects.only('method').get(user__username=username).method
-        )
-    except RegisteredUser.DoesNotExist:
-        logger.info(
-            f'RegisteredUser object not found for "{username}".'
-            ' The metric will be written with "unspecified" registration method!'
+def reconcile_user_signup_counters():
+    """
+    This task is expected to be executed daily.
+
+    Corrects the running totals of the user signups
+    which could not be tracked by the signal receivers.
+    """
+    counters.reconcile()
+
+
+def _get_registration_methods(usernames):
+    methods = dict(
+        RegisteredUser.objects.filter(user__username__in=usernames).values_list(
+            'user__username', 'method'
         )
-        registration_method = 'unspecified'
-    else:
-        registration_method = clean_registration_method(registration_method)
-    device_lookup = Q(mac_address__iexact=called_station_id.replace('-', ':'))
-    # Do not use organization_id for device lookup if shared accounting is enabled
+    )
+    for username in usernames:
+        if username not in methods:
+            logger.info(
+                f'RegisteredUser object not found for "{username}".'
+                ' The metric will be written with "unspecified" registration method!'
+            )
+    return {
+        username: clean_registration_method(method)
+        for username, method in methods.items()
+    }
+
+
+def _get_devices(events):
+    """
+    Returns the devices of the called station IDs of ``events``,
+    keyed by (MAC address, organization ID); the organization ID
+    is ``None`` if shared accounting is enabled.
+    """
+    mac_addresses = {
+        event['called_station_id'].replace('-', ':').upper() for event in events
+    }
+    queryset = (
+        Device.objects.annotate(mac_address_upper=Upper('mac_address'))
+        .filter(mac_address_upper__in=mac_addresses)
+        .select_related('devicelocation')
+        .only('id', 'mac_address', 'organization_id', 'devicelocation__location_id')
+    )
     if not app_settings.SHARED_ACCOUNTING:
-        device_lookup &= Q(organization_id=organization_id)
-    try:
-        device = (
-            Device.objects.select_related('devicelocation')
-            .only('id', 'organization_id', 'devicelocation__location_id')
-            .get(device_lookup)
+        queryset = queryset.filter(
+            organization_id__in={event['organization_id'] for event in events}
         )
-    except Device.DoesNotExist:
-        logger.warning(
-            f'Device object not found with MAC "{called_station_id}"'
-            f' and organization "{organization_id}".'
-            ' The metric will be written without a related object!'
+    devices = {}
+    for device in queryset:
+        organization_id = None
+        if not app_settings.SHARED_ACCOUNTING:
+            organization_id = str(device.organization_id)
+        devices[(device.mac_address_upper, organization_id)] = device
+    return devices
+
+
+def write_radius_accounting_metrics(events):
+    """
+    Writes the RADIUS Accounting metrics of the closed sessions
+    described by ``events`` with a single write to the timeseries DB.
+
+    The registration methods and the devices are looked up for all the
+    events at once and the metrics are retrieved once for each set of tags.
+    """
+    if not events:
+        return
+    registration_methods = _get_registration_methods(
+        {event['username'] for event in events}
+    )
+    devices = _get_devices(events)
+    content_type = ContentType.objects.get_for_model(Device)
+    metrics = {}
+    metric_data = []
+    for event in events:
+        organization_id = event['organization_id']
+        called_station_id = event['called_station_id']
+        device = devices.get(
+            (
+                called_station_id.replace('-', ':').upper(),
+                None if app_settings.SHARED_ACCOUNTING else organization_id,
+            )
         )
-        object_id = None
-        content_type = None
-        location_id = None
-        if app_settings.SHARED_ACCOUNTING:
-            organization_id = None
-    else:
-        object_id = str(device.id)
-        content_type = ContentType.objects.get_for_model(Device)
-        if hasattr(device, 'devicelocation'):
-            location_id = str(device.devicelocation.location_id)
-        else:
+        if device is None:
+            logger.warning(
+                f'Device object not found with MAC "{called_station_id}"'
+                f' and organization "{organization_id}".'
+                ' The metric will be written without a related object!'
+            )
+            object_id = None
             location_id = None
+            if app_settings.SHARED_ACCOUNTING:
+                organization_id = None
+        else:
+            object_id = str(device.id)
+            if hasattr(device, 'devicelocation'):
+                location_id = str(device.devicelocation.location_id)
+            else:
+                location_id = None
+        extra_tags = {
+            'organization_id': organization_id,
+            'method': registration_methods.get(event['username'], 'unspecified'),
+            'calling_station_id': sha1_hash(event['calling_station_id']),
+            'called_station_id': called_station_id,
+            'location_id': location_id,
+        }
+        metric_key = (object_id, tuple(sorted(extra_tags.items())))
+        if metric_key not in metrics:
+            metrics[metric_key] = _get_radius_accounting_metric(
+                object_id, content_type if object_id else None, extra_tags
+            )
+        metric_data.append(
+            (
+                metrics[metric_key],
+                {
+                    'value': event['input_octets'],
+                    'extra_values': {
+                        'output_octets': event['output_octets'],
+                        'username': sha1_hash(event['username']),
+                    },
+                    'time': event.get('time'),
+                },
+            )
+        )
+    Metric.batch_write(metric_data)
+
 
+def _get_radius_accounting_metric(object_id, content_type, extra_tags):
     metric, created = Metric._get_or_create(
         configuration='radius_acc',
         name='RADIUS Accounting',
         key='radius_acc',
         object_id=object_id,
         content_type=content_type,
-        extra_tags={
-            'organization_id': organization_id,
-            'method': registration_method,
-            'calling_station_id': sha1_hash(calling_station_id),
-            'called_station_id': called_station_id,
-            'location_id': location_id,
-        },
-    )
-    metric.write(
-        input_octets,
-        extra_values={
-            'output_octets': output_octets,
-            'username': sha1_hash(username),
-        },
-        time=time,
+        extra_tags=extra_tags,
     )
-    if not object_id:
-        # Adding a chart requires all parameters of extra_tags to be present.
-        # A chart cannot be created without object_id and content_type.
-        return
-    if created:
+    # Adding a chart requires all parameters of extra_tags to be present.
+    # A chart cannot be created without object_id and content_type.
+    if created and object_id:
         for configuration in metric.config_dict['charts'].keys():
             chart = Chart(metric=metric, configuration=configuration)
             chart.full_clean()
             chart.save()
+    return metric
+
+
+@shared_task
+def write_accounting_metrics():
+    """
+    This task is expected to be executed every
+    ``OPENWISP_RADIUS_MONITORING_ACCOUNTING_METRICS_INTERVAL`` seconds.
+
+    Writes the metrics of the sessions closed since its last execution,
+    in batches of ``OPENWISP_RADIUS_MONITORING_ACCOUNTING_METRICS_BATCH_SIZE``.
+    """
+    lock_timeout = app_settings.ACCOUNTING_METRICS_INTERVAL * 5
+    if not accounting_events.acquire(timeout=lock_timeout):
+        # the previous execution is still writing
+        return
+    try:
+        while True:
+            events = accounting_events.pop(app_settings.ACCOUNTING_METRICS_BATCH_SIZE)
+            if not events:
+                break
+            write_radius_accounting_metrics(events)
+    finally:
+        accounting_events.release()
+
+
+@shared_task
+def post_save_radiusaccounting(
+    username,
+    organization_id,
+    input_octets,
+    output_octets,
+    calling_station_id,
+    called_station_id,
+    time=None,
+):
+    if isinstance(time, str):
+        # the datetime was serialized by celery
+        time = parse_datetime(time)
+    write_radius_accounting_metrics(
+        [
+            {
+                'username': username,
+                'organization_id': organization_id,
+                'input_octets': input_octets,
+                'output_octets': output_octets,
+                'calling_station_id': calling_station_id,
+                'called_station_id': called_station_id,
+                'time': time,
+            }
+        ]
+    )
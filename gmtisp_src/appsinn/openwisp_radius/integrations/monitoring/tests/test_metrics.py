@@ -15,6 +15,7 @@ from .mixins import CreateDeviceMonitoringMixin
 
 TASK_PATH = 'openwisp_radius.integrations.monitoring.tasks'
 
+RadiusAccounting = load_model('openwisp_radius', 'RadiusAccounting')
 RegisteredUser = load_model('openwisp_radius', 'RegisteredUser')
 User = get_user_model()
 
@@ -325,6 +326,87 @@ class TestMetrics(CreateDeviceMonitoringMixin, BaseTransactionTestCase):
             ' The metric will be written with "unspecified" registration method!'
         )
 
+    @patch('logging.Logger.warning')
+    def test_write_accounting_metrics(self, *args):
+        from .. import settings as app_settings
+        from ..tasks import accounting_events, write_accounting_metrics
+
+        user = self._create_user()
+        self._create_registered_user(user=user)
+        device = self._create_device()
+        options = _RADACCT.copy()
+        options.update(
+            {
+                'unique_id': '117',
+                'username': user.username,
+                'called_station_id': device.mac_address.replace('-', ':').upper(),
+                'calling_station_id': '00:00:00:00:00:00',
+                'input_octets': '8000000000',
+                'output_octets': '9000000000',
+            }
+        )
+        options['stop_time'] = options['start_time']
+        with patch.object(app_settings, 'BATCH_ACCOUNTING_METRICS', True):
+            self._create_radius_accounting(**options)
+            options['unique_id'] = '118'
+            self._create_radius_accounting(**options)
+        self.assertEqual(accounting_events.pending(), 2)
+        metric_qs = self.metric_model.objects.filter(configuration='radius_acc')
+        self.assertEqual(metric_qs.count(), 0)
+
+        with patch.object(self.metric_model, 'batch_write') as mocked_batch_write:
+            write_accounting_metrics.delay()
+        mocked_batch_write.assert_called_once()
+        metric_data = mocked_batch_write.call_args[0][0]
+        self.assertEqual(len(metric_data), 2)
+        self.assertIs(metric_data[0][0], metric_data[1][0])
+        self.assertEqual(metric_data[0][1]['value'], '8000000000')
+        session = RadiusAccounting.objects.get(unique_id='117')
+        self.assertEqual(metric_data[0][1]['time'], session.stop_time)
+        self.assertEqual(accounting_events.pending(), 0)
+        self.assertEqual(metric_qs.count(), 1)
+        self.assertEqual(metric_qs.first().object_id, str(device.id))
+
+        with self.subTest('Empty buffer'):
+            with patch.object(self.metric_model, 'batch_write') as mocked_batch_write:
+                write_accounting_metrics.delay()
+            mocked_batch_write.assert_not_called()
+
+    def test_user_signup_counters(self):
+        from .. import counters
+
+        org = self._get_org()
+        user = self._create_user()
+        self.assertEqual(counters.get_totals(), ({'': 1}, {}))
+        self._create_org_user(user=user, organization=org)
+        self.assertEqual(counters.get_totals(), ({'': 1}, {(str(org.id), ''): 1}))
+        reg_user = self._create_registered_user(user=user)
+        expected = (
+            {'': 0, 'mobile_phone': 1},
+            {(str(org.id), ''): 0, (str(org.id), 'mobile_phone'): 1},
+        )
+        self.assertEqual(counters.get_totals(), expected)
+
+        with self.subTest('Reconcile'):
+            counters.reconcile()
+            totals_for_all, totals_for_orgs = counters.get_totals()
+            self.assertEqual(totals_for_all, expected[0])
+            self.assertEqual(totals_for_orgs, {(str(org.id), 'mobile_phone'): 1})
+
+        with self.subTest('Registration method changed'):
+            reg_user.method = 'email'
+            reg_user.save()
+            totals_for_all, totals_for_orgs = counters.get_totals()
+            self.assertEqual(totals_for_all['email'], 1)
+            self.assertEqual(totals_for_all['mobile_phone'], 0)
+            self.assertEqual(totals_for_orgs[(str(org.id), 'email')], 1)
+
+        with self.subTest('User deleted'):
+            user.delete()
+            totals_for_all, totals_for_orgs = counters.get_totals()
+            self.assertEqual(sum(totals_for_all.values()), 0)
+            self.assertEqual(sum(totals_for_orgs.values()), 0)
+
     def test_write_user_registration_metrics(self):
         from ..tasks import write_user_registration_metrics
 
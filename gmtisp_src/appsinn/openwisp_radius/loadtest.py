@@ -0,0 +1,310 @@
+"""
+Load generator replaying FreeRADIUS traffic against the freeradius API.
+
+``create_fixtures`` creates (or reuses) the organizations, NAS and users
+of the simulation, ``generate_sessions`` produces the requests which
+FreeRADIUS sends for each simulated session (authorize, postauth and
+accounting Start, Interim-Update and Stop) and ``run`` replays them
+with a number of concurrent clients:
+
+- ``HTTPSender`` sends them to a running server, which must use the
+  same database of this process (eg: a local SQLite file or PostgreSQL),
+  the queries are counted if the server sends the ``X-Query-Count``
+  header (``OPENWISP_INSTRUMENTATION_HEADER``);
+- ``ClientSender`` passes them to the views of this process and
+  counts the database queries of each request.
+"""
+import random
+import statistics
+import threading
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import swapper
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .utils import load_model
+
+API_PREFIX = '/api/v1/freeradius'
+
+LoadTestUser = namedtuple(
+    'LoadTestUser', ['username', 'password', 'organization_id', 'token', 'nas_ip']
+)
+Request = namedtuple('Request', ['kind', 'path', 'data', 'user'])
+Result = namedtuple('Result', ['kind', 'status', 'latency', 'queries'])
+
+
+def create_fixtures(
+    users=100, organizations=2, nas=2, password='loadtest', prefix='loadtest'
+):
+    """
+    Creates the organizations, NAS and users of the simulation
+    unless they exist already, returns a list of ``LoadTestUser``
+    """
+    Organization = swapper.load_model('openwisp_users', 'Organization')
+    OrganizationUser = swapper.load_model('openwisp_users', 'OrganizationUser')
+    OrganizationRadiusSettings = load_model('OrganizationRadiusSettings')
+    Nas = load_model('Nas')
+    User = get_user_model()
+    password_hash = make_password(password)
+    orgs = []
+    for i in range(organizations):
+        org, _ = Organization.objects.get_or_create(
+            slug=f'{prefix}-{i}', defaults={'name': f'{prefix} {i}'}
+        )
+        settings, _ = OrganizationRadiusSettings.objects.get_or_create(
+            organization=org
+        )
+        nas_ips = []
+        for j in range(nas):
+            Nas.objects.get_or_create(
+                name=f'10.{i}.{j}.0/24',
+                organization=org,
+                defaults={'short_name': f'{prefix}-{i}-{j}', 'secret': prefix},
+            )
+            nas_ips.append(f'10.{i}.{j}.1')
+        orgs.append((org, settings.token, nas_ips))
+    fixtures = []
+    for k in range(users):
+        org, token, nas_ips = orgs[k % organizations]
+        username = f'{prefix}-{k}'
+        user, created = User.objects.get_or_create(
+            username=username,
+            defaults={'email': f'{username}@example.com', 'password': password_hash},
+        )
+        if created:
+            OrganizationUser.objects.create(user=user, organization=org)
+        fixtures.append(
+            LoadTestUser(
+                username, password, str(org.pk), token, nas_ips[k % len(nas_ips)]
+            )
+        )
+    return fixtures
+
+
+def delete_fixtures(prefix='loadtest'):
+    Organization = swapper.load_model('openwisp_users', 'Organization')
+    RadiusAccounting = load_model('RadiusAccounting')
+    RadiusPostAuth = load_model('RadiusPostAuth')
+    RadiusAccounting.objects.filter(username__startswith=f'{prefix}-').delete()
+    RadiusPostAuth.objects.filter(username__startswith=f'{prefix}-').delete()
+    get_user_model().objects.filter(username__startswith=f'{prefix}-').delete()
+    Organization.objects.filter(slug__startswith=f'{prefix}-').delete()
+
+
+def _random_mac(rnd):
+    return ':'.join(f'{rnd.randint(0, 255):02x}' for _ in range(6))
+
+
+def generate_sessions(fixtures, sessions=200, interim=2, reject_ratio=0.1, seed=0):
+    """
+    Returns a list of sessions, each one is the list of the
+    requests sent by FreeRADIUS for a login of a random user:
+    a rejected login is made of authorize and postauth only
+    """
+    rnd = random.Random(seed)
+    result = []
+    for _ in range(sessions):
+        user = rnd.choice(fixtures)
+        rejected = rnd.random() < reject_ratio
+        calling_station_id = _random_mac(rnd)
+        called_station_id = f'{_random_mac(rnd).replace(":", "-")}:{user.nas_ip}'
+        session = [
+            Request(
+                'authorize',
+                f'{API_PREFIX}/authorize/',
+                {
+                    'username': user.username,
+                    'password': 'wrong' if rejected else user.password,
+                },
+                user,
+            ),
+            Request(
+                'postauth',
+                f'{API_PREFIX}/postauth/',
+                {
+                    'username': user.username,
+                    'password': '',
+                    'reply': 'Access-Reject' if rejected else 'Access-Accept',
+                    'called_station_id': called_station_id,
+                    'calling_station_id': calling_station_id,
+                },
+                user,
+            ),
+        ]
+        if rejected:
+            result.append(session)
+            continue
+        unique_id = uuid.UUID(int=rnd.getrandbits(128)).hex
+        status_types = ['Start'] + ['Interim-Update'] * interim + ['Stop']
+        input_octets = output_octets = session_time = 0
+        for status_type in status_types:
+            if status_type != 'Start':
+                session_time += rnd.randint(60, 600)
+                input_octets += rnd.randint(10**4, 10**7)
+                output_octets += rnd.randint(10**5, 10**8)
+            session.append(
+                Request(
+                    f'accounting-{status_type.lower()}',
+                    f'{API_PREFIX}/accounting/',
+                    {
+                        'status_type': status_type,
+                        'session_id': unique_id[:8],
+                        'unique_id': unique_id,
+                        'username': user.username,
+                        'realm': '',
+                        'nas_ip_address': user.nas_ip,
+                        'nas_port_id': '1',
+                        'nas_port_type': 'Wireless-802.11',
+                        'session_time': session_time,
+                        'authentication': 'RADIUS',
+                        'input_octets': input_octets,
+                        'output_octets': output_octets,
+                        'called_station_id': called_station_id,
+                        'calling_station_id': calling_station_id,
+                        'terminate_cause': (
+                            'User-Request' if status_type == 'Stop' else ''
+                        ),
+                        'service_type': 'Login-User',
+                        'framed_protocol': '',
+                        'framed_ip_address': '',
+                    },
+                    user,
+                )
+            )
+        result.append(session)
+    return result
+
+
+def _get_headers(user):
+    return {'Authorization': f'Bearer {user.organization_id} {user.token}'}
+
+
+class HTTPSender(object):
+    """
+    Sends the requests to the server at ``url``
+    """
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.session = requests.Session()
+
+    def send(self, request):
+        response = self.session.post(
+            f'{self.url}{request.path}',
+            json=request.data,
+            headers=_get_headers(request.user),
+        )
+        # sent by the instrumentation middleware if enabled
+        queries = response.headers.get('X-Query-Count')
+        return response.status_code, int(queries) if queries else None
+
+
+class ClientSender(object):
+    """
+    Passes the requests to the views of this process
+    and counts the database queries of each one
+    """
+
+    def __init__(self):
+        self.client = Client(HTTP_HOST='localhost')
+
+    def send(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                request.path,
+                request.data,
+                content_type='application/json',
+                HTTP_AUTHORIZATION=_get_headers(request.user)['Authorization'],
+            )
+        return response.status_code, len(queries)
+
+
+def run(sessions, sender_class, concurrency=10, **sender_kwargs):
+    """
+    Replays ``sessions`` with ``concurrency`` clients, each one sends the
+    requests of a session in order, returns the list of ``Result`` and
+    the elapsed seconds; a single client runs in the calling thread
+    """
+    local = threading.local()
+
+    def replay(session):
+        if not hasattr(local, 'sender'):
+            local.sender = sender_class(**sender_kwargs)
+        results = []
+        for request in session:
+            started = time.perf_counter()
+            try:
+                status, queries = local.sender.send(request)
+            except requests.RequestException:
+                status, queries = None, None
+            results.append(
+                Result(request.kind, status, time.perf_counter() - started, queries)
+            )
+        return results
+
+    def replay_in_pool(session):
+        try:
+            return replay(session)
+        finally:
+            # the connections of the threads of the pool are not
+            # closed by django at the end of the requests
+            close_old_connections()
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            session_results = list(executor.map(replay_in_pool, sessions))
+    else:
+        session_results = [replay(session) for session in sessions]
+    results = [result for results in session_results for result in results]
+    return results, time.perf_counter() - started
+
+
+def percentile(values, percent):
+    """
+    Returns the ``percent`` percentile of the sorted ``values``
+    """
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def _is_error(result):
+    # rejected logins are answered with 401 if API_AUTHORIZE_REJECT is enabled
+    if result.kind == 'authorize' and result.status == 401:
+        return False
+    return result.status is None or result.status >= 400
+
+
+def summarize(results):
+    """
+    Returns the statistics of ``results`` by kind of request:
+    {kind: {'requests', 'errors', 'median', 'p95', 'p99', 'queries'}},
+    the latencies are in milliseconds, ``queries`` is the
+    average number of queries (``None`` if not counted)
+    """
+    by_kind = defaultdict(list)
+    for result in results:
+        by_kind[result.kind].append(result)
+    by_kind['total'] = results
+    summary = {}
+    for kind, kind_results in by_kind.items():
+        latencies = sorted(result.latency * 1000 for result in kind_results)
+        queries = [r.queries for r in kind_results if r.queries is not None]
+        summary[kind] = {
+            'requests': len(kind_results),
+            'errors': len([r for r in kind_results if _is_error(r)]),
+            'median': statistics.median(latencies),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'queries': statistics.mean(queries) if queries else None,
+        }
+    return summary
@@ -0,0 +1,83 @@
+from django.core.management import BaseCommand
+
+from .... import loadtest
+
+
+class BaseBenchmarkFreeradiusCommand(BaseCommand):
+    help = (
+        'Replays the FreeRADIUS traffic (authorize, postauth and accounting) '
+        'of simulated users and reports the throughput, the latency percentiles '
+        'and, with --in-process, the database queries of each request; '
+        'the users, organizations and NAS are created in the database '
+        'if they do not exist, which must be the one of the tested server'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument(
+            '--in-process',
+            action='store_true',
+            help='Send the requests to the views of this process, counting queries',
+        )
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--organizations', type=int, default=2)
+        parser.add_argument('--nas', type=int, default=2, help='NAS per organization')
+        parser.add_argument('--sessions', type=int, default=200)
+        parser.add_argument(
+            '--interim', type=int, default=2, help='Interim-Updates per session'
+        )
+        parser.add_argument(
+            '--reject-ratio', type=float, default=0.1, help='Ratio of failed logins'
+        )
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='loadtest')
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Delete the simulated users, organizations and sessions at the end',
+        )
+
+    def handle(self, *args, **options):
+        fixtures = loadtest.create_fixtures(
+            users=options['users'],
+            organizations=options['organizations'],
+            nas=options['nas'],
+            prefix=options['prefix'],
+        )
+        sessions = loadtest.generate_sessions(
+            fixtures,
+            sessions=options['sessions'],
+            interim=options['interim'],
+            reject_ratio=options['reject_ratio'],
+            seed=options['seed'],
+        )
+        if options['in_process']:
+            sender_class, sender_kwargs = loadtest.ClientSender, {}
+        else:
+            sender_class, sender_kwargs = loadtest.HTTPSender, {'url': options['url']}
+        try:
+            results, elapsed = loadtest.run(
+                sessions, sender_class, options['concurrency'], **sender_kwargs
+            )
+        finally:
+            if options['cleanup']:
+                loadtest.delete_fixtures(options['prefix'])
+        self.report(loadtest.summarize(results), len(results), elapsed)
+
+    def report(self, summary, requests, elapsed):
+        self.stdout.write(
+            f'{requests} requests in {elapsed:.2f}s ({requests / elapsed:.1f} req/s)'
+        )
+        self.stdout.write(
+            f'{"request":<28}{"count":>7}{"errors":>8}'
+            f'{"median":>10}{"p95":>10}{"p99":>10}{"queries":>9}'
+        )
+        for kind, stats in summary.items():
+            queries = stats['queries']
+            queries = f'{queries:.1f}' if queries is not None else '-'
+            self.stdout.write(
+                f'{kind:<28}{stats["requests"]:>7}{stats["errors"]:>8}'
+                f'{stats["median"]:>8.1f}ms{stats["p95"]:>8.1f}ms'
+                f'{stats["p99"]:>8.1f}ms{queries:>9}'
+            )
@@ -1,9 +1,11 @@
 import logging
 import re
 import telnetlib
+from concurrent.futures import ThreadPoolExecutor
 from uuid import UUID
 
 import openvpn_status
+from django.core.cache import cache
 from django.core.management import BaseCommand
 from netaddr import EUI, mac_unix
 
@@ -40,9 +42,22 @@ class BaseConvertCalledStationIdCommand(BaseCommand):
             )
         return raw_management_info
 
-    def _get_openvpn_routing_info(self, host, port=7505, password=None):
+    def _get_openvpn_routing_info(
+        self, host, port=7505, password=None, use_cache=True
+    ):
+        cache_key = f'openvpn-status-{host}:{port}'
         try:
-            raw_info = self._get_raw_management_info(host, port, password)
+            raw_info = cache.get(cache_key) if use_cache else None
+            if raw_info is None:
+                raw_info = self._get_raw_management_info(host, port, password)
+                # the status is reused by the conversions of the sessions
+                # started shortly after, eg: when the VPN server restarts
+                if app_settings.OPENVPN_STATUS_CACHE_TIMEOUT:
+                    cache.set(
+                        cache_key,
+                        raw_info,
+                        timeout=app_settings.OPENVPN_STATUS_CACHE_TIMEOUT,
+                    )
         except ConnectionRefusedError:
             logger.warning(
                 'Unable to establish telnet connection to '
@@ -64,12 +79,40 @@ class BaseConvertCalledStationIdCommand(BaseCommand):
             parsed_info = openvpn_status.parse_status(raw_info)
             return parsed_info.routing_table
         except openvpn_status.ParsingError as error:
+            cache.delete(cache_key)
             logger.warning(
                 'Unable to parse information received from '
                 f'{host}:{port}. ParsingError: {error}. Skipping!',
             )
             return {}
 
+    def _get_routing_dict(self, openvpn_configs, use_cache=True):
+        """
+        Polls the management interfaces of ``openvpn_configs``
+        concurrently, an unreachable host delays the conversion
+        by one connection timeout instead of one per host
+        """
+        if not openvpn_configs:
+            return {}
+        workers = min(len(openvpn_configs), app_settings.OPENVPN_STATUS_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            routing_tables = executor.map(
+                lambda openvpn_config: self._get_openvpn_routing_info(
+                    openvpn_config['host'],
+                    openvpn_config.get('port', 7505),
+                    openvpn_config.get('password', None),
+                    use_cache,
+                ),
+                openvpn_configs,
+            )
+            routing_dict = {}
+            for routing_table in routing_tables:
+                routing_dict.update(routing_table)
+        return routing_dict
+
+    def _get_routing_key(self, radius_session):
+        return str(EUI(radius_session.calling_station_id, dialect=mac_unix))
+
     def _get_radius_session(self, unique_id):
         try:
             return RadiusAccounting.objects.select_related('organization').get(
@@ -128,14 +171,14 @@ class BaseConvertCalledStationIdCommand(BaseCommand):
                 return
 
         for org, config in called_station_id_setting.items():
-            routing_dict = {}
-            for openvpn_config in config['openvpn_config']:
-                routing_dict.update(
-                    self._get_openvpn_routing_info(
-                        openvpn_config['host'],
-                        openvpn_config.get('port', 7505),
-                        openvpn_config.get('password', None),
-                    )
+            routing_dict = self._get_routing_dict(config['openvpn_config'])
+            if unique_id and (
+                self._get_routing_key(input_radius_session) not in routing_dict
+            ):
+                # the cached status can predate the session, which is
+                # converted as soon as it starts: the interfaces are polled again
+                routing_dict = self._get_routing_dict(
+                    config['openvpn_config'], use_cache=False
                 )
             if not routing_dict:
                 logger.info(f'No routing information found for "{org}" organization')
@@ -145,10 +188,11 @@ class BaseConvertCalledStationIdCommand(BaseCommand):
                 qs = [input_radius_session]
             else:
                 qs = self._get_unconverted_sessions(org, config['unconverted_ids'])
+            converted_sessions = []
             for radius_session in qs:
                 try:
                     common_name = routing_dict[
-                        str(EUI(radius_session.calling_station_id, dialect=mac_unix))
+                        self._get_routing_key(radius_session)
                     ].common_name
                     mac_address = RE_VIRTUAL_ADDR_MAC.search(common_name)[0]
                     radius_session.called_station_id = mac_address.replace(':', '-')
@@ -163,7 +207,10 @@ class BaseConvertCalledStationIdCommand(BaseCommand):
                         f'Skipping {radius_session.session_id}!'
                     )
                 else:
-                    radius_session.save()
+                    converted_sessions.append(radius_session)
+            RadiusAccounting.objects.bulk_update(
+                converted_sessions, ['called_station_id'], batch_size=1000
+            )
 
 
 # monkey patching for openvpn_status begins
@@ -0,0 +1,69 @@
+import swapper
+from django.core.management import BaseCommand, CommandError
+
+from ....exports import EXPORTS, FORMATS, ExportError, stream_export
+
+Organization = swapper.load_model('openwisp_users', 'Organization')
+
+
+class BaseExportRadiusDataCommand(BaseCommand):
+    help = (
+        'Exports the accounting sessions or the post-auth log as CSV or '
+        'NDJSON, the rows are streamed hence any range can be exported'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS))
+        parser.add_argument(
+            '--output-format', choices=list(FORMATS), default='csv', dest='format'
+        )
+        parser.add_argument(
+            '--organization',
+            action='append',
+            dest='organizations',
+            help='Slug of the organization to export (default: all of them)',
+        )
+        parser.add_argument('--start', help='ISO 8601 date or datetime (included)')
+        parser.add_argument('--end', help='ISO 8601 date or datetime (excluded)')
+        parser.add_argument('--username')
+        parser.add_argument('--output', help='Path of the file (default: stdout)')
+        parser.add_argument(
+            '--gzip', action='store_true', help='Compress the output with gzip'
+        )
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def get_organization_ids(self, slugs):
+        if not slugs:
+            return None
+        organizations = dict(
+            Organization.objects.filter(slug__in=slugs).values_list('slug', 'pk')
+        )
+        missing = set(slugs) - set(organizations)
+        if missing:
+            raise CommandError(f'Organizations not found: {", ".join(sorted(missing))}')
+        return list(organizations.values())
+
+    def handle(self, *args, **options):
+        if options['gzip'] and not options['output']:
+            raise CommandError('--gzip requires --output')
+        try:
+            stream = stream_export(
+                options['kind'],
+                format=options['format'],
+                compress=options['gzip'],
+                chunk_size=options['chunk_size'],
+                organization_ids=self.get_organization_ids(options['organizations']),
+                start=options['start'],
+                end=options['end'],
+                username=options['username'],
+            )
+        except ExportError as e:
+            raise CommandError(e)
+        if not options['output']:
+            for chunk in stream:
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        with open(options['output'], 'wb') as f:
+            for chunk in stream:
+                f.write(chunk)
+        self.stdout.write(f'Exported {options["kind"]} to {options["output"]}')
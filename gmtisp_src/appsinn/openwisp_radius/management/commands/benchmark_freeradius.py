@@ -0,0 +1,5 @@
+from .base.benchmark_freeradius import BaseBenchmarkFreeradiusCommand
+
+
+class Command(BaseBenchmarkFreeradiusCommand):
+    pass
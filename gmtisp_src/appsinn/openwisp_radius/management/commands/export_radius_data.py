@@ -0,0 +1,5 @@
+from .base.export_radius_data import BaseExportRadiusDataCommand
+
+
+class Command(BaseExportRadiusDataCommand):
+    pass
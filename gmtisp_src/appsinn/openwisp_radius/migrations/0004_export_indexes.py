@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            'openwisp_radius',
+            '0003_alter_organizationradiussettings_allowed_mobile_prefixes_and_more',
+        ),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='radiusaccounting',
+            index=models.Index(
+                fields=['organization', 'start_time'], name='radacct_organiz_9f65a1_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='radiuspostauth',
+            index=models.Index(
+                fields=['organization', 'date'], name='radpostauth_organiz_e98523_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='radiuspostauth',
+            index=models.Index(
+                fields=['username', 'date'], name='radpostauth_usernam_5db6e3_idx'
+            ),
+        ),
+    ]
@@ -0,0 +1,151 @@
+"""
+Per process index of the networks of the NAS objects.
+
+Answers "which NAS owns this IP address" with a longest prefix match:
+the networks are grouped by IP version and prefix length, so a lookup
+masks the address once per prefix length in use (at most 33 for IPv4
+and 129 for IPv6), regardless of the number of NAS objects.
+
+The index is rebuilt lazily after a NAS is saved or deleted in any
+process: the receivers change a generation stored in the cache, which
+is compared with the one of the index at each lookup. The generation
+must be visible to all the processes (eg: the celery workers which
+send the CoA requests), hence the index is used only if the cache is
+shared, otherwise the NAS are read from the database at each lookup.
+"""
+import ipaddress
+import logging
+import threading
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from openwisp_utils.utils import is_shared_cache
+
+from .utils import load_model
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'nas_registry_generation'
+
+NasEntry = namedtuple('NasEntry', ['id', 'organization_id', 'secret', 'network'])
+
+
+class NasIndex(object):
+    """
+    Longest prefix match index of ``NasEntry`` objects
+    """
+
+    def __init__(self, entries=()):
+        # {version: {prefixlen: (netmask, {network_address: [entries]})}}
+        self._tables = {4: {}, 6: {}}
+        for entry in entries:
+            self._add(entry)
+        self._sort()
+
+    def _add(self, entry):
+        network = entry.network
+        table = self._tables[network.version].setdefault(
+            network.prefixlen, (int(network.netmask), {})
+        )
+        table[1].setdefault(int(network.network_address), []).append(entry)
+
+    def _sort(self):
+        # the most specific networks are looked up first
+        self._lookup_order = {
+            version: [
+                tables[prefixlen] for prefixlen in sorted(tables, reverse=True)
+            ]
+            for version, tables in self._tables.items()
+        }
+
+    def lookup(self, ip_address, organization_id=None):
+        """
+        Returns the entry with the longest prefix containing ``ip_address``,
+        among the ones of ``organization_id`` if given, or ``None``
+        """
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return None
+        address_int = int(address)
+        for netmask, networks in self._lookup_order[address.version]:
+            for entry in networks.get(address_int & netmask, ()):
+                if organization_id is None or str(entry.organization_id) == str(
+                    organization_id
+                ):
+                    return entry
+        return None
+
+
+def build_index(organization_id=None):
+    Nas = load_model('Nas')
+    queryset = Nas.objects.all()
+    if organization_id is not None:
+        queryset = queryset.filter(organization_id=organization_id)
+    entries = []
+    for nas_id, name, organization_id, secret in queryset.values_list(
+        'id', 'name', 'organization_id', 'secret'
+    ).iterator():
+        try:
+            network = ipaddress.ip_network(name)
+        except ValueError:
+            logger.warning(
+                f'Failed to parse NAS IP network for "{nas_id}" object. Skipping!'
+            )
+            continue
+        entries.append(NasEntry(nas_id, organization_id, secret, network))
+    return NasIndex(entries)
+
+
+class NasRegistry(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._generation = None
+
+    def _get_generation(self):
+        generation = cache.get(GENERATION_KEY)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            if not cache.add(GENERATION_KEY, generation, timeout=None):
+                generation = cache.get(GENERATION_KEY, generation)
+        return generation
+
+    def get_index(self):
+        generation = self._get_generation()
+        if self._index is None or self._generation != generation:
+            with self._lock:
+                if self._index is None or self._generation != generation:
+                    self._index = build_index()
+                    self._generation = generation
+        return self._index
+
+    def lookup(self, ip_address, organization_id=None):
+        return self.get_index().lookup(ip_address, organization_id)
+
+    def invalidate(self):
+        cache.set(GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+        self._index = None
+
+
+registry = NasRegistry()
+
+
+def get_nas(ip_address, organization_id=None):
+    """
+    Returns the ``NasEntry`` (id, organization_id, secret, network)
+    of the most specific NAS network containing ``ip_address``,
+    among the NAS of ``organization_id`` if given, or ``None``
+    """
+    if not is_shared_cache():
+        # the changes made by other processes would not be seen
+        return build_index(organization_id).lookup(ip_address, organization_id)
+    return registry.lookup(ip_address, organization_id)
+
+
+def nas_changed_handler(**kwargs):
+    # an index rebuilt before the commit would miss the change
+    transaction.on_commit(registry.invalidate)
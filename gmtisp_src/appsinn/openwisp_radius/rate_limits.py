@@ -0,0 +1,137 @@
+"""
+Cache based counters used to rate limit the SMS verification flow
+without counting rows in the database.
+
+The counters are used only if ``SMS_RATE_LIMIT_CACHE`` is shared by
+all the processes (see ``is_enabled``), the limits counted in a local
+memory cache would apply to each process and be reset on restart.
+"""
+import math
+
+from django.core.cache import caches
+from django.utils import timezone
+
+from openwisp_utils.utils import is_shared_cache
+
+from . import settings as app_settings
+
+
+def get_cache():
+    return caches[app_settings.SMS_RATE_LIMIT_CACHE]
+
+
+def is_enabled():
+    """
+    Returns ``True`` if the limits are counted in the cache,
+    otherwise the phone tokens are counted in the database
+    """
+    return is_shared_cache(app_settings.SMS_RATE_LIMIT_CACHE)
+
+
+class SlidingWindowCounter(object):
+    """
+    Counts events in a sliding window of ``window`` seconds.
+
+    The window is split in ``buckets`` cache keys, incrementing
+    a bucket is an atomic operation of the cache backend and
+    counting the events of the window takes a single ``get_many``.
+    """
+
+    def __init__(self, name, window=86400, buckets=24):
+        self.name = name
+        self.window = window
+        self.bucket_size = window / buckets
+        self.buckets = buckets
+
+    def _bucket(self, when):
+        return math.floor(when.timestamp() / self.bucket_size)
+
+    def _key(self, key, bucket):
+        return f'rate-limit:{self.name}:{key}:{bucket}'
+
+    def incr(self, key, when=None):
+        cache = get_cache()
+        bucket_key = self._key(key, self._bucket(when or timezone.now()))
+        # add() is a no-op if the bucket already exists
+        cache.add(bucket_key, 0, timeout=self.window + self.bucket_size)
+        try:
+            return cache.incr(bucket_key)
+        except ValueError:
+            # the bucket expired between add() and incr()
+            cache.set(bucket_key, 1, timeout=self.window + self.bucket_size)
+            return 1
+
+    def count(self, key, when=None):
+        current = self._bucket(when or timezone.now())
+        keys = [
+            self._key(key, bucket)
+            for bucket in range(current - self.buckets + 1, current + 1)
+        ]
+        return sum(get_cache().get_many(keys).values())
+
+
+class Cooldown(object):
+    """
+    Allows an action once every ``seconds`` for each key.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def _key(self, key):
+        return f'cooldown:{self.name}:{key}'
+
+    def start(self, key, seconds):
+        """
+        Starts the cooldown of ``key`` atomically, returns ``0`` if the
+        cooldown was started, otherwise the remaining seconds of the
+        cooldown which is already running.
+        """
+        if not seconds:
+            return 0
+        now = timezone.now().timestamp()
+        cache = get_cache()
+        if cache.add(self._key(key), now, timeout=seconds):
+            return 0
+        started = cache.get(self._key(key), now)
+        return max(seconds - round(now - started), 1)
+
+    def cancel(self, key):
+        """
+        Ends the cooldown of ``key``, eg: when the action it
+        was started for failed and can be retried right away
+        """
+        get_cache().delete(self._key(key))
+
+
+class ConcurrencyLimit(object):
+    """
+    Semaphore shared by the processes using the same cache.
+
+    Slots expire after ``timeout`` seconds, so that the slots
+    of crashed processes are eventually released.
+    """
+
+    def __init__(self, name, timeout=120):
+        self.name = name
+        self.timeout = timeout
+
+    def acquire(self, key, limit):
+        """
+        Returns the key of the acquired slot or ``None`` if all the slots are busy
+        """
+        cache = get_cache()
+        for slot in range(limit):
+            slot_key = f'concurrency:{self.name}:{key}:{slot}'
+            if cache.add(slot_key, 1, timeout=self.timeout):
+                return slot_key
+        return None
+
+    def release(self, slot_key):
+        get_cache().delete(slot_key)
+
+
+sms_user_daily = SlidingWindowCounter('sms-user')
+sms_ip_daily = SlidingWindowCounter('sms-ip')
+sms_cooldown = Cooldown('sms')
+sms_backend_concurrency = ConcurrencyLimit('sms-backend')
@@ -4,7 +4,7 @@ Receiver functions for django signals (eg: post_save)
 import logging
 
 from celery.exceptions import OperationalError
-from django.db import transaction
+from django.db import router, transaction
 from django.utils.timezone import now
 
 from openwisp_radius.tasks import send_login_email
@@ -107,13 +107,18 @@ def close_previous_radius_accounting_sessions(instance, created, **kwargs):
     if not created or not instance.called_station_id:
         return
     RadiusAccounting = load_model('RadiusAccounting')
+    # the sessions of the organizations which have their own
+    # database are stored there, like the new one
+    alias = instance._state.db
     closed_sessions = []
-    open_sessions = RadiusAccounting.objects.exclude(
-        unique_id=instance.unique_id
-    ).filter(
-        stop_time__isnull=True,
-        calling_station_id=instance.calling_station_id,
-        username=instance.username,
+    open_sessions = (
+        RadiusAccounting.objects.using(alias)
+        .exclude(unique_id=instance.unique_id)
+        .filter(
+            stop_time__isnull=True,
+            calling_station_id=instance.calling_station_id,
+            username=instance.username,
+        )
     )
     for session in open_sessions:
         session.stop_time = session.update_time or now()
@@ -122,7 +127,7 @@ def close_previous_radius_accounting_sessions(instance, created, **kwargs):
     # avoid bulk update if not necessary
     if not closed_sessions:
         return
-    RadiusAccounting.objects.bulk_update(
+    RadiusAccounting.objects.using(alias).bulk_update(
         closed_sessions, fields=['stop_time', 'terminate_cause']
     )
 
@@ -134,10 +139,18 @@ def radius_user_group_change(sender, instance, **kwargs):
         db_instance = RadiusUserGroup.objects.only('group_id').get(id=instance.id)
     except RadiusUserGroup.DoesNotExist:
         return
-    user_has_open_session = RadiusAccounting.objects.filter(
-        username=instance.username, stop_time__isnull=True
-    ).exists()
-    if instance.group_id != db_instance.group_id and user_has_open_session:
+    if instance.group_id == db_instance.group_id:
+        return
+    # the sessions are stored in the database of the organization
+    organization_id = instance.group.organization_id if instance.group_id else None
+    user_has_open_session = (
+        RadiusAccounting.objects.using(
+            router.db_for_read(RadiusAccounting, organization_id=organization_id)
+        )
+        .filter(username=instance.username, stop_time__isnull=True)
+        .exists()
+    )
+    if user_has_open_session:
         transaction.on_commit(
             lambda: tasks.perform_change_of_authorization.delay(
                 user_id=instance.user_id,
@@ -8,6 +8,8 @@ from django.core.exceptions import ImproperlyConfigured
 from django.utils.module_loading import import_string
 from django.utils.translation import gettext_lazy as _
 
+from openwisp_utils.utils import default_or_test, is_shared_cache
+
 # 'pre_django_setup' is supposed to be a logger
 # that can work before registered Apps are
 # ready in django.setup() process.
@@ -66,9 +68,21 @@ SAML_UPDATES_PRE_EXISTING_USERNAME = get_settings_value(
 UNVERIFY_INACTIVE_USERS = get_settings_value('UNVERIFY_INACTIVE_USERS', 0)
 DELETE_INACTIVE_USERS = get_settings_value('DELETE_INACTIVE_USERS', 0)
 DISPOSABLE_RADIUS_USER_TOKEN = get_settings_value('DISPOSABLE_RADIUS_USER_TOKEN', True)
+VALIDATE_AUTH_TOKEN_CACHE_TIMEOUT = get_settings_value(
+    'VALIDATE_AUTH_TOKEN_CACHE_TIMEOUT', default_or_test(300, 0)
+)
+USER_ACTIVITY_INTERVAL = get_settings_value('USER_ACTIVITY_INTERVAL', 60)
+# the activity is queued in the cache, which must be shared by the processes
+USER_ACTIVITY_WRITE_BEHIND = get_settings_value('USER_ACTIVITY_WRITE_BEHIND', False)
 API_ACCOUNTING_AUTO_GROUP = get_settings_value('API_ACCOUNTING_AUTO_GROUP', True)
 FREERADIUS_ALLOWED_HOSTS = get_settings_value('FREERADIUS_ALLOWED_HOSTS', [])
+# serves the freeradius API with async views (for ASGI servers)
+FREERADIUS_ASYNC_VIEWS = get_settings_value('FREERADIUS_ASYNC_VIEWS', False)
+# threads (hence database connections) used by the async views of each process
+FREERADIUS_ASYNC_THREADS = get_settings_value('FREERADIUS_ASYNC_THREADS', 20)
 EXTRA_NAS_TYPES = get_settings_value('EXTRA_NAS_TYPES', tuple())
+# rows fetched from the database (and rendered) at a time by the exports
+EXPORT_CHUNK_SIZE = get_settings_value('EXPORT_CHUNK_SIZE', 2000)
 MAX_CSV_FILE_SIZE = get_settings_value('MAX_FILE_SIZE', 5 * 1024 * 1024)
 BATCH_PDF_TEMPLATE = get_settings_value(
     'BATCH_PDF_TEMPLATE',
@@ -97,6 +111,13 @@ SMS_TOKEN_MAX_USER_DAILY = get_settings_value('SMS_TOKEN_MAX_USER_DAILY', 5)
 SMS_COOLDOWN = get_settings_value('SMS_COOLDOWN', 30)
 # default is high because openwisp-wifi-login-pages results always as 1 IP
 SMS_TOKEN_MAX_IP_DAILY = get_settings_value('SMS_TOKEN_MAX_IP_DAILY', 999)
+# the SMS limits are counted in this cache, it must be shared
+# by all the processes (eg: redis) for the limits to be global
+SMS_RATE_LIMIT_CACHE = get_settings_value('SMS_RATE_LIMIT_CACHE', 'default')
+# maximum number of SMS sent in parallel by each SMS backend
+SMS_BACKEND_CONCURRENCY = get_settings_value('SMS_BACKEND_CONCURRENCY', {})
+SMS_DEFAULT_CONCURRENCY = get_settings_value('SMS_DEFAULT_CONCURRENCY', 10)
+SMS_SEND_MAX_RETRIES = get_settings_value('SMS_SEND_MAX_RETRIES', 5)
 ALLOWED_MOBILE_PREFIXES = get_settings_value('ALLOWED_MOBILE_PREFIXES', [])
 ALLOW_FIXED_LINE_OR_MOBILE = get_settings_value('ALLOW_FIXED_LINE_OR_MOBILE', False)
 REGISTRATION_API_ENABLED = get_settings_value('REGISTRATION_API_ENABLED', True)
@@ -130,6 +151,13 @@ except AssertionError as error:  # pragma: no cover
         f'OPENWISP_RADIUS_PASSWORD_RESET_URLS is invalid: {error}'
     )
 
+if USER_ACTIVITY_WRITE_BEHIND and not is_shared_cache():  # pragma: no cover
+    raise ImproperlyConfigured(
+        'OPENWISP_RADIUS_USER_ACTIVITY_WRITE_BEHIND requires a cache shared '
+        'by the web and the celery processes (eg: redis or memcached): '
+        'the activity queued by the web processes is flushed by celery.'
+    )
+
 try:
     SMS_TOKEN_HASH_ALGORITHM = getattr(hashlib, SMS_TOKEN_HASH_ALGORITHM)
 except ImportError as error:  # pragma: no cover
@@ -175,6 +203,10 @@ CONVERT_CALLED_STATION_ON_CREATE = get_settings_value(
 OPENVPN_DATETIME_FORMAT = get_settings_value(
     'OPENVPN_DATETIME_FORMAT', u'%a %b %d %H:%M:%S %Y'
 )
+OPENVPN_STATUS_CACHE_TIMEOUT = get_settings_value(
+    'OPENVPN_STATUS_CACHE_TIMEOUT', default_or_test(30, 0)
+)
+OPENVPN_STATUS_WORKERS = get_settings_value('OPENVPN_STATUS_WORKERS', 10)
 
 TRAFFIC_COUNTER_CHECK_NAME = get_settings_value(
     'TRAFFIC_COUNTER_CHECK_NAME', 'Max-Daily-Session-Traffic'
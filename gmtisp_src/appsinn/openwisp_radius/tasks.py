@@ -1,5 +1,5 @@
-import ipaddress
 import logging
+import random
 from datetime import timedelta
 
 import swapper
@@ -13,9 +13,12 @@ from django.utils import timezone, translation
 from django.utils.translation import gettext_lazy as _
 
 from openwisp_utils.admin_theme.email import send_email
+from openwisp_utils.routers import get_routed_databases
 from openwisp_utils.tasks import OpenwispCeleryTask
 
+from . import activity
 from . import settings as app_settings
+from .nas_registry import get_nas
 from .radclient.client import RadClient
 from .utils import get_one_time_login_url, load_model
 
@@ -70,6 +73,14 @@ def delete_inactive_users():
     RegisteredUser.delete_inactive_users()
 
 
+@shared_task
+def flush_user_activity():
+    """
+    Writes the last activity of the users recorded by the RADIUS API
+    """
+    return activity.flush()
+
+
 @shared_task
 def convert_called_station_id(unique_id=None):
     management.call_command('convert_called_station_id', unique_id=unique_id)
@@ -118,28 +129,52 @@ def send_login_email(accounting_data):
         send_email(subject, body_html, body_html, [user.email], context)
 
 
+@shared_task(bind=True)
+def send_sms(self, body, from_phone, to, meta_data=None):
+    """
+    Sends an SMS through the configured SMS backend, with at most
+    ``SMS_BACKEND_CONCURRENCY`` messages sent at the same time
+    by each backend; failed sends are retried with a backoff.
+    """
+    from .rate_limits import sms_backend_concurrency
+    from .utils import SmsMessage
+
+    backend = getattr(settings, 'SENDSMS_BACKEND', 'default')
+    limit = app_settings.SMS_BACKEND_CONCURRENCY.get(
+        backend, app_settings.SMS_DEFAULT_CONCURRENCY
+    )
+    countdown = min(2**self.request.retries, 60) + random.random()
+    slot = sms_backend_concurrency.acquire(backend, limit)
+    if slot is None:
+        raise self.retry(
+            countdown=countdown, max_retries=app_settings.SMS_SEND_MAX_RETRIES
+        )
+    try:
+        sms_message = SmsMessage(body=body, from_phone=from_phone, to=to)
+        sms_message.send(meta_data=meta_data)
+    except Exception as e:
+        logger.warning(f'Failed to send SMS to {to}: {e}')
+        raise self.retry(
+            exc=e, countdown=countdown, max_retries=app_settings.SMS_SEND_MAX_RETRIES
+        )
+    finally:
+        sms_backend_concurrency.release(slot)
+
+
 @shared_task
-def perform_change_of_authorization(user_id, old_group_id, new_group_id):
+def perform_change_of_authorization(
+    user_id, old_group_id, new_group_id, extra_attributes=None
+):
     RadiusAccounting = load_model('RadiusAccounting')
     RadiusGroupCheck = load_model('RadiusGroupCheck')
     RadiusGroup = load_model('RadiusGroup')
-    Nas = load_model('Nas')
+    OrganizationRadiusSettings = load_model('OrganizationRadiusSettings')
     User = get_user_model()
 
     def get_radsecret_from_radacct(rad_acct):
-        qs = Nas.objects.filter(organization_id=rad_acct.organization_id).only(
-            'name', 'secret'
-        )
-        for nas in qs.iterator():
-            try:
-                if ipaddress.ip_address(
-                    rad_acct.nas_ip_address
-                ) in ipaddress.ip_network(nas.name):
-                    return nas.secret
-            except ValueError:
-                logger.warning(
-                    f'Failed to parse NAS IP network for "{nas.id}" object. Skipping!'
-                )
+        nas = get_nas(rad_acct.nas_ip_address, rad_acct.organization_id)
+        if nas:
+            return nas.secret
 
     def get_radius_reply_name_and_value(user, check):
         Counter = app_settings.CHECK_ATTRIBUTE_COUNTERS_MAP[check.attribute]
@@ -178,10 +213,15 @@ def perform_change_of_authorization(user_id, old_group_id, new_group_id):
             f'Failed to find user with "{user_id}" ID. Skipping CoA operation.'
         )
         return
-    # Check if user has open RadiusAccounting sessions
-    open_sessions = RadiusAccounting.objects.filter(
-        username=user.username, stop_time__isnull=True
-    ).select_related('organization', 'organization__radius_settings')
+    # Check if user has open RadiusAccounting sessions, the sessions of
+    # the organizations which have their own database are stored there
+    open_sessions = []
+    for alias in get_routed_databases(RadiusAccounting):
+        open_sessions.extend(
+            RadiusAccounting.objects.using(alias).filter(
+                username=user.username, stop_time__isnull=True
+            )
+        )
     if not open_sessions:
         logger.warning(
             f'The user with "{user_id}" ID does not have any open'
@@ -199,10 +239,20 @@ def perform_change_of_authorization(user_id, old_group_id, new_group_id):
     else:
         attributes = get_radius_attributes(user)
 
+    if extra_attributes:
+        attributes.update(extra_attributes)
     attributes['User-Name'] = user.username
-    updated_sessions = []
+    # the settings are stored only in the default database
+    radius_settings = {
+        str(org_settings.organization_id): org_settings
+        for org_settings in OrganizationRadiusSettings.objects.filter(
+            organization_id__in={session.organization_id for session in open_sessions}
+        )
+    }
+    updated_sessions = {}
     for session in open_sessions:
-        if not session.organization.radius_settings.coa_enabled:
+        org_settings = radius_settings.get(str(session.organization_id))
+        if org_settings is None or not org_settings.coa_enabled:
             continue
         radsecret = get_radsecret_from_radacct(session)
         if not radsecret:
@@ -219,10 +269,13 @@ def perform_change_of_authorization(user_id, old_group_id, new_group_id):
         result = client.perform_change_of_authorization(attributes)
         if result is True:
             session.groupname = new_rad_group.name
-            updated_sessions.append(session)
+            updated_sessions.setdefault(session._state.db, []).append(session)
         else:
             logger.warning(
                 f'Failed to perform CoA for "{session.unique_id}"'
                 f' RadiusAccounting object of "{user}" user'
             )
-    RadiusAccounting.objects.bulk_update(updated_sessions, fields=['groupname'])
+    for alias, sessions in updated_sessions.items():
+        RadiusAccounting.objects.using(alias).bulk_update(
+            sessions, fields=['groupname']
+        )
@@ -3,6 +3,7 @@ import os
 import swapper
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase, TransactionTestCase
 from django.urls import reverse
 
@@ -211,6 +212,8 @@ class BaseTestMixin:
     def tearDown(self):
         for radbatch in RadiusBatch.objects.all():
             radbatch.delete()
+        # SMS rate limits are counted in the cache
+        cache.clear()
 
     def _superuser_login(self):
         admin = self._get_admin()
@@ -1,3 +1,6 @@
+import csv
+import gzip
+import io
 import json
 import os
 import sys
@@ -1053,6 +1056,98 @@ class TestApi(AcctMixin, ApiTokenMixin, BaseTestCase):
             },
         )
 
+    def _export(self, path, params=None):
+        response = self.client.get(path, params or {})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_radius_accounting_export(self):
+        path = reverse('radius:radius_accounting_export')
+        org1 = self.default_org
+        org2 = self._create_org(name='org2', slug='org2')
+        sessions = [
+            ('75058e50', 'tester', org1, '2024-01-10T10:00:00+00:00'),
+            ('12234f69', 'tester', org1, '2024-01-20T10:00:00+00:00'),
+            ('99144d60', 'admin', org2, '2024-01-15T10:00:00+00:00'),
+        ]
+        for unique_id, username, organization, start_time in sessions:
+            data = self.acct_post_data
+            data.update(
+                unique_id=unique_id,
+                session_id=unique_id,
+                username=username,
+                organization=organization,
+                start_time=start_time,
+            )
+            self._create_radius_accounting(**data)
+
+        with self.subTest('Test unauthenicated user'):
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 401)
+
+        org1_user = self._create_org_user(organization=org1, is_admin=True)
+        administrator = Group.objects.get(name='Administrator')
+        org1_user.user.groups.add(administrator)
+        self.client.force_login(org1_user.user)
+
+        with self.subTest('Test CSV of the managed organizations'):
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'text/csv')
+            self.assertIn('attachment;', response['Content-Disposition'])
+            rows = list(
+                csv.DictReader(
+                    io.StringIO(b''.join(response.streaming_content).decode())
+                )
+            )
+            self.assertEqual(
+                [row['unique_id'] for row in rows], ['75058e50', '12234f69']
+            )
+            self.assertEqual(rows[0]['organization_id'], str(org1.pk))
+
+        with self.subTest('Test organization not managed'):
+            response = self.client.get(path, {'organization': org2.slug})
+            self.assertEqual(response.status_code, 403)
+
+        with self.subTest('Test NDJSON and time range'):
+            content = self._export(
+                path, {'output': 'ndjson', 'start': '2024-01-15', 'end': '2024-01-19'}
+            )
+            self.assertEqual(content, b'')
+            # the end date is included
+            content = self._export(
+                path, {'output': 'ndjson', 'start': '2024-01-15', 'end': '2024-01-20'}
+            )
+            rows = [json.loads(line) for line in content.decode().splitlines()]
+            self.assertEqual([row['unique_id'] for row in rows], ['12234f69'])
+
+        with self.subTest('Test invalid parameters'):
+            response = self.client.get(path, {'output': 'xml'})
+            self.assertEqual(response.status_code, 400)
+            response = self.client.get(path, {'start': '2024-13-01'})
+            self.assertEqual(response.status_code, 400)
+
+        with self.subTest('Test superuser, gzip and username'):
+            self.client.force_login(self._create_admin())
+            response = self.client.get(path, {'compress': 'gzip'})
+            self.assertEqual(response['Content-Type'], 'application/gzip')
+            content = gzip.decompress(b''.join(response.streaming_content))
+            self.assertEqual(len(content.decode().splitlines()), 4)
+            content = self._export(path, {'username': 'admin', 'output': 'ndjson'})
+            rows = [json.loads(line) for line in content.decode().splitlines()]
+            self.assertEqual([row['unique_id'] for row in rows], ['99144d60'])
+
+    def test_radius_postauth_export(self):
+        path = reverse('radius:radius_postauth_export')
+        self._create_radius_postauth(username='steve', password='jones', reply='Accept')
+        self.client.force_login(self._create_admin())
+        content = self._export(path, {'output': 'ndjson'})
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['username'], 'steve')
+        self.assertNotIn('password', rows[0])
+        self.assertNotIn('jones', content.decode())
+
 
 class TestTransactionApi(AcctMixin, ApiTokenMixin, BaseTransactionTestCase):
     def test_user_radius_usage_view(self):
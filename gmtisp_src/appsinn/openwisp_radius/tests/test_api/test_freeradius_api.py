@@ -1,20 +1,25 @@
 import json
 import logging
 import uuid
+from io import StringIO
 from unittest import mock
 
 import swapper
+from asgiref.sync import async_to_sync
 from celery.exceptions import OperationalError
 from dateutil import parser
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
 from django.db import IntegrityError
+from django.test import AsyncRequestFactory
 from django.urls import reverse
 from django.utils.crypto import get_random_string
 from django.utils.timezone import now, timedelta
 from freezegun import freeze_time
 
+from openwisp_utils.routers import OrganizationRouter, organization_db
 from openwisp_utils.tests import capture_any_output, catch_signal
 
 from ... import registration
@@ -29,7 +34,9 @@ User = get_user_model()
 RadiusToken = load_model('RadiusToken')
 RadiusAccounting = load_model('RadiusAccounting')
 RadiusPostAuth = load_model('RadiusPostAuth')
+RadiusGroup = load_model('RadiusGroup')
 RadiusGroupReply = load_model('RadiusGroupReply')
+RadiusUserGroup = load_model('RadiusUserGroup')
 RegisteredUser = load_model('RegisteredUser')
 OrganizationRadiusSettings = load_model('OrganizationRadiusSettings')
 Organization = swapper.load_model('openwisp_users', 'Organization')
@@ -1349,6 +1356,46 @@ class TestTransactionFreeradiusApi(
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data, _AUTH_TYPE_ACCEPT_RESPONSE)
 
+    def test_async_views(self):
+        from ...api import async_views
+
+        self._get_org_user()
+        factory = AsyncRequestFactory()
+
+        with self.subTest('authorize'):
+            request = factory.post(
+                reverse('radius:authorize'),
+                {'username': 'tester', 'password': 'tester'},
+                HTTP_AUTHORIZATION=self.auth_header,
+            )
+            response = async_to_sync(async_views.authorize)(request)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, _AUTH_TYPE_ACCEPT_RESPONSE)
+
+        with self.subTest('postauth'):
+            request = factory.post(
+                reverse('radius:postauth'),
+                self._get_postauth_params(),
+                HTTP_AUTHORIZATION=self.auth_header,
+            )
+            response = async_to_sync(async_views.postauth)(request)
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(RadiusPostAuth.objects.count(), 1)
+
+        with self.subTest('accounting'):
+            data = self.acct_post_data
+            data['status_type'] = 'Start'
+            data = self._get_accounting_params(**data)
+            request = factory.post(
+                reverse('radius:accounting'),
+                json.dumps(data),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=self.auth_header,
+            )
+            response = async_to_sync(async_views.accounting)(request)
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(RadiusAccounting.objects.count(), 1)
+
     def test_authorize_200_querystring(self):
         self._get_org_user()
         post_url = f'{reverse("radius:authorize")}{self.token_querystring}'
@@ -2162,5 +2209,173 @@ class TestOgranizationRadiusSettings(ApiTokenMixin, BaseTestCase):
             self.fail('ValidationError not raised')
 
 
+class TestOrganizationDatabase(AcctMixin, ApiTokenMixin, BaseTestCase):
+    databases = {'default', 'db_tenant'}
+
+    def setUp(self):
+        super().setUp()
+        self.tenant = self._create_org(name='tenant', slug='tenant')
+        self._create_org_user(organization=self.tenant, user=self._get_user())
+        call_command('setup_org_databases', skip_migrate=True, stdout=StringIO())
+        rad = self.tenant.radius_settings
+        self.tenant_auth_header = f'Bearer {self.tenant.pk} {rad.token}'
+
+    def test_setup_org_databases(self):
+        self.assertTrue(
+            Organization.objects.using('db_tenant').filter(pk=self.tenant.pk).exists()
+        )
+        self.assertFalse(
+            Organization.objects.using('db_tenant')
+            .filter(pk=self.default_org.pk)
+            .exists()
+        )
+        with self.subTest('Users are copied if the routed models refer to them'):
+            with self.settings(
+                OPENWISP_ORGANIZATION_DB_MODELS=['gmtisp_billing.UserUsage']
+            ):
+                call_command(
+                    'setup_org_databases', skip_migrate=True, stdout=StringIO()
+                )
+            self.assertTrue(
+                User.objects.using('db_tenant').filter(username='tester').exists()
+            )
+        with self.subTest('Existing rows are updated'):
+            Organization.objects.filter(pk=self.tenant.pk).update(name='renamed')
+            call_command('setup_org_databases', skip_migrate=True, stdout=StringIO())
+            self.assertEqual(
+                Organization.objects.using('db_tenant').get(pk=self.tenant.pk).name,
+                'renamed',
+            )
+        with self.subTest('Migrations are run on each alias'):
+            with mock.patch(
+                'openwisp_utils.management.commands.setup_org_databases.call_command'
+            ) as migrate:
+                call_command('setup_org_databases', stdout=StringIO())
+            migrate.assert_called_once()
+            self.assertEqual(migrate.call_args.kwargs['database'], 'db_tenant')
+        with self.subTest('Unknown alias'):
+            with self.assertRaises(CommandError):
+                call_command('setup_org_databases', aliases=['default'])
+
+    def test_router(self):
+        router = OrganizationRouter()
+        acct = RadiusAccounting(organization=self.tenant)
+        self.assertEqual(
+            router.db_for_write(RadiusAccounting, instance=acct), 'db_tenant'
+        )
+        self.assertEqual(
+            router.db_for_read(RadiusAccounting, organization_id=self.tenant.pk),
+            'db_tenant',
+        )
+        self.assertIsNone(
+            router.db_for_read(RadiusAccounting, organization_id=self.default_org.pk)
+        )
+        self.assertIsNone(router.db_for_read(RadiusAccounting))
+        self.assertIsNone(router.db_for_read(Organization, instance=self.tenant))
+        with organization_db(self.tenant):
+            self.assertEqual(router.db_for_read(RadiusAccounting), 'db_tenant')
+            self.assertEqual(router.db_for_read(RadiusPostAuth), 'db_tenant')
+            self.assertIsNone(router.db_for_read(User))
+        with self.subTest('Organizations which are renamed are not routed anymore'):
+            self.tenant.slug = 'renamed'
+            self.tenant.save()
+            self.assertIsNone(router.db_for_write(RadiusAccounting, instance=acct))
+
+    @capture_any_output()
+    @mock.patch('openwisp_radius.receivers.send_login_email.delay')
+    def test_accounting(self, send_login_email):
+        data = self.acct_post_data
+        data['status_type'] = 'Start'
+        data = self._get_accounting_params(**data)
+        response = self.client.post(
+            self._acct_url,
+            data=json.dumps(data),
+            HTTP_AUTHORIZATION=self.tenant_auth_header,
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(RadiusAccounting.objects.using('db_tenant').count(), 1)
+        self.assertEqual(RadiusAccounting.objects.using('default').count(), 0)
+
+        with self.subTest('Stop'):
+            data['status_type'] = 'Stop'
+            data['session_time'] = '300'
+            response = self.client.post(
+                self._acct_url,
+                data=json.dumps(data),
+                HTTP_AUTHORIZATION=self.tenant_auth_header,
+                content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 200)
+            acct = RadiusAccounting.objects.using('db_tenant').get()
+            self.assertIsNotNone(acct.stop_time)
+            self.assertEqual(acct.session_time, 300)
+
+        with self.subTest('Other organizations use the default database'):
+            data['unique_id'] = '75058e51'
+            data['status_type'] = 'Start'
+            response = self.post_json(data)
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(RadiusAccounting.objects.using('default').count(), 1)
+            self.assertEqual(RadiusAccounting.objects.using('db_tenant').count(), 1)
+
+    @capture_any_output()
+    def test_postauth(self):
+        params = self._get_postauth_params(username='tester', password='tester')
+        response = self.client.post(
+            reverse('radius:postauth'),
+            params,
+            HTTP_AUTHORIZATION=self.tenant_auth_header,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(RadiusPostAuth.objects.using('db_tenant').count(), 1)
+        self.assertEqual(RadiusPostAuth.objects.using('default').count(), 0)
+
+    @capture_any_output()
+    def test_mac_addr_roaming(self):
+        data = self.acct_post_data
+        data.update(
+            username='tester',
+            calling_station_id='00-11-22-33-44-55',
+            organization=self.tenant,
+        )
+        self._create_radius_accounting(**data)
+        self.assertEqual(RadiusAccounting.objects.using('db_tenant').count(), 1)
+        OrganizationRadiusSettings.objects.filter(organization=self.tenant).update(
+            mac_addr_roaming_enabled=True
+        )
+        response = self._authorize_user(
+            username=data['calling_station_id'],
+            password=data['calling_station_id'],
+            auth_header=self.tenant_auth_header,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['control:Auth-Type'], 'Accept')
+
+    @mock.patch('openwisp_radius.tasks.perform_change_of_authorization.delay')
+    def test_open_sessions(self, perform_coa):
+        data = self.acct_post_data
+        data.update(username='tester', organization=self.tenant)
+        session = self._create_radius_accounting(**data)
+
+        with self.subTest('Previous sessions are closed'):
+            data['unique_id'] = '75058e51'
+            self._create_radius_accounting(**data)
+            session.refresh_from_db()
+            self.assertEqual(session._state.db, 'db_tenant')
+            self.assertIsNotNone(session.stop_time)
+
+        with self.subTest('Change of authorization'):
+            user_group = RadiusUserGroup.objects.get(
+                user=self._get_user(), group__organization=self.tenant
+            )
+            user_group.group = RadiusGroup.objects.get(
+                organization=self.tenant, name__contains='power-users'
+            )
+            with self.captureOnCommitCallbacks(execute=True):
+                user_group.save()
+            perform_coa.assert_called_once()
+
+
 del BaseTestCase
 del BaseTransactionTestCase
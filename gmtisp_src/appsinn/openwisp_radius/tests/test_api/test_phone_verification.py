@@ -7,6 +7,7 @@ from allauth.account.models import EmailAddress
 from dateutil import parser
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.urls import reverse
 from django.utils import timezone
 from freezegun import freeze_time
@@ -14,8 +15,10 @@ from rest_framework.authtoken.models import Token
 
 from openwisp_utils.tests import capture_any_output, capture_stderr, capture_stdout
 
+from ... import rate_limits
 from ... import settings as app_settings
 from ...api.views import CreatePhoneTokenView
+from ...exceptions import SmsAttemptCooldownException
 from ...utils import load_model
 from .. import _TEST_DATE
 from ..mixins import ApiTokenMixin, BaseTestCase
@@ -277,6 +280,49 @@ class TestPhoneVerification(ApiTokenMixin, BaseTestCase):
             self.default_org.radius_settings.sms_cooldown,
         )
 
+    @capture_any_output()
+    def test_create_phone_token_failure_no_cooldown(self):
+        self._register_user()
+        token = Token.objects.last()
+        token_header = f'Bearer {token.key}'
+        url = reverse('radius:phone_token_create', args=[self.default_org.slug])
+        with mock.patch.object(
+            PhoneToken, 'send_token', side_effect=RuntimeError('broker down')
+        ):
+            with self.assertRaises(RuntimeError):
+                self.client.post(url, HTTP_AUTHORIZATION=token_header)
+        self.assertFalse(PhoneToken.objects.exists())
+        # the failed request did not start the cooldown
+        response = self.client.post(url, HTTP_AUTHORIZATION=token_header)
+        self.assertEqual(response.status_code, 201)
+
+    @capture_any_output()
+    @mock.patch(
+        'openwisp_radius.rate_limits.is_shared_cache', mock.Mock(return_value=True)
+    )
+    def test_create_phone_token_rate_limits_in_cache(self):
+        self._register_user()
+        token = Token.objects.last()
+        token_header = f'Bearer {token.key}'
+        url = reverse('radius:phone_token_create', args=[self.default_org.slug])
+        response = self.client.post(url, HTTP_AUTHORIZATION=token_header)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(rate_limits.sms_user_daily.count(token.user_id), 1)
+        # the cooldown is not looked up in the database
+        with self.assertNumQueries(0):
+            view = CreatePhoneTokenView(request=mock.Mock(user=token.user))
+            with self.assertRaises(SmsAttemptCooldownException):
+                view.enforce_sms_request_cooldown(
+                    30, self._extra_registration_params['phone_number']
+                )
+        with mock.patch.object(app_settings, 'SMS_TOKEN_MAX_USER_DAILY', 1):
+            with self.assertRaises(ValidationError):
+                PhoneToken(
+                    user=token.user,
+                    ip='127.0.0.1',
+                    phone_number=self._extra_registration_params['phone_number'],
+                )._validate_max_attempts()
+
     @capture_any_output()
     def test_phone_token_status_401(self):
         url = reverse('radius:phone_token_status', args=[self.default_org.slug])
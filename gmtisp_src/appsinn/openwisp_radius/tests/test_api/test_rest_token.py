@@ -2,11 +2,15 @@ from unittest import mock
 
 import swapper
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.timezone import localtime, now, timedelta
 from freezegun import freeze_time
 from rest_framework.authtoken.models import Token
 
+from openwisp_radius import activity
 from openwisp_radius.api import views as api_views
 from openwisp_utils.tests import capture_any_output
 
@@ -270,6 +274,32 @@ class TestApiUserToken(ApiTokenMixin, BaseTestCase):
         self.assertIsNotNone(admin.last_login)
         self.assertEqual(localtime(admin.last_login).isoformat(), _TEST_DATE)
 
+    @mock.patch.object(app_settings, 'USER_ACTIVITY_WRITE_BEHIND', True)
+    def test_user_auth_last_login_write_behind(self):
+        admin = self._get_admin()
+        login_payload = {'username': 'admin', 'password': 'tester'}
+        login_url = reverse('radius:user_auth_token', args=[self.default_org.slug])
+
+        with self.subTest('Local cache: last_login is saved right away'):
+            response = self.client.post(login_url, data=login_payload)
+            self.assertEqual(response.status_code, 200)
+            admin.refresh_from_db()
+            self.assertIsNotNone(admin.last_login)
+
+        with self.subTest('Shared cache: last_login is queued'):
+            User.objects.filter(pk=admin.pk).update(last_login=None)
+            cache.clear()
+            with mock.patch(
+                'openwisp_radius.activity.is_shared_cache', return_value=True
+            ):
+                response = self.client.post(login_url, data=login_payload)
+                self.assertEqual(response.status_code, 200)
+                admin.refresh_from_db()
+                self.assertIsNone(admin.last_login)
+                activity.flush()
+            admin.refresh_from_db()
+            self.assertIsNotNone(admin.last_login)
+
     def test_user_auth_token_inactive_user(self):
         url = self._get_url()
         organization_user = self._get_org_user()
@@ -394,6 +424,48 @@ class TestApiValidateToken(ApiTokenMixin, BaseTestCase):
         self.assertIsNotNone(admin.last_login)
         self.assertEqual(localtime(admin.last_login).isoformat(), _TEST_DATE)
 
+    @mock.patch(
+        'openwisp_radius.activity.is_shared_cache', mock.Mock(return_value=True)
+    )
+    @mock.patch.object(app_settings, 'USER_ACTIVITY_WRITE_BEHIND', True)
+    @mock.patch.object(app_settings, 'VALIDATE_AUTH_TOKEN_CACHE_TIMEOUT', 300)
+    def test_validate_auth_token_unchanged_state(self):
+        user = self._get_user_with_org()
+        token = Token.objects.create(user=user)
+        payload = dict(token=token.key)
+        response = self.client.post(self._get_url(), payload)
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        last_login = user.last_login
+
+        with self.subTest('Unchanged state is answered without writes'):
+            with CaptureQueriesContext(connection) as queries:
+                cached_response = self.client.post(self._get_url(), payload)
+            self.assertEqual(cached_response.status_code, 200)
+            self.assertEqual(cached_response.data, response.data)
+            for query in queries.captured_queries:
+                self.assertTrue(query['sql'].startswith('SELECT'), query['sql'])
+            user.refresh_from_db()
+            self.assertEqual(user.last_login, last_login)
+
+        with self.subTest('Used radius token is renewed'):
+            RadiusToken.objects.filter(user=user).update(can_auth=False)
+            renewed_response = self.client.post(self._get_url(), payload)
+            self.assertEqual(renewed_response.status_code, 200)
+            self.assertEqual(
+                renewed_response.data['radius_user_token'],
+                RadiusToken.objects.get(user=user).key,
+            )
+            self.assertNotEqual(
+                renewed_response.data['radius_user_token'],
+                response.data['radius_user_token'],
+            )
+
+        with self.subTest('Changed user details are returned'):
+            User.objects.filter(pk=user.pk).update(first_name='changed')
+            response = self.client.post(self._get_url(), payload)
+            self.assertEqual(response.data['first_name'], 'changed')
+
     @mock.patch('openwisp_users.settings.USER_PASSWORD_EXPIRATION', 30)
     def test_validate_auth_token_password_expired(self):
         user = self._get_org_user().user
@@ -1,5 +1,11 @@
+import gzip
 import os
+import socketserver
+import tempfile
+import threading
+import time
 from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
 
 from django.conf import settings
@@ -23,6 +29,45 @@ RadiusPostAuth = load_model('RadiusPostAuth')
 RegisteredUser = load_model('RegisteredUser')
 
 
+class FakeManagementInterface(socketserver.ThreadingTCPServer):
+    """
+    Local server which answers like the management interface of
+    OpenVPN, or closes the connection after ``delay`` seconds if
+    ``status`` is ``None``
+    """
+
+    daemon_threads = True
+
+    def __init__(self, status=None, delay=0):
+        self.status = status
+        self.delay = delay
+        self.connections = 0
+        super().__init__(('127.0.0.1', 0), FakeManagementHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def config(self):
+        return {'host': '127.0.0.1', 'port': self.server_address[1]}
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeManagementHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.connections += 1
+        time.sleep(self.server.delay)
+        if self.server.status is None:
+            return
+        self.wfile.write(
+            b">INFO:OpenVPN Management Interface Version 3 -- type 'help' "
+            b"for more info\r\n"
+        )
+        self.rfile.readline()
+        self.wfile.write(self.server.status.encode())
+
+
 class TestCommands(FileMixin, CallCommandMixin, BaseTestCase):
     @capture_any_output()
     def test_cleanup_stale_radacct_command(self):
@@ -104,6 +149,79 @@ class TestCommands(FileMixin, CallCommandMixin, BaseTestCase):
         call_command('delete_old_radacct', 3)
         self.assertEqual(RadiusAccounting.objects.filter(unique_id='666').count(), 0)
 
+    def test_export_radius_data_command(self):
+        options = _RADACCT.copy()
+        options['unique_id'] = '666'
+        self._create_radius_accounting(**options)
+        options['unique_id'] = '667'
+        options['start_time'] = '2017-06-12 10:50:00'
+        self._create_radius_accounting(**options)
+
+        with self.subTest('Test stdout'):
+            stdout = StringIO()
+            call_command(
+                'export_radius_data', 'accounting', start='2017-06-11', stdout=stdout
+            )
+            lines = stdout.getvalue().splitlines()
+            self.assertEqual(len(lines), 2)
+            self.assertIn('667', lines[1])
+
+        with self.subTest('Test gzip file'), tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'radacct.csv.gz')
+            call_command(
+                'export_radius_data',
+                'accounting',
+                output=path,
+                gzip=True,
+                organization=['test-org'],
+                stdout=StringIO(),
+            )
+            with gzip.open(path, 'rt') as f:
+                self.assertEqual(len(f.read().splitlines()), 3)
+
+        with self.subTest('Test errors'):
+            with self.assertRaises(CommandError):
+                call_command('export_radius_data', 'accounting', gzip=True)
+            with self.assertRaises(CommandError):
+                call_command('export_radius_data', 'accounting', organization=['x'])
+            with self.assertRaises(CommandError):
+                call_command('export_radius_data', 'accounting', end='tomorrow')
+
+    def test_benchmark_freeradius_command(self):
+        from .. import loadtest
+
+        fixtures = loadtest.create_fixtures(users=4, organizations=2, nas=2)
+        self.assertEqual(len({user.organization_id for user in fixtures}), 2)
+        sessions = loadtest.generate_sessions(
+            fixtures, sessions=6, interim=1, reject_ratio=0.5, seed=1
+        )
+        results, _ = loadtest.run(sessions, loadtest.ClientSender, concurrency=1)
+        summary = loadtest.summarize(results)
+        self.assertEqual(summary['total']['requests'], len(results))
+        for kind, stats in summary.items():
+            self.assertEqual(stats['errors'], 0, kind)
+            self.assertGreater(stats['queries'], 0, kind)
+        self.assertEqual(
+            RadiusAccounting.objects.filter(
+                username__startswith='loadtest-', stop_time__isnull=False
+            ).count(),
+            summary['accounting-stop']['requests'],
+        )
+
+        with self.subTest('Command'):
+            stdout = StringIO()
+            call_command(
+                'benchmark_freeradius',
+                in_process=True,
+                users=4,
+                sessions=2,
+                concurrency=1,
+                cleanup=True,
+                stdout=stdout,
+            )
+            self.assertIn('authorize', stdout.getvalue())
+            self.assertFalse(User.objects.filter(username__startswith='loadtest-'))
+
     @capture_stdout()
     def test_batch_add_users_command(self):
         self.assertEqual(RadiusBatch.objects.all().count(), 0)
@@ -484,6 +602,73 @@ class TestCommands(FileMixin, CallCommandMixin, BaseTestCase):
                 radius_acc.called_station_id, rad_options['called_station_id']
             )
 
+    @capture_any_output()
+    @patch.object(app_settings, 'OPENVPN_DATETIME_FORMAT', u'%Y-%m-%d %H:%M:%S')
+    @patch('openwisp_radius.tasks.convert_called_station_id')
+    def test_convert_called_station_id_fake_management_interface(self, *args):
+        options = _RADACCT.copy()
+        options['calling_station_id'] = str(EUI('bb:bb:bb:bb:bb:0b', dialect=mac_unix))
+        options['called_station_id'] = 'AA-AA-AA-AA-AA-0A'
+        options['unique_id'] = '117'
+        options['organization'] = self._get_org()
+        radius_acc = self._create_radius_accounting(**options)
+        options['unique_id'] = '118'
+        radius_acc2 = self._create_radius_accounting(**options)
+
+        server = FakeManagementInterface(self._get_openvpn_status())
+        # unreachable servers, each of them blocks the connection for a second
+        dead_servers = [FakeManagementInterface(delay=1) for _ in range(2)]
+        for fake_server in [server, *dead_servers]:
+            self.addCleanup(fake_server.close)
+        called_station_ids = {
+            'test-org': {
+                'openvpn_config': [
+                    dead_servers[0].config,
+                    server.config,
+                    dead_servers[1].config,
+                ],
+                'unconverted_ids': ['AA-AA-AA-AA-AA-0A'],
+            }
+        }
+        with patch.object(
+            app_settings, 'CALLED_STATION_IDS', called_station_ids
+        ), patch.object(app_settings, 'OPENVPN_STATUS_CACHE_TIMEOUT', 30):
+            with self.subTest('Management interfaces are polled concurrently'):
+                started = time.monotonic()
+                call_command('convert_called_station_id')
+                self.assertLess(time.monotonic() - started, 2)
+                radius_acc.refresh_from_db()
+                radius_acc2.refresh_from_db()
+                self.assertEqual(radius_acc.called_station_id, 'CC-CC-CC-CC-CC-0C')
+                self.assertEqual(radius_acc2.called_station_id, 'CC-CC-CC-CC-CC-0C')
+
+            with self.subTest('Status of the management interface is cached'):
+                options['unique_id'] = '119'
+                radius_acc = self._create_radius_accounting(**options)
+                call_command(
+                    'convert_called_station_id', unique_id=radius_acc.unique_id
+                )
+                radius_acc.refresh_from_db()
+                self.assertEqual(radius_acc.called_station_id, 'CC-CC-CC-CC-CC-0C')
+                self.assertEqual(server.connections, 1)
+
+            with self.subTest('Session missing from the cached status'):
+                options['unique_id'] = '120'
+                options['calling_station_id'] = str(
+                    EUI('bb:bb:bb:bb:bb:0d', dialect=mac_unix)
+                )
+                radius_acc = self._create_radius_accounting(**options)
+                # the client connected after the status was cached
+                server.status = self._get_openvpn_status().replace(
+                    'bb:bb:bb:bb:bb:0b', 'bb:bb:bb:bb:bb:0d'
+                )
+                call_command(
+                    'convert_called_station_id', unique_id=radius_acc.unique_id
+                )
+                radius_acc.refresh_from_db()
+                self.assertEqual(radius_acc.called_station_id, 'CC-CC-CC-CC-CC-0C')
+                self.assertEqual(server.connections, 2)
+
     @capture_any_output()
     @patch.object(
         app_settings,
@@ -875,6 +875,9 @@ class TestPrivateCsvFile(FileMixin, TestMultitenantAdminMixin, BaseTestCase):
 
 
 class TestChangeOfAuthorization(BaseTransactionTestCase):
+    # the open sessions are looked up in the databases of the organizations
+    databases = {'default', 'db_tenant'}
+
     def _change_radius_user_group(self, user, organization):
         rad_user_group = user.radiususergroup_set.first()
         power_user_group = RadiusGroup.objects.get(
@@ -7,6 +7,7 @@ from celery.contrib.testing.worker import start_worker
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core import mail, management
+from django.core.cache import cache
 from django.test.utils import override_settings
 from django.utils.timezone import now
 
@@ -336,3 +337,76 @@ class TestTasks(FileMixin, BaseTestCase):
         tasks.delete_inactive_users.delay()
         self.assertEqual(User.objects.filter(id__in=[admin.id, user1.id]).count(), 2)
         self.assertEqual(User.objects.filter(id__in=[user2.id, user3.id]).count(), 0)
+
+    @mock.patch(
+        'openwisp_radius.activity.is_shared_cache', mock.Mock(return_value=True)
+    )
+    @mock.patch.object(app_settings, 'USER_ACTIVITY_WRITE_BEHIND', True)
+    def test_flush_user_activity(self):
+        from ..activity import touch
+
+        user = self._create_user()
+        last_seen = now() - timedelta(minutes=5)
+        touch(user.pk, last_seen)
+        # coalesced with the previous activity
+        touch(user.pk, now())
+        user.refresh_from_db()
+        self.assertIsNone(user.last_login)
+        self.assertEqual(tasks.flush_user_activity.delay().get(), 1)
+        user.refresh_from_db()
+        self.assertEqual(user.last_login, last_seen)
+        self.assertEqual(tasks.flush_user_activity.delay().get(), 0)
+
+        with self.subTest('More recent last_login is not overwritten'):
+            cache.clear()
+            touch(user.pk, last_seen - timedelta(days=1))
+            tasks.flush_user_activity.delay()
+            user.refresh_from_db()
+            self.assertEqual(user.last_login, last_seen)
+
+        with self.subTest('Changes of language are coalesced'):
+            touch(user.pk, last_seen, language='it')
+            touch(user.pk, last_seen + timedelta(seconds=2), language='en')
+            touch(user.pk, last_seen + timedelta(seconds=1), language='ru')
+            self.assertEqual(tasks.flush_user_activity.delay().get(), 1)
+            user.refresh_from_db()
+            self.assertEqual(user.language, 'en')
+            self.assertEqual(user.last_login, last_seen + timedelta(seconds=2))
+
+    @mock.patch(
+        'openwisp_radius.activity.is_shared_cache', mock.Mock(return_value=True)
+    )
+    @mock.patch.object(app_settings, 'USER_ACTIVITY_WRITE_BEHIND', True)
+    @mock.patch.object(app_settings, 'DELETE_INACTIVE_USERS', 30)
+    def test_delete_inactive_users_flushes_activity(self):
+        from ..activity import touch
+
+        inactive_date = now() - timedelta(days=60)
+        user = self._create_org_user().user
+        User.objects.filter(id=user.id).update(last_login=inactive_date)
+        # the user was active, but the activity is still queued
+        touch(user.pk)
+        tasks.delete_inactive_users.delay()
+        self.assertTrue(User.objects.filter(id=user.id).exists())
+
+    @mock.patch.object(app_settings, 'USER_ACTIVITY_WRITE_BEHIND', True)
+    @mock.patch.object(app_settings, 'DELETE_INACTIVE_USERS', 30)
+    def test_user_activity_local_cache(self):
+        from ..activity import activity_events, touch
+
+        inactive_date = now() - timedelta(days=60)
+        user = self._create_org_user().user
+        User.objects.filter(id=user.id).update(last_login=inactive_date)
+        # the cache of the tests is local to the process: the celery
+        # workers could not flush a queue stored in the web process
+        touch(user.pk)
+        self.assertEqual(activity_events.pending(), 0)
+        user.refresh_from_db()
+        self.assertGreater(user.last_login, inactive_date)
+        # the writes are throttled as well
+        with self.assertNumQueries(0):
+            touch(user.pk)
+        # the worker does not see the cache of the web process
+        cache.clear()
+        tasks.delete_inactive_users.delay()
+        self.assertTrue(User.objects.filter(id=user.id).exists())
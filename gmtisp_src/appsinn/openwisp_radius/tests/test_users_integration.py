@@ -89,7 +89,8 @@ class TestUsersIntegration(GetEditFormInlineMixin, TestBasicUsersIntegration):
         RegisteredUser.objects.create(
             user=user, method='mobile_phone', is_verified=False
         )
-        with self.assertNumQueries(1):
+        # the users and, on a cold cache, their memberships (once per chunk)
+        with self.assertNumQueries(2):
             call_command('export_users', filename=temp_file.name)
 
         with open(temp_file.name, 'r') as file:
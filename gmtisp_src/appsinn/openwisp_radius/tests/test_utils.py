@@ -1,11 +1,25 @@
+import ipaddress
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.test import override_settings
 
-from ..utils import find_available_username, get_one_time_login_url, validate_csvfile
+from ..nas_registry import NasEntry, NasIndex, get_nas
+from ..rate_limits import ConcurrencyLimit, SlidingWindowCounter
+from ..utils import (
+    find_available_username,
+    get_one_time_login_url,
+    load_model,
+    validate_csvfile,
+)
 from . import FileMixin
 from .mixins import BaseTestCase
 
+Nas = load_model('Nas')
+
 
 class TestUtils(FileMixin, BaseTestCase):
     def test_find_available_username(self):
@@ -38,3 +52,96 @@ class TestUtils(FileMixin, BaseTestCase):
     def test_get_one_time_login_url(self):
         login_url = get_one_time_login_url(None, None)
         self.assertEqual(login_url, None)
+
+    def test_sliding_window_counter(self):
+        counter = SlidingWindowCounter('test', window=3600, buckets=4)
+        # aligned to the 15 minutes buckets of the counter
+        start = datetime(2026, 1, 1, 12, tzinfo=dt_timezone.utc)
+        counter.incr('key', when=start - timedelta(hours=2))
+        counter.incr('key', when=start - timedelta(minutes=30))
+        counter.incr('key', when=start)
+        self.assertEqual(counter.count('key', when=start), 2)
+        self.assertEqual(counter.count('other', when=start), 0)
+        self.assertEqual(counter.count('key', when=start + timedelta(minutes=45)), 1)
+
+    def test_concurrency_limit(self):
+        limit = ConcurrencyLimit('test')
+        first = limit.acquire('backend', 2)
+        self.assertIsNotNone(limit.acquire('backend', 2))
+        self.assertIsNone(limit.acquire('backend', 2))
+        limit.release(first)
+        self.assertEqual(limit.acquire('backend', 2), first)
+
+    @mock.patch(
+        'openwisp_radius.nas_registry.is_shared_cache', mock.Mock(return_value=True)
+    )
+    def test_nas_registry(self):
+        org = self._get_org()
+        options = {'short_name': 'test', 'type': 'Virtual', 'secret': 'testing'}
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_nas(name='10.0.0.0/8', **options)
+            nas = self._create_nas(name='10.8.0.0/16', **{**options, 'secret': 'vpn'})
+            self._create_nas(name='invalid', **options)
+        self.assertEqual(get_nas('10.8.0.10', org.pk).secret, 'vpn')
+        self.assertEqual(get_nas('10.9.0.10', org.pk).secret, 'testing')
+        self.assertIsNone(get_nas('192.168.0.1', org.pk))
+        self.assertIsNone(get_nas('10.8.0.10', self._create_org(name='org2').pk))
+        with self.assertNumQueries(0):
+            get_nas('10.8.0.10')
+
+        with self.subTest('Invalidated on commit of save and delete'):
+            nas.name = '10.8.1.0/24'
+            with self.captureOnCommitCallbacks(execute=True):
+                nas.save()
+                # not committed yet
+                self.assertEqual(get_nas('10.8.0.10').secret, 'vpn')
+            self.assertEqual(get_nas('10.8.0.10').secret, 'testing')
+            self.assertEqual(get_nas('10.8.1.10').secret, 'vpn')
+            with self.captureOnCommitCallbacks(execute=True):
+                nas.delete()
+            self.assertEqual(get_nas('10.8.1.10').secret, 'testing')
+
+    def test_nas_registry_local_cache(self):
+        org = self._get_org()
+        options = {'short_name': 'test', 'type': 'Virtual', 'secret': 'testing'}
+        nas = self._create_nas(name='10.8.0.0/16', **options)
+        # the generation in a local cache would not be
+        # changed by the NAS saved in other processes
+        with self.assertNumQueries(1):
+            self.assertEqual(get_nas('10.8.0.10', org.pk).secret, 'testing')
+        Nas.objects.filter(pk=nas.pk).update(secret='changed')
+        self.assertEqual(get_nas('10.8.0.10', org.pk).secret, 'changed')
+
+    def test_nas_index_lookup_time(self):
+        def _build_index(size):
+            return NasIndex(
+                NasEntry(n, None, str(n), network)
+                for n, network in enumerate(
+                    ipaddress.ip_network('10.0.0.0/8').subnets(new_prefix=24)
+                )
+                if n < size
+            )
+
+        class _CountingDict(dict):
+            probes = 0
+
+            def get(self, *args):
+                _CountingDict.probes += 1
+                return super().get(*args)
+
+        def _count_probes(index):
+            for version, tables in index._lookup_order.items():
+                index._lookup_order[version] = [
+                    (netmask, _CountingDict(networks)) for netmask, networks in tables
+                ]
+            _CountingDict.probes = 0
+            for n in range(5000):
+                index.lookup(f'10.0.{n % 200}.1')
+            return _CountingDict.probes
+
+        small, large = _build_index(10), _build_index(10000)
+        self.assertEqual(large.lookup('10.0.150.1').secret, '150')
+        self.assertIsNone(small.lookup('10.0.150.1'))
+        # one probe per prefix length, regardless of the number of NAS
+        self.assertEqual(_count_probes(large), 5000)
+        self.assertEqual(_count_probes(small), 5000)
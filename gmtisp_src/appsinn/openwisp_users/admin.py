@@ -33,6 +33,7 @@ from swapper import load_model
 from openwisp_utils.admin import UUIDAdmin
 
 from . import settings as app_settings
+from .membership import get_organizations_dicts
 from .multitenancy import MultitenantAdminMixin, MultitenantOrgFilter
 from .utils import BaseAdmin
 
@@ -587,8 +588,13 @@ class OrganizationUserAdmin(
     def delete_selected_overridden(self, request, queryset):
         count = 0
         pks = []
-        for obj in queryset:
-            if obj.user.is_owner(obj.organization_id):
+        org_users = list(queryset.only('pk', 'user_id', 'organization_id'))
+        organizations_dicts = get_organizations_dicts(
+            {org_user.user_id for org_user in org_users}
+        )
+        for obj in org_users:
+            org_dict = organizations_dicts[obj.user_id].get(str(obj.organization_id))
+            if org_dict and org_dict['is_owner']:
                 pks.append(obj.pk)
                 count += 1
         # if trying to delete only org users which belong to owners, stop here
@@ -7,6 +7,7 @@ from rest_framework.authentication import SessionAuthentication
 from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
 
+from ..tenancy import get_tenancy_context
 from .authentication import BearerAuthentication
 from .permissions import DjangoModelPermissions, IsOrganizationManager
 
@@ -27,7 +28,7 @@ class SharedObjectsLookup:
     @property
     def queryset_organization_conditions(self):
         conditions = super().queryset_organization_conditions
-        organizations = getattr(self.request.user, self._user_attr)
+        organizations = get_tenancy_context(self.request).get(self._user_attr)
         # If user has access to any organization, then include shared
         # objects in the queryset.
         if len(organizations):
@@ -50,7 +51,11 @@ class FilterByOrganization(OrgLookup):
     @property
     def queryset_organization_conditions(self):
         return Q(
-            **{self.organization_lookup: getattr(self.request.user, self._user_attr)}
+            **{
+                self.organization_lookup: get_tenancy_context(self.request).get(
+                    self._user_attr
+                )
+            }
         )
 
     def get_queryset(self):
@@ -115,7 +120,11 @@ class FilterByParent(OrgLookup):
             raise NotFound()
 
     def get_organization_queryset(self, qs):
-        lookup = {self.organization_lookup: getattr(self.request.user, self._user_attr)}
+        lookup = {
+            self.organization_lookup: get_tenancy_context(self.request).get(
+                self._user_attr
+            )
+        }
         return qs.filter(**lookup)
 
     def get_parent_queryset(self):
@@ -158,12 +167,13 @@ class FilterSerializerByOrganization(OrgLookup):
         raise NotImplementedError()
 
     def filter_fields(self):
-        user = self.context['request'].user
+        request = self.context['request']
+        user = request.user
         # superuser can see everything
         if user.is_superuser or user.is_anonymous:
             return
         # non superusers can see only items of organizations they're related to
-        organization_filter = getattr(user, self._user_attr)
+        organization_filter = get_tenancy_context(request).get(self._user_attr)
         for field in self.fields:
             if field == 'organization' and not self.fields[field].read_only:
                 # queryset attribute will not be present if set to read_only
@@ -223,7 +233,7 @@ class QuerySetRequestMixin(BaseQuerySetRequestMixin):
             return queryset
         # non superusers can see only items
         # of organizations they're related to
-        organization_filter = getattr(user, self._user_attr)
+        organization_filter = get_tenancy_context(request).get(self._user_attr)
         # if field_name organization then just organization_filter
         if self._filter_field == 'organization':
             return queryset.filter(pk__in=organization_filter)
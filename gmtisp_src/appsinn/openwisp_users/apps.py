@@ -13,6 +13,7 @@ from openwisp_utils import settings as utils_settings
 from openwisp_utils.admin_theme.menu import register_menu_group
 
 from . import settings as app_settings
+from .membership import invalidate_organization
 
 logger = logging.getLogger(__name__)
 
@@ -148,10 +149,11 @@ class OpenwispUsersConfig(AppConfig):
             old_instance = Organization.objects.only('is_active').get(pk=instance.pk)
         except Organization.DoesNotExist:
             return
-        from .tasks import invalidate_org_membership_cache
-
         if instance.is_active != old_instance.is_active:
-            invalidate_org_membership_cache.delay(instance.pk)
+            # the second invalidation discards the entries
+            # recomputed before the change was committed
+            invalidate_organization(instance.pk)
+            transaction.on_commit(lambda: invalidate_organization(instance.pk))
 
     @classmethod
     def pre_save_update_organizations_dict(cls, instance, **kwargs):
@@ -191,9 +193,9 @@ class OpenwispUsersConfig(AppConfig):
             user = instance.user
         else:
             user = instance.organization_user.user
+        # the memberships are recomputed lazily when they are needed,
+        # this keeps bulk imports of organization users cheap
         cls._invalidate_user_cache(user)
-        # forces caching
-        user.organizations_dict
 
     @classmethod
     def create_organization_owner(cls, instance, created, **kwargs):
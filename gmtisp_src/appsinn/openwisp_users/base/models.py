@@ -5,7 +5,6 @@ from allauth.account.models import EmailAddress
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser as BaseUser
 from django.contrib.auth.models import UserManager as BaseUserManager
-from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
@@ -15,6 +14,7 @@ from phonenumber_field.modelfields import PhoneNumberField
 from swapper import load_model
 
 from .. import settings as app_settings
+from ..membership import get_organizations_dict, invalidate_user
 
 logger = logging.getLogger(__name__)
 
@@ -132,27 +132,7 @@ class AbstractUser(BaseUser):
         Returns a dictionary which represents the organizations which
         the user is member of, or which the user manages or owns.
         """
-        cache_key = 'user_{}_organizations'.format(self.pk)
-        organizations = cache.get(cache_key)
-        if organizations is not None:
-            return organizations
-
-        manager = load_model('openwisp_users', 'OrganizationUser').objects
-        org_users = manager.filter(
-            user=self, organization__is_active=True
-        ).select_related('organization', 'organizationowner')
-
-        organizations = {}
-        for org_user in org_users:
-            org = org_user.organization
-            org_id = str(org.pk)
-            organizations[org_id] = {
-                'is_admin': org_user.is_admin,
-                'is_owner': hasattr(org_user, 'organizationowner'),
-            }
-
-        cache.set(cache_key, organizations, 86400 * 2)  # Cache for two days
-        return organizations
+        return get_organizations_dict(self.pk)
 
     def __get_orgs(self, attribute):
         org_list = []
@@ -188,7 +168,7 @@ class AbstractUser(BaseUser):
         """
         Invalidate the organizations cache of the user
         """
-        cache.delete(f'user_{self.pk}_organizations')
+        invalidate_user(self.pk)
         try:
             del self.organizations_managed
         except AttributeError:
@@ -5,12 +5,14 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.core.management.base import BaseCommand
 
 from ... import settings as app_settings
+from ...membership import get_organizations_dicts
 
 User = get_user_model()
 
 
 class Command(BaseCommand):
     help = 'Exports user data to a CSV file'
+    chunk_size = 1000
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -48,8 +50,26 @@ class Command(BaseCommand):
         # Write header row
         csv_writer.writerow(fields)
 
-        # Write data rows
-        for user in queryset.iterator():
+        # Write data rows, the organizations of the users are
+        # fetched from the cache one chunk of users at a time
+        chunk = []
+        for user in queryset.iterator(chunk_size=self.chunk_size):
+            chunk.append(user)
+            if len(chunk) >= self.chunk_size:
+                self._write_rows(csv_writer, fields, chunk)
+                chunk = []
+        self._write_rows(csv_writer, fields, chunk)
+
+        # Close the CSV file
+        csv_file.close()
+        self.stdout.write(
+            self.style.SUCCESS(f'User data exported successfully to {filename}!')
+        )
+
+    def _write_rows(self, csv_writer, fields, users):
+        if 'organizations' in fields:
+            organizations_dicts = get_organizations_dicts([user.pk for user in users])
+        for user in users:
             data_row = []
             for field in fields:
                 # Extract the value from related models
@@ -65,15 +85,9 @@ class Command(BaseCommand):
                         data_row.append(related_value)
                 elif field == 'organizations':
                     organizations = []
-                    for org_id, user_perm in user.organizations_dict.items():
+                    for org_id, user_perm in organizations_dicts[user.pk].items():
                         organizations.append(f'({org_id},{user_perm["is_admin"]})')
                     data_row.append('\n'.join(organizations))
                 else:
                     data_row.append(getattr(user, field))
             csv_writer.writerow(data_row)
-
-        # Close the CSV file
-        csv_file.close()
-        self.stdout.write(
-            self.style.SUCCESS(f'User data exported successfully to {filename}!')
-        )
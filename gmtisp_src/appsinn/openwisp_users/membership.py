@@ -0,0 +1,138 @@
+"""
+Cache of the organization memberships of the users.
+
+The memberships of each user are cached under one key together with
+the generation of each organization the user belongs to. Every
+organization has a generation token which is replaced when the
+organization is disabled or enabled again: this invalidates the
+cached memberships of all its users in O(1), the stale entries are
+recomputed lazily the next time they are read.
+
+Changes of the memberships of a single user (``OrganizationUser`` and
+``OrganizationOwner`` changes) just delete the key of that user.
+"""
+import uuid
+
+from django.core.cache import cache
+from swapper import load_model
+
+# cache entries of the users expire after two days
+USER_TIMEOUT = 86400 * 2
+
+
+def _user_key(user_pk):
+    return f'user_{user_pk}_memberships'
+
+
+def _generation_key(organization_pk):
+    return f'organization_{organization_pk}_generation'
+
+
+def _new_generation():
+    # random tokens can't be confused with the value of a generation
+    # which was evicted from the cache, unlike a counter starting from 1
+    return uuid.uuid4().hex
+
+
+def invalidate_organization(organization_pk):
+    """
+    Invalidates the cached memberships of all the users of the organization
+    """
+    cache.set(_generation_key(organization_pk), _new_generation(), None)
+
+
+def invalidate_user(user_pk):
+    cache.delete(_user_key(user_pk))
+
+
+def _get_generations(organization_pks):
+    keys = {_generation_key(pk): pk for pk in organization_pks}
+    generations = {
+        keys[key]: value for key, value in cache.get_many(list(keys)).items()
+    }
+    for key, pk in keys.items():
+        if pk in generations:
+            continue
+        value = _new_generation()
+        # add() keeps the value set concurrently by another process
+        if not cache.add(key, value, None):
+            value = cache.get(key, value)
+        generations[pk] = value
+    return generations
+
+
+def _compute(user_pks):
+    OrganizationUser = load_model('openwisp_users', 'OrganizationUser')
+    entries = {pk: {'generations': {}, 'organizations': {}} for pk in user_pks}
+    # user_pks may contain strings as well as UUIDs
+    lookup = {str(pk): pk for pk in user_pks}
+    org_users = OrganizationUser.objects.filter(user_id__in=user_pks).select_related(
+        'organization', 'organizationowner'
+    )
+    for org_user in org_users:
+        entry = entries[lookup[str(org_user.user_id)]]
+        org_id = str(org_user.organization_id)
+        # memberships of disabled organizations are stored too, so that
+        # enabling the organization again invalidates the entry
+        entry['generations'][org_id] = None
+        if not org_user.organization.is_active:
+            continue
+        entry['organizations'][org_id] = {
+            'is_admin': org_user.is_admin,
+            'is_owner': hasattr(org_user, 'organizationowner'),
+        }
+    return entries
+
+
+def get_organizations_dicts(user_pks):
+    """
+    Returns the organizations dict of each user:
+    ``{user_pk: {org_pk: {'is_admin': bool, 'is_owner': bool}}}``
+
+    The entries are read with one ``get_many`` call and the missing
+    or stale ones are recomputed with a single query.
+    """
+    user_pks = list(user_pks)
+    keys = {_user_key(pk): pk for pk in user_pks}
+    cached = cache.get_many(list(keys))
+    entries = {keys[key]: value for key, value in cached.items()}
+    generations = _get_generations(
+        {org_pk for entry in entries.values() for org_pk in entry['generations']}
+    )
+    stale = [
+        pk
+        for pk in user_pks
+        if pk not in entries
+        or any(
+            generations[org_pk] != value
+            for org_pk, value in entries[pk]['generations'].items()
+        )
+    ]
+    if stale:
+        # the generations of the organizations which were not known yet
+        # are read after the query: the organization is invalidated again
+        # when the transaction which changed it is committed, which covers
+        # the entries computed while the change was in progress
+        computed = _compute(stale)
+        generations.update(
+            _get_generations(
+                {
+                    org_pk
+                    for entry in computed.values()
+                    for org_pk in entry['generations']
+                    if org_pk not in generations
+                }
+            )
+        )
+        for entry in computed.values():
+            for org_pk in entry['generations']:
+                entry['generations'][org_pk] = generations[org_pk]
+        cache.set_many(
+            {_user_key(pk): entry for pk, entry in computed.items()}, USER_TIMEOUT
+        )
+        entries.update(computed)
+    return {pk: entries[pk]['organizations'] for pk in user_pks}
+
+
+def get_organizations_dict(user_pk):
+    return get_organizations_dicts([user_pk])[user_pk]
@@ -5,6 +5,7 @@ from swapper import load_model
 
 from openwisp_utils.admin_theme.filters import AutocompleteFilter
 
+from .tenancy import get_tenancy_context
 from .widgets import SHARED_SYSTEMWIDE_LABEL, OrganizationAutocompleteSelect
 
 User = get_user_model()
@@ -48,15 +49,16 @@ class MultitenantAdminMixin(object):
             return self.multitenant_behaviour_for_user_admin(request)
         if user.is_superuser:
             return qs
+        organizations_managed = get_tenancy_context(request).organizations_managed
         if hasattr(self.model, 'organization'):
-            return qs.filter(organization__in=user.organizations_managed)
+            return qs.filter(organization__in=organizations_managed)
         if self.model.__name__ == 'Organization':
-            return qs.filter(pk__in=user.organizations_managed)
+            return qs.filter(pk__in=organizations_managed)
         elif not self.multitenant_parent:
             return qs
         else:
             qsarg = '{0}__organization__in'.format(self.multitenant_parent)
-            return qs.filter(**{qsarg: user.organizations_managed})
+            return qs.filter(**{qsarg: organizations_managed})
 
     def _edit_form(self, request, form):
         """
@@ -74,7 +76,7 @@ class MultitenantAdminMixin(object):
         if user.is_superuser and org_field and not org_field.required:
             org_field.empty_label = SHARED_SYSTEMWIDE_LABEL
         elif not user.is_superuser:
-            orgs_pk = user.organizations_managed
+            orgs_pk = get_tenancy_context(request).organizations_managed
             # organizations relation;
             # may be readonly and not present in field list
             if org_field:
@@ -119,10 +121,9 @@ class MultitenantAdminMixin(object):
         # See https://github.com/openwisp/openwisp-users/issues/324.
         # We cannot use .distinct() on the User query directly, because
         # it causes issues when performing delete action from the admin.
+        organizations_managed = get_tenancy_context(request).organizations_managed
         user_ids = (
-            OrganizationUser.objects.filter(
-                organization_id__in=user.organizations_managed
-            )
+            OrganizationUser.objects.filter(organization_id__in=organizations_managed)
             .values_list('user_id')
             .distinct()
         )
@@ -11,14 +11,13 @@ from django.urls import reverse
 from django.utils import translation
 from django.utils.timezone import now, timedelta
 from django.utils.translation import gettext_lazy as _
-from swapper import load_model
 
 from openwisp_utils.admin_theme.email import send_email
 
 from . import settings as app_settings
+from .membership import invalidate_organization
 
 User = get_user_model()
-OrganizationUser = load_model('openwisp_users', 'OrganizationUser')
 
 
 @shared_task
@@ -95,8 +94,4 @@ def invalidate_org_membership_cache(organization_pk):
     organization when organization.is_active changes
     (organization is disabled or enabled again).
     """
-    qs = OrganizationUser.objects.filter(
-        organization_id=organization_pk
-    ).select_related('user')
-    for org_user in qs.iterator():
-        org_user.user._invalidate_user_organizations_dict()
+    invalidate_organization(organization_pk)
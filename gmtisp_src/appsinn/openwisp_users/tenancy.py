@@ -0,0 +1,110 @@
+"""
+Request scoped tenancy context.
+
+The organizations which the user of a request is member of, manages or
+owns are resolved once per request and shared by the multitenant admin
+mixins, the API mixins and filters, instead of being looked up again
+by each of them.
+"""
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class TenancyContext(object):
+    """
+    Memoizes the organizations of the user of a request.
+
+    The user is read from the request each time, because API views
+    replace it after authenticating the request: the memoized values
+    are discarded when the user changes.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.queries = 0
+        self._user_pk = None
+        self._values = {}
+
+    @property
+    def user(self):
+        return self.request.user
+
+    def _count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def get(self, attr):
+        """
+        Returns the list of the primary keys of the organizations of the
+        user, ``attr`` is the name of the attribute of the user which lists
+        them: ``organizations_dict``, ``organizations_managed``
+        or ``organizations_owned``
+        """
+        user = self.user
+        if user.pk != self._user_pk:
+            self._user_pk = user.pk
+            self._values = {}
+        if attr not in self._values:
+            if user.is_anonymous:
+                value = []
+            else:
+                with connection.execute_wrapper(self._count_query):
+                    value = list(getattr(user, attr))
+            self._values[attr] = value
+        return self._values[attr]
+
+    @property
+    def organizations_member(self):
+        return self.get('organizations_dict')
+
+    @property
+    def organizations_managed(self):
+        return self.get('organizations_managed')
+
+    @property
+    def organizations_owned(self):
+        return self.get('organizations_owned')
+
+
+def get_tenancy_context(request):
+    """
+    Returns the tenancy context of ``request``, creating it
+    if ``TenancyContextMiddleware`` is not enabled.
+
+    Accepts both django and django-rest-framework requests,
+    the latter share the context of the wrapped django request.
+    """
+    request = getattr(request, '_request', request)
+    try:
+        return request.tenancy
+    except AttributeError:
+        request.tenancy = TenancyContext(request)
+        return request.tenancy
+
+
+class TenancyContextMiddleware(object):
+    """
+    Attaches the tenancy context to the request and reports
+    how many queries were needed to resolve it, in the
+    ``X-Tenancy-Queries`` header if ``DEBUG`` is enabled.
+    """
+
+    header = 'X-Tenancy-Queries'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        context = get_tenancy_context(request)
+        response = self.get_response(request)
+        logger.debug(
+            f'{request.method} {request.path}: '
+            f'{context.queries} tenancy queries'
+        )
+        if settings.DEBUG:
+            response[self.header] = str(context.queries)
+        return response
@@ -1,11 +1,14 @@
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, modify_settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, modify_settings, override_settings
 from django.urls import reverse
 from django.utils.timezone import now, timedelta
 
 from .. import settings as app_settings
+from ..tenancy import TenancyContextMiddleware, get_tenancy_context
 from .utils import TestOrganizationMixin
 
 User = get_user_model()
@@ -47,3 +50,42 @@ class TestPasswordExpirationMiddleware(TestOrganizationMixin, TestCase):
             self.assertEqual(response.url, '/accounts/password/change/?next=/admin/')
         with self.assertNumQueries(1):
             self.client.force_login(admin)
+
+
+class TestTenancyContextMiddleware(TestOrganizationMixin, TestCase):
+    def test_context_memoized(self):
+        org = self._get_org()
+        operator = self._create_operator(organizations=[org])
+        cache.clear()
+        request = RequestFactory().get('/')
+        request.user = operator
+        context = get_tenancy_context(request)
+        with self.assertNumQueries(1):
+            self.assertEqual(context.organizations_managed, [str(org.pk)])
+            self.assertEqual(context.organizations_member, [str(org.pk)])
+            self.assertEqual(context.organizations_managed, [str(org.pk)])
+        self.assertEqual(context.queries, 1)
+        self.assertIs(get_tenancy_context(request), context)
+
+        with self.subTest('user changed'):
+            request.user = AnonymousUser()
+            with self.assertNumQueries(0):
+                self.assertEqual(context.organizations_managed, [])
+
+    @override_settings(DEBUG=True)
+    def test_debug_header(self):
+        org = self._get_org()
+        operator = self._create_operator_with_user_permissions(organizations=[org])
+        self.client.force_login(operator)
+        response = self.client.get(
+            reverse(f'admin:{User._meta.app_label}_user_changelist')
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(TenancyContextMiddleware.header, response.headers)
+
+        with self.subTest('header not added if DEBUG is disabled'):
+            with override_settings(DEBUG=False):
+                response = self.client.get(
+                    reverse(f'admin:{User._meta.app_label}_user_changelist')
+                )
+            self.assertNotIn(TenancyContextMiddleware.header, response.headers)
@@ -11,6 +11,7 @@ from django.utils.timezone import now, timedelta
 from swapper import load_model
 
 from .. import settings as app_settings
+from ..membership import get_organizations_dicts
 from ..tasks import password_expiration_email
 from .utils import TestOrganizationMixin
 
@@ -86,10 +87,52 @@ class TestUsers(TestOrganizationMixin, TestCase):
 
         OrganizationUser.objects.create(user=user, organization=org1)
 
-        # cache is automatically updated
+        # cache is invalidated and recomputed lazily
+        with self.assertNumQueries(1):
+            self.assertEqual(list(user.organizations_dict), [str(org1.pk)])
+
         with self.assertNumQueries(0):
             list(user.organizations_dict)
 
+    def test_organizations_dicts_bulk(self):
+        org = self._create_org(name='org1')
+        user1 = self._create_user(username='user1', email='user1@test.org')
+        user2 = self._create_user(username='user2', email='user2@test.org')
+        user3 = self._create_user(username='user3', email='user3@test.org')
+        self._create_org_user(user=user1, organization=org, is_admin=True)
+        self._create_org_user(user=user2, organization=org)
+        pks = [user1.pk, user2.pk, user3.pk]
+        expected = {
+            user1.pk: {str(org.pk): {'is_admin': True, 'is_owner': True}},
+            user2.pk: {str(org.pk): {'is_admin': False, 'is_owner': False}},
+            user3.pk: {},
+        }
+        with self.assertNumQueries(1):
+            self.assertEqual(get_organizations_dicts(pks), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_organizations_dicts(pks), expected)
+
+    def test_organization_generation(self):
+        org1 = self._create_org(name='org1')
+        org2 = self._create_org(name='org2')
+        user1 = self._create_user(username='user1', email='user1@test.org')
+        user2 = self._create_user(username='user2', email='user2@test.org')
+        self._create_org_user(user=user1, organization=org1)
+        self._create_org_user(user=user2, organization=org2)
+        get_organizations_dicts([user1.pk, user2.pk])
+        org1.is_active = False
+        org1.save()
+        # the entry of user1 is stale, user2 is read from the cache
+        with self.assertNumQueries(1):
+            organizations = get_organizations_dicts([user1.pk, user2.pk])
+        self.assertEqual(organizations[user1.pk], {})
+        self.assertIn(str(org2.pk), organizations[user2.pk])
+        with self.assertNumQueries(0):
+            self.assertFalse(user1.is_member(org1))
+        org1.is_active = True
+        org1.save()
+        self.assertTrue(user1.is_member(org1))
+
     def test_is_member(self):
         user = self._create_user(username='organizations_pk')
         org1 = self._create_org(name='org1')
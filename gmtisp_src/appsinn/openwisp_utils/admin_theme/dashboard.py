@@ -1,11 +1,24 @@
 import copy
+import hashlib
 import html
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+from celery.exceptions import OperationalError
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
 from django.db.models import Count
+from django.utils import translation
+from django.utils.translation import get_language
 from swapper import load_model
 
-from ..utils import SortedOrderedDict
+from ..routers import use_replica
+from ..utils import SortedOrderedDict, is_shared_cache
+from . import settings as app_settings
+
+logger = logging.getLogger(__name__)
 
 DASHBOARD_CHARTS = SortedOrderedDict()
 DASHBOARD_TEMPLATES = SortedOrderedDict()
@@ -121,134 +134,300 @@ def unregister_dashboard_template(path):
     DASHBOARD_TEMPLATES.pop(key_to_remove)
 
 
-def get_dashboard_context(request):
-    """Loads dashboard context for the admin index view."""
-    context = {'is_popup': False, 'has_permission': True, 'dashboard_enabled': True}
-    config = copy.deepcopy(DASHBOARD_CHARTS)
-
-    for key, value in config.items():
-        query_params = value['query_params']
-        app_label = query_params['app_label']
-        model_name = query_params['model']
-        qs_filter = query_params.get('filter')
-        group_by = query_params.get('group_by')
-        annotate = query_params.get('annotate')
-        aggregate = query_params.get('aggregate')
-        org_field = query_params.get('organization_field')
-        default_org_field = 'organization_id'
-
-        labels_i18n = value.get('labels')
-        # HTML escape labels defined in configuration to prevent breaking the JS
-        if labels_i18n:
-            for label_key, label_value in labels_i18n.items():
-                labels_i18n[label_key] = html.escape(label_value)
-
-        try:
-            model = load_model(app_label, model_name)
-        except ImproperlyConfigured:
-            raise ImproperlyConfigured(
-                f'Error adding dashboard element {key}.'
-                f'REASON: {app_label}.{model_name} could not be loaded.'
+def _load_chart_model(key, query_params):
+    app_label = query_params['app_label']
+    model_name = query_params['model']
+    try:
+        return load_model(app_label, model_name)
+    except ImproperlyConfigured:
+        raise ImproperlyConfigured(
+            f'Error adding dashboard element {key}.'
+            f'REASON: {app_label}.{model_name} could not be loaded.'
+        )
+
+
+def _get_organization_field(query_params, model):
+    org_field = query_params.get('organization_field')
+    if org_field or hasattr(model, 'organization_id'):
+        return org_field or 'organization_id'
+    return None
+
+
+@use_replica()
+def compute_dashboard_chart(key, config, organizations=None):
+    """Runs the query of a dashboard chart.
+
+    Returns a copy of the chart config which contains the
+    data of the chart. If ``organizations`` is not ``None``,
+    only the objects of these organizations are counted.
+    """
+    value = copy.deepcopy(config)
+    query_params = value['query_params']
+    app_label = query_params['app_label']
+    model_name = query_params['model']
+    qs_filter = query_params.get('filter')
+    group_by = query_params.get('group_by')
+    annotate = query_params.get('annotate')
+    aggregate = query_params.get('aggregate')
+
+    labels_i18n = value.get('labels')
+    # HTML escape labels defined in configuration to prevent breaking the JS
+    if labels_i18n:
+        for label_key, label_value in labels_i18n.items():
+            labels_i18n[label_key] = html.escape(label_value)
+
+    model = _load_chart_model(key, query_params)
+    qs = model.objects
+    if qs_filter:
+        for field, lookup_value in qs_filter.items():
+            if callable(lookup_value):
+                qs_filter[field] = lookup_value()
+        qs = qs.filter(**qs_filter)
+
+    # Filter query according to organization of user
+    org_field = _get_organization_field(query_params, model)
+    if organizations is not None and org_field:
+        qs = qs.filter(**{f'{org_field}__in': organizations})
+
+    annotate_kwargs = {}
+    if group_by:
+        annotate_kwargs['count'] = Count(group_by)
+        qs = qs.values(group_by)
+    if annotate:
+        annotate_kwargs.update(annotate)
+
+    qs = qs.annotate(**annotate_kwargs)
+
+    if aggregate:
+        qs = qs.aggregate(**aggregate)
+
+    # Organize data for representation using Plotly.js
+    # Create a list of labels and values from the queryset
+    # where each element in the form of
+    # {group_by : '<label>', 'count': <value>}
+    values = []
+    labels = []
+    colors = []
+    filters = []
+    main_filters = []
+    url_operator = '?'
+    value['target_link'] = f'/admin/{app_label}/{model_name}/'
+    if value.get('main_filters'):
+        for main_filter_key, main_filter_value in value['main_filters'].items():
+            if callable(main_filter_value):
+                main_filter_value = str(main_filter_value())
+            main_filters.append(f'{main_filter_key}={main_filter_value}')
+
+        value['target_link'] = '{path}?{main_filters}'.format(
+            path=value['target_link'], main_filters='&'.join(main_filters)
+        )
+        value.pop('main_filters', None)
+        url_operator = '&'
+
+    if group_by:
+        for obj in qs:
+            # avoid showing an empty "None" label
+            if obj['count'] == 0:
+                continue
+            qs_key = str(obj[group_by])
+            label = qs_key
+            # get human readable label if predefined labels are available
+            # otherwise use the result got from the DB
+            if labels_i18n and qs_key in labels_i18n:
+                # store original label as filter, but only
+                # if we have more than the empty default label defined
+                filters.append(label)
+                label = labels_i18n[qs_key]
+            else:
+                # HTML escape labels coming from values in the DB
+                # to avoid possible XSS attacks caused by
+                # malicious DB values set by users
+                label = html.escape(label)
+            labels.append(label)
+            # use predefined colors if available,
+            # otherwise the JS lib will choose automatically
+            if value.get('colors') and qs_key in value['colors']:
+                colors.append(value['colors'][qs_key])
+            values.append(obj['count'])
+        value['target_link'] = '{path}{url_operator}{group_by}__exact='.format(
+            path=value['target_link'], url_operator=url_operator, group_by=group_by
+        )
+
+    if aggregate:
+        for qs_key, qs_value in qs.items():
+            if not qs_value:
+                continue
+            labels.append(labels_i18n[qs_key])
+            values.append(qs_value)
+            colors.append(value['colors'][qs_key])
+            if value.get('filters'):
+                filters.append(value['filters'][qs_key])
+        if value.get('filters'):
+            value['target_link'] = '{path}{url_operator}{filter_key}='.format(
+                url_operator=url_operator,
+                path=value['target_link'],
+                filter_key=value['filters']['key'],
             )
 
-        qs = model.objects
-        if qs_filter:
-            for field, lookup_value in qs_filter.items():
-                if callable(lookup_value):
-                    qs_filter[field] = lookup_value()
-            qs = qs.filter(**qs_filter)
+    value['query_params'] = {'values': values, 'labels': labels}
+    value['colors'] = colors
+    if filters:
+        value['filters'] = filters
+    return value
+
+
+def _now():
+    return time.time()
+
 
-        # Filter query according to organization of user
-        if not request.user.is_superuser and (
-            org_field or hasattr(model, default_org_field)
+def get_chart_cache_key(key, config, organizations=None):
+    """Returns the cache key of the results of a chart for an organization scope.
+
+    The labels of the charts are translated, hence the
+    results are cached per language as well.
+    """
+    if organizations is None:
+        scope = 'all'
+    else:
+        scope = hashlib.md5(','.join(organizations).encode()).hexdigest()
+    name = hashlib.md5(str(config['name']).encode()).hexdigest()
+    return f'dashboard_chart:{key}:{name}:{scope}:{get_language()}'
+
+
+def refresh_dashboard_chart(key, organizations=None, language=None):
+    """Computes a chart and stores its results in the cache.
+
+    The chart is computed in ``language`` if passed (eg: by the
+    celery workers), otherwise in the active language.
+
+    Returns the cache entry of the chart, or ``None`` if no chart
+    is registered at the ``key`` position anymore.
+    """
+    if language is not None:
+        with translation.override(language):
+            return refresh_dashboard_chart(key, organizations)
+    config = DASHBOARD_CHARTS.get(key)
+    if config is None:
+        return None
+    started = time.monotonic()
+    chart = compute_dashboard_chart(key, config, organizations)
+    entry = {
+        'chart': chart,
+        'time': time.monotonic() - started,
+        'computed': _now(),
+    }
+    timeout = app_settings.DASHBOARD_CACHE_TIMEOUT
+    if timeout:
+        cache_key = get_chart_cache_key(key, config, organizations)
+        # stale results are kept for another TTL,
+        # they are served while they are refreshed
+        cache.set(cache_key, entry, timeout * 2)
+        cache.delete(f'{cache_key}:refreshing')
+    return entry
+
+
+def _refresh_in_thread(key, organizations, language):
+    try:
+        # the active language is local to the thread of the request
+        return refresh_dashboard_chart(key, organizations, language)
+    finally:
+        # connections are opened per thread
+        connections.close_all()
+
+
+def _schedule_refresh(cache_key, key, organizations):
+    from ..tasks import refresh_dashboard_chart as refresh_task
+
+    # avoid queueing the same refresh more than once
+    timeout = app_settings.DASHBOARD_CACHE_TIMEOUT
+    if not cache.add(f'{cache_key}:refreshing', True, timeout):
+        return
+    try:
+        refresh_task.delay(key, organizations, get_language())
+    except OperationalError:
+        logger.warning('Celery broker is unreachable')
+
+
+def get_dashboard_charts(request):
+    """Returns the charts of the dashboard and the time spent on each chart.
+
+    Results are cached per chart, organization scope and language for
+    ``OPENWISP_ADMIN_DASHBOARD_CACHE_TIMEOUT`` seconds, after which
+    they are refreshed in the background by celery. The charts which
+    are not cached are computed in parallel.
+
+    Celery workers cannot refresh a cache which is local to the web
+    process (eg: ``LocMemCache``), in that case the expired charts
+    are recomputed together with the missing ones.
+    """
+    timeout = app_settings.DASHBOARD_CACHE_TIMEOUT
+    refresh_in_background = is_shared_cache()
+    scopes = {}
+    for key, config in DASHBOARD_CHARTS.items():
+        model = _load_chart_model(key, config['query_params'])
+        organizations = None
+        if not request.user.is_superuser and _get_organization_field(
+            config['query_params'], model
         ):
-            org_field = org_field or default_org_field
-            qs = qs.filter(**{f'{org_field}__in': request.user.organizations_managed})
-
-        annotate_kwargs = {}
-        if group_by:
-            annotate_kwargs['count'] = Count(group_by)
-            qs = qs.values(group_by)
-        if annotate:
-            annotate_kwargs.update(annotate)
-
-        qs = qs.annotate(**annotate_kwargs)
-
-        if aggregate:
-            qs = qs.aggregate(**aggregate)
-
-        # Organize data for representation using Plotly.js
-        # Create a list of labels and values from the queryset
-        # where each element in the form of
-        # {group_by : '<label>', 'count': <value>}
-        values = []
-        labels = []
-        colors = []
-        filters = []
-        main_filters = []
-        url_operator = '?'
-        value['target_link'] = f'/admin/{app_label}/{model_name}/'
-        if value.get('main_filters'):
-            for main_filter_key, main_filter_value in value['main_filters'].items():
-                if callable(main_filter_value):
-                    main_filter_value = str(main_filter_value())
-                main_filters.append(f'{main_filter_key}={main_filter_value}')
-
-            value['target_link'] = '{path}?{main_filters}'.format(
-                path=value['target_link'], main_filters='&'.join(main_filters)
+            organizations = sorted(
+                str(pk) for pk in request.user.organizations_managed
             )
-            value.pop('main_filters', None)
-            url_operator = '&'
-
-        if group_by:
-            for obj in qs:
-                # avoid showing an empty "None" label
-                if obj['count'] == 0:
-                    continue
-                qs_key = str(obj[group_by])
-                label = qs_key
-                # get human readable label if predefined labels are available
-                # otherwise use the result got from the DB
-                if labels_i18n and qs_key in labels_i18n:
-                    # store original label as filter, but only
-                    # if we have more than the empty default label defined
-                    filters.append(label)
-                    label = labels_i18n[qs_key]
-                else:
-                    # HTML escape labels coming from values in the DB
-                    # to avoid possible XSS attacks caused by
-                    # malicious DB values set by users
-                    label = html.escape(label)
-                labels.append(label)
-                # use predefined colors if available,
-                # otherwise the JS lib will choose automatically
-                if value.get('colors') and qs_key in value['colors']:
-                    colors.append(value['colors'][qs_key])
-                values.append(obj['count'])
-            value['target_link'] = '{path}{url_operator}{group_by}__exact='.format(
-                path=value['target_link'], url_operator=url_operator, group_by=group_by
+        cache_key = get_chart_cache_key(key, config, organizations)
+        scopes[key] = (cache_key, organizations)
+
+    cached = {}
+    if timeout:
+        cached = cache.get_many([cache_key for cache_key, _ in scopes.values()])
+    now = _now()
+    entries = {}
+    missing = []
+    for key, (cache_key, organizations) in scopes.items():
+        entry = cached.get(cache_key)
+        expired = entry is not None and now - entry['computed'] > timeout
+        if entry is None or (expired and not refresh_in_background):
+            missing.append(key)
+            continue
+        entries[key] = dict(entry, cached=True)
+        if expired:
+            _schedule_refresh(cache_key, key, organizations)
+
+    workers = min(app_settings.DASHBOARD_WORKERS, len(missing))
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                key: executor.submit(
+                    _refresh_in_thread, key, scopes[key][1], get_language()
+                )
+                for key in missing
+            }
+            for key, future in futures.items():
+                entries[key] = dict(future.result(), cached=False)
+    else:
+        for key in missing:
+            entries[key] = dict(
+                refresh_dashboard_chart(key, scopes[key][1]), cached=False
             )
 
-        if aggregate:
-            for qs_key, qs_value in qs.items():
-                if not qs_value:
-                    continue
-                labels.append(labels_i18n[qs_key])
-                values.append(qs_value)
-                colors.append(value['colors'][qs_key])
-                if value.get('filters'):
-                    filters.append(value['filters'][qs_key])
-            if value.get('filters'):
-                value['target_link'] = '{path}{url_operator}{filter_key}='.format(
-                    url_operator=url_operator,
-                    path=value['target_link'],
-                    filter_key=value['filters']['key'],
-                )
+    charts = {}
+    timings = {}
+    for key in DASHBOARD_CHARTS:
+        entry = entries[key]
+        charts[key] = entry['chart']
+        timings[str(entry['chart']['name'])] = {
+            'time': entry['time'],
+            'cached': entry['cached'],
+        }
+        logger.debug(
+            f'Dashboard chart "{entry["chart"]["name"]}": {entry["time"]:.3f}s'
+            f'{" (cached)" if entry["cached"] else ""}'
+        )
+    return charts, timings
+
 
-        value['query_params'] = {'values': values, 'labels': labels}
-        value['colors'] = colors
-        if filters:
-            value['filters'] = filters
+def get_dashboard_context(request):
+    """Loads dashboard context for the admin index view."""
+    context = {'is_popup': False, 'has_permission': True, 'dashboard_enabled': True}
+    config, timings = get_dashboard_charts(request)
 
     # dashboard templates
     extra_config = {}
@@ -271,6 +450,7 @@ def get_dashboard_context(request):
     context.update(
         {
             'dashboard_charts': dict(config),
+            'dashboard_chart_timings': timings,
             'dashboard_templates_before_charts': templates_before_charts,
             'dashboard_templates_after_charts': templates_after_charts,
             'dashboard_css': css,
@@ -1,9 +1,15 @@
+import copy
+from functools import lru_cache
+from types import SimpleNamespace
+
 from django.apps import registry
 from django.core.exceptions import ImproperlyConfigured
 from django.urls import reverse
 from django.urls.exceptions import NoReverseMatch
+from django.utils.translation import get_language
 
 from ..utils import SortedOrderedDict
+from . import settings as app_settings
 
 MENU = SortedOrderedDict()
 
@@ -206,6 +212,7 @@ def register_menu_group(position, config):
         # Unknown
         raise ImproperlyConfigured(f'Invalid config provided at position {position}')
     MENU.update({position: group_class})
+    invalidate_menu_cache()
 
 
 def register_menu_subitem(group_position, item_position, config):
@@ -251,9 +258,34 @@ def register_menu_subitem(group_position, item_position, config):
             at the same position.'
         )
     group.items.update({item_position: item})
+    invalidate_menu_cache()
 
 
-def build_menu_groups(request):
+class PermissionSet:
+    """Answers ``has_perm`` from a set of permissions.
+
+    Used in place of the user when the menu is compiled,
+    ``None`` means all the permissions (superusers).
+    """
+
+    def __init__(self, permissions):
+        self.permissions = permissions
+
+    def has_perm(self, perm, obj=None):
+        return self.permissions is None or perm in self.permissions
+
+
+def get_permission_set(user):
+    if user.is_active and user.is_superuser:
+        return None
+    if not user.is_active:
+        return frozenset()
+    return frozenset(user.get_all_permissions())
+
+
+@lru_cache(maxsize=app_settings.ADMIN_MENU_CACHE_SIZE)
+def _compile_menu_groups(menu_id, permissions, language):
+    request = SimpleNamespace(user=PermissionSet(permissions))
     menu = []
     for position, item in MENU.items():
         item_context = item.get_context(request)
@@ -261,3 +293,21 @@ def build_menu_groups(request):
             item_context['id'] = position
             menu.append(item_context)
     return menu
+
+
+def invalidate_menu_cache():
+    _compile_menu_groups.cache_clear()
+
+
+def build_menu_groups(request):
+    """Returns the menu of the user of ``request``.
+
+    The menu is compiled once for each set of permissions and language,
+    the compiled menus are kept in a process level LRU cache which is
+    cleared when the menu is changed.
+    """
+    menu = _compile_menu_groups(
+        id(MENU), get_permission_set(request.user), get_language()
+    )
+    # callers may modify the returned menu
+    return copy.deepcopy(menu)
@@ -1,5 +1,7 @@
 from django.conf import settings
 
+from ..utils import default_or_test
+
 ADMIN_SITE_CLASS = getattr(
     settings,
     'OPENWISP_ADMIN_SITE_CLASS',
@@ -9,6 +11,16 @@ ADMIN_SITE_CLASS = getattr(
 OPENWISP_ADMIN_THEME_LINKS = getattr(settings, 'OPENWISP_ADMIN_THEME_LINKS', [])
 OPENWISP_ADMIN_THEME_JS = getattr(settings, 'OPENWISP_ADMIN_THEME_JS', [])
 ADMIN_DASHBOARD_ENABLED = getattr(settings, 'OPENWISP_ADMIN_DASHBOARD_ENABLED', True)
+# seconds for which the results of the dashboard charts are cached
+DASHBOARD_CACHE_TIMEOUT = getattr(
+    settings,
+    'OPENWISP_ADMIN_DASHBOARD_CACHE_TIMEOUT',
+    default_or_test(value=300, test=0),
+)
+# threads used to compute the charts which are not cached
+DASHBOARD_WORKERS = getattr(
+    settings, 'OPENWISP_ADMIN_DASHBOARD_WORKERS', default_or_test(value=4, test=1)
+)
 
 OPENWISP_EMAIL_TEMPLATE = getattr(
     settings,
@@ -24,6 +36,9 @@ OPENWISP_EMAIL_LOGO = getattr(
 )
 
 OPENWISP_HTML_EMAIL = getattr(settings, 'OPENWISP_HTML_EMAIL', True)
+# number of compiled admin menus kept in memory,
+# one for each set of permissions and language
+ADMIN_MENU_CACHE_SIZE = getattr(settings, 'OPENWISP_ADMIN_MENU_CACHE_SIZE', 128)
 AUTOCOMPLETE_FILTER_VIEW = getattr(
     settings,
     'OPENWISP_AUTOCOMPLETE_FILTER_VIEW',
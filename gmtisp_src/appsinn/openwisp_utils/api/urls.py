@@ -5,7 +5,11 @@ from drf_yasg.views import get_schema_view
 from openwisp_utils import settings as app_settings
 from rest_framework import permissions
 
-urlpatterns = []
+from .views import instrumentation_stats
+
+urlpatterns = [
+    path('instrumentation/', instrumentation_stats, name='instrumentation_stats'),
+]
 
 if app_settings.API_DOCS:
     schema_view = get_schema_view(
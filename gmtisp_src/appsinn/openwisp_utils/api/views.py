@@ -0,0 +1,20 @@
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..instrumentation import registry
+
+
+class InstrumentationStatsView(APIView):
+    """
+    Statistics of the requests served by this process, by view
+    (recorded if ``InstrumentationMiddleware`` is enabled)
+    """
+
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(registry.snapshot())
+
+
+instrumentation_stats = InstrumentationStatsView.as_view()
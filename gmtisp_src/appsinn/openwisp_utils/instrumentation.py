@@ -0,0 +1,295 @@
+"""
+Opt-in instrumentation of the requests.
+
+``InstrumentationMiddleware`` records, for each view, the number of SQL
+queries, the time spent in the database, the hits and misses of the
+default cache and the latency of the requests in an in-memory histogram
+of the process. The statistics are exposed to staff users by the
+``instrumentation_stats`` API endpoint and logged every
+``OPENWISP_INSTRUMENTATION_LOG_INTERVAL`` seconds; the number of queries
+of each request is sent in the ``X-Query-Count`` header if
+``OPENWISP_INSTRUMENTATION_HEADER`` is enabled.
+
+``OPENWISP_QUERY_BUDGETS`` ({view name: max queries}) and ``query_budget``
+declare the maximum number of queries of the views: the requests which
+exceed them are logged, or fail when running the tests with
+``TimeLoggingTestRunner``, which adds the middleware to the tests if
+``OPENWISP_INSTRUMENTATION_TESTS`` is enabled.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from contextlib import ContextDecorator, ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from .utils import default_or_test
+
+logger = logging.getLogger(__name__)
+
+# upper bounds (in milliseconds) of the buckets of the latency histogram
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+_current = contextvars.ContextVar('openwisp_instrumentation', default=None)
+_raise_exceeded = False
+_local_budgets = contextvars.ContextVar('openwisp_query_budgets', default=())
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestStats(object):
+    __slots__ = ('queries', 'db_time', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+
+class ViewStats(object):
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.latency = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, stats, latency):
+        self.requests += 1
+        self.queries += stats.queries
+        self.max_queries = max(self.max_queries, stats.queries)
+        self.db_time += stats.db_time
+        self.cache_hits += stats.cache_hits
+        self.cache_misses += stats.cache_misses
+        self.latency += latency
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS, latency * 1000)] += 1
+
+    def percentile(self, percent):
+        """
+        Returns the upper bound of the bucket of the histogram which
+        contains the ``percent`` percentile of the latency,
+        ``None`` if it is the last (unbounded) bucket
+        """
+        threshold = self.requests * percent / 100
+        count = 0
+        for bound, bucket in zip(LATENCY_BUCKETS[:-1], self.histogram):
+            count += bucket
+            if count >= threshold:
+                return bound
+        return None
+
+    def as_dict(self):
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'avg_queries': round(self.queries / requests, 2),
+            'max_queries': self.max_queries,
+            'avg_db_time_ms': round(self.db_time * 1000 / requests, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'avg_latency_ms': round(self.latency * 1000 / requests, 2),
+            'p50_latency_ms': self.percentile(50),
+            'p95_latency_ms': self.percentile(95),
+            'p99_latency_ms': self.percentile(99),
+            'histogram': dict(
+                zip([str(bound) for bound in LATENCY_BUCKETS], self.histogram)
+            ),
+        }
+
+
+class Registry(object):
+    """
+    Statistics of the views of this process
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._last_log = time.monotonic()
+
+    def add(self, view_name, stats, latency):
+        with self._lock:
+            if view_name not in self._views:
+                self._views[view_name] = ViewStats()
+            self._views[view_name].add(stats, latency)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: view.as_dict() for name, view in self._views.items()}
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def log_if_due(self, interval):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_log < interval:
+                return
+            self._last_log = now
+        for name, stats in sorted(self.snapshot().items()):
+            logger.info(
+                f'{name}: {stats["requests"]} requests, '
+                f'{stats["avg_queries"]} queries (max {stats["max_queries"]}), '
+                f'db {stats["avg_db_time_ms"]}ms, '
+                f'cache {stats["cache_hits"]} hits/{stats["cache_misses"]} misses, '
+                f'latency avg {stats["avg_latency_ms"]}ms '
+                f'p95 {_format_bound(stats["p95_latency_ms"])} '
+                f'p99 {_format_bound(stats["p99_latency_ms"])}'
+            )
+
+
+def _format_bound(bound):
+    if bound is None:
+        return f'>{LATENCY_BUCKETS[-2]}ms'
+    return f'<={bound}ms'
+
+
+registry = Registry()
+
+
+def _instrument_cache(cache):
+    """
+    Counts the hits and misses of the lookups made
+    with ``cache`` while a request is instrumented
+    """
+    if getattr(cache, '_openwisp_instrumented', False):
+        return
+    get, get_many, has_key = cache.get, cache.get_many, cache.has_key
+    missing = object()
+
+    def instrumented_get(key, default=None, version=None):
+        value = get(key, missing, version=version)
+        stats = _current.get()
+        if stats is not None:
+            if value is missing:
+                stats.cache_misses += 1
+            else:
+                stats.cache_hits += 1
+        return default if value is missing else value
+
+    def instrumented_get_many(keys, version=None):
+        keys = list(keys)
+        values = get_many(keys, version=version)
+        stats = _current.get()
+        if stats is not None:
+            stats.cache_hits += len(values)
+            stats.cache_misses += len(keys) - len(values)
+        return values
+
+    def instrumented_has_key(key, version=None):
+        found = has_key(key, version=version)
+        stats = _current.get()
+        if stats is not None:
+            if found:
+                stats.cache_hits += 1
+            else:
+                stats.cache_misses += 1
+        return found
+
+    cache.get = instrumented_get
+    cache.get_many = instrumented_get_many
+    cache.has_key = instrumented_has_key
+    cache._openwisp_instrumented = True
+
+
+def get_query_budget(view_name):
+    for budgets in reversed(_local_budgets.get()):
+        if view_name in budgets:
+            return budgets[view_name]
+    return getattr(settings, 'OPENWISP_QUERY_BUDGETS', {}).get(view_name)
+
+
+class query_budget(ContextDecorator):
+    """
+    Declares the maximum number of queries of the views, eg::
+
+        @query_budget({'radius:authorize': 8})
+        def test_authorize(self):
+            ...
+    """
+
+    def __init__(self, budgets):
+        self.budgets = budgets
+        self._tokens = []
+
+    def __enter__(self):
+        self._tokens.append(_local_budgets.set(_local_budgets.get() + (self.budgets,)))
+        return self
+
+    def __exit__(self, *exc):
+        _local_budgets.reset(self._tokens.pop())
+        return False
+
+
+def raise_on_budget_exceeded(enabled):
+    """
+    Makes the requests which exceed their query budget
+    fail instead of being logged (used by the test runner)
+    """
+    global _raise_exceeded
+    _raise_exceeded = enabled
+
+
+class InstrumentationMiddleware(object):
+    header = 'X-Query-Count'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.log_interval = getattr(
+            settings, 'OPENWISP_INSTRUMENTATION_LOG_INTERVAL', default_or_test(300, 0)
+        )
+        self.send_header = getattr(settings, 'OPENWISP_INSTRUMENTATION_HEADER', False)
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        _instrument_cache(caches['default'])
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats.execute))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        latency = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else 'unresolved'
+        registry.add(view_name, stats, latency)
+        if self.send_header:
+            response[self.header] = str(stats.queries)
+        self.check_budget(view_name, stats)
+        if self.log_interval:
+            registry.log_if_due(self.log_interval)
+        return response
+
+    def check_budget(self, view_name, stats):
+        budget = get_query_budget(view_name)
+        if budget is None or stats.queries <= budget:
+            return
+        message = (
+            f'{view_name} executed {stats.queries} queries, '
+            f'its budget is {budget} queries'
+        )
+        if _raise_exceeded:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
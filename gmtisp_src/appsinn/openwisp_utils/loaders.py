@@ -15,9 +15,17 @@ class DependencyLoader(FilesystemLoader):
 
     dependencies = EXTENDED_APPS
 
+    def __init__(self, engine, dirs=None):
+        super().__init__(engine, dirs)
+        self._dependency_dirs = None
+
     def get_dirs(self):
-        dirs = []
-        for dependency in self.dependencies:
-            module = importlib.import_module(dependency)
-            dirs.append('{0}/templates'.format(os.path.dirname(module.__file__)))
-        return dirs
+        # the dependencies do not change while the process is running,
+        # hence the directories are looked up only once
+        if self._dependency_dirs is None:
+            dirs = []
+            for dependency in self.dependencies:
+                module = importlib.import_module(dependency)
+                dirs.append('{0}/templates'.format(os.path.dirname(module.__file__)))
+            self._dependency_dirs = dirs
+        return self._dependency_dirs
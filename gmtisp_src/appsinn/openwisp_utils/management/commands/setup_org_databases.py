@@ -1,43 +1,117 @@
-# project dir/
-# ├── management/
-# │   ├── __init__.py
-# │   ├── commands/
-# │       ├── __init__.py
-# │       ├── setup_org_databases.py
+import swapper
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
 
-# project dir/management/commands/setup_org_databases.py
+from ...routers import (
+    ORGANIZATION_DB_PREFIX,
+    get_organization_aliases,
+    get_routed_models,
+)
 
-import logging
-from django.core.management.base import BaseCommand
-from django.conf import settings
-from django.core.cache import cache
 
-from openwisp_users.models import Organization
-from gmtisp.db import get_organization_db
+class Command(BaseCommand):
+    help = (
+        'Migrates the database of each organization which has one '
+        '("db_<slug>" aliases of DATABASES) and copies in it the rows of '
+        'the default database which its data refers to: the organization '
+        'and, if the routed models have a relation with the users, its users'
+    )
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            action='append',
+            dest='aliases',
+            help='Alias of the database to set up (default: all of them)',
+        )
+        parser.add_argument(
+            '--skip-migrate',
+            action='store_true',
+            help='Copy the rows without running the migrations',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
 
-logger = logging.getLogger(__name__)
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or get_organization_aliases()
+        for alias in aliases:
+            if alias not in get_organization_aliases():
+                raise CommandError(f'"{alias}" is not the database of an organization')
+        for alias in aliases:
+            if not options['skip_migrate']:
+                call_command(
+                    'migrate',
+                    database=alias,
+                    interactive=False,
+                    verbosity=max(options['verbosity'] - 1, 0),
+                )
+            self.sync(alias, options['batch_size'])
 
-class Command(BaseCommand):
-    help = 'Set up databases for all organizations'
-
-    def handle(self, *args, **kwargs):
-        try:
-            orgs = cache.get('organizations')
-            if not orgs:
-                orgs = Organization.objects.all()
-                cache.set('organizations', orgs, timeout=3600)  # Cache for 1 hour
-
-            for org in orgs:
-                db_name = f"db_{org.slug}"
-                db_config = get_organization_db(org.slug)
-                settings.DATABASES[db_name] = db_config
-                logger.info(f"Added database configuration for {org.name}: {db_config}")
-
-            logger.debug(f"Final DATABASES settings: {settings.DATABASES}")
-
-        except Exception as e:
-            logger.error(f"Error setting up databases: {e}")
-            self.stderr.write(self.style.ERROR(f"Error: {e}"))
-        else:
-            self.stdout.write(self.style.SUCCESS('Successfully set up databases for all organizations'))
+    def get_shared_querysets(self, organization):
+        Organization = swapper.load_model('openwisp_users', 'Organization')
+        OrganizationUser = swapper.load_model('openwisp_users', 'OrganizationUser')
+        User = get_user_model()
+        querysets = [Organization.objects.filter(pk=organization.pk)]
+        related_models = {
+            field.related_model
+            for label in get_routed_models()
+            for field in apps.get_model(label)._meta.concrete_fields
+            if field.is_relation
+        }
+        if User in related_models:
+            querysets.append(
+                User.objects.filter(
+                    pk__in=OrganizationUser.objects.filter(
+                        organization=organization
+                    ).values('user_id')
+                )
+            )
+        return querysets
+
+    def sync(self, alias, batch_size):
+        Organization = swapper.load_model('openwisp_users', 'Organization')
+        slug = alias[len(ORGANIZATION_DB_PREFIX) :]
+        organization = (
+            Organization.objects.using(DEFAULT_DB_ALIAS).filter(slug=slug).first()
+        )
+        if organization is None:
+            self.stderr.write(
+                self.style.WARNING(f'{alias}: organization "{slug}" does not exist')
+            )
+            return
+        for queryset in self.get_shared_querysets(organization):
+            copied = self.copy(queryset.using(DEFAULT_DB_ALIAS), alias, batch_size)
+            self.stdout.write(
+                f'{alias}: copied {copied} {queryset.model._meta.verbose_name_plural}'
+            )
+        self.stdout.write(self.style.SUCCESS(f'{alias}: done'))
+
+    def copy(self, queryset, alias, batch_size):
+        """
+        Inserts or updates the rows of ``queryset`` in the database ``alias``
+        (without sending signals, the rows are copies)
+        """
+        model = queryset.model
+        fields = [
+            field.name for field in model._meta.concrete_fields if not field.primary_key
+        ]
+        copied, batch = 0, []
+        for instance in queryset.iterator(chunk_size=batch_size):
+            batch.append(instance)
+            if len(batch) >= batch_size:
+                copied += self._copy_batch(model, batch, alias, fields)
+                batch = []
+        if batch:
+            copied += self._copy_batch(model, batch, alias, fields)
+        return copied
+
+    def _copy_batch(self, model, batch, alias, fields):
+        model.objects.using(alias).bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=[model._meta.pk.name],
+            update_fields=fields,
+        )
+        return len(batch)
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...template_cache import TEMPLATE_EXTENSIONS, warmup_templates
+
+
+class Command(BaseCommand):
+    help = (
+        'Compiles all the templates found by the template loaders, '
+        'reporting the ones which cannot be compiled'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--extension',
+            action='append',
+            dest='extensions',
+            help='Extension of the templates to compile (default: %s)'
+            % ', '.join(TEMPLATE_EXTENSIONS),
+        )
+
+    def handle(self, *args, **options):
+        extensions = tuple(options['extensions'] or TEMPLATE_EXTENSIONS)
+        started = time.monotonic()
+        compiled, failed = warmup_templates(extensions)
+        if options['verbosity'] > 1:
+            for name in failed:
+                self.stdout.write(f'Skipped {name}')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Compiled {len(compiled)} templates in '
+                f'{time.monotonic() - started:.2f}s, {len(failed)} skipped'
+            )
+        )
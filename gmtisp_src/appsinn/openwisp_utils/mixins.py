@@ -12,6 +12,7 @@ from swapper import load_model
 User = get_user_model()
 OrganizationUser = load_model('openwisp_users', 'OrganizationUser')
 
+from .routers import use_replica
 from .utils import get_db_for_user
 
 logger = logging.getLogger(__name__)
@@ -154,3 +155,35 @@ class SuperuserPermissionMixin:
         return request.user.is_superuser
     
 
+
+class ReplicaReadMixin:
+    """
+    Reads the data of the GET and HEAD requests of the
+    view from a replica of the database, if configured
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        with use_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            # lazy querysets are evaluated when the response is rendered
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
+
+
+class ReplicaChangelistMixin:
+    """
+    Reads the data of the admin changelist from
+    a replica of the database, if configured
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method not in ('GET', 'HEAD'):
+            return super().changelist_view(request, extra_context)
+        with use_replica():
+            response = super().changelist_view(request, extra_context)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
@@ -0,0 +1,348 @@
+"""
+Routing of the data of the organizations to their own databases.
+
+``OrganizationRouter`` sends the queries of the models listed in
+``OPENWISP_ORGANIZATION_DB_MODELS`` (by default the RADIUS accounting
+and post-auth tables) to the ``db_<organization slug>`` alias of the
+organization they belong to, when such an alias is defined in
+``DATABASES`` (see ``gmtisp/db.py``); every other model, as well as the
+organizations which do not have an alias, use the ``default`` database.
+
+The organization of a query is looked up, in order, from:
+
+- the ``instance`` hint given by django (eg: when saving an object or
+  assigning a foreign key), ie: its ``organization_id``;
+- the ``organization_id`` hint, eg:
+  ``router.db_for_read(RadiusAccounting, organization_id=org_id)``;
+- the organization activated with ``organization_db``, which the
+  freeradius API sets for the organization of the request.
+
+Every alias contains all the tables: ``setup_org_databases`` migrates
+each of them and copies the shared rows (organizations and their users)
+which the routed models reference with foreign keys.
+
+``ReplicaRouter`` sends the reads which tolerate some staleness to the
+replicas of the default database (``OPENWISP_REPLICA_DATABASES``, by
+default the aliases starting with ``replica``). Reads are opted in with
+``use_replica`` (decorator or context manager, eg: for celery tasks)
+or with the view mixins of ``openwisp_utils.mixins``; all the other
+queries, the writes and the reads made in a transaction use the primary.
+Once a request writes, its following reads use the primary and
+``ReplicaMiddleware`` keeps the reads of the same client on the primary
+for ``OPENWISP_REPLICA_STICKY_SECONDS`` seconds (read-your-writes).
+"""
+import contextvars
+import random
+import threading
+import time
+from contextlib import ContextDecorator, contextmanager
+
+import swapper
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.signals import post_delete, post_save
+
+from .utils import default_or_test
+
+ORGANIZATION_DB_PREFIX = 'db_'
+DEFAULT_ROUTED_MODELS = (
+    'openwisp_radius.RadiusAccounting',
+    'openwisp_radius.RadiusPostAuth',
+)
+
+_current_organization = contextvars.ContextVar(
+    'openwisp_current_organization', default=None
+)
+_replica_state = contextvars.ContextVar('openwisp_replica_state', default=None)
+
+
+def get_routed_models():
+    return getattr(settings, 'OPENWISP_ORGANIZATION_DB_MODELS', DEFAULT_ROUTED_MODELS)
+
+
+def get_organization_aliases():
+    """
+    Returns the aliases of ``DATABASES`` reserved to an organization
+    """
+    return [
+        alias for alias in settings.DATABASES if alias.startswith(ORGANIZATION_DB_PREFIX)
+    ]
+
+
+def is_routed(model):
+    return model._meta.label in get_routed_models()
+
+
+def get_routed_databases(model):
+    """
+    Returns the aliases which store the rows of ``model``: the default
+    database and, if ``model`` is routed, the ones of the organizations
+    """
+    if not is_routed(model):
+        return [DEFAULT_DB_ALIAS]
+    return [DEFAULT_DB_ALIAS, *get_organization_aliases()]
+
+
+class OrganizationAliases(object):
+    """
+    Map of the ids of the organizations which have their own database
+    to its alias: it is loaded from the default database every
+    ``OPENWISP_ORGANIZATION_DB_REFRESH`` seconds and kept up to date with
+    the organizations saved or deleted by this process in the meantime;
+    if the interval is ``None`` (eg: in the tests) the map is never
+    loaded, only the organizations saved by this process are known
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._aliases = {}
+        self._loaded_at = None
+
+    def get(self, organization_id):
+        refresh = getattr(
+            settings, 'OPENWISP_ORGANIZATION_DB_REFRESH', default_or_test(60, None)
+        )
+        if refresh is not None and (
+            self._loaded_at is None or time.monotonic() - self._loaded_at > refresh
+        ):
+            self.load()
+        return self._aliases.get(str(organization_id))
+
+    def load(self):
+        Organization = swapper.load_model('openwisp_users', 'Organization')
+        slugs = [
+            alias[len(ORGANIZATION_DB_PREFIX) :] for alias in get_organization_aliases()
+        ]
+        organizations = (
+            Organization.objects.using(DEFAULT_DB_ALIAS)
+            .filter(slug__in=slugs)
+            .values_list('pk', 'slug')
+        )
+        aliases = {
+            str(pk): f'{ORGANIZATION_DB_PREFIX}{slug}' for pk, slug in organizations
+        }
+        with self._lock:
+            self._aliases = aliases
+            self._loaded_at = time.monotonic()
+
+    def update(self, organization):
+        alias = f'{ORGANIZATION_DB_PREFIX}{organization.slug}'
+        with self._lock:
+            if alias in settings.DATABASES:
+                self._aliases[str(organization.pk)] = alias
+            else:
+                self._aliases.pop(str(organization.pk), None)
+
+    def remove(self, organization):
+        with self._lock:
+            self._aliases.pop(str(organization.pk), None)
+
+
+organization_aliases = OrganizationAliases()
+
+
+def get_organization_alias(organization_id):
+    """
+    Returns the alias of the database of the organization,
+    ``None`` if it uses the default database
+    """
+    if organization_id is None or not get_organization_aliases():
+        return None
+    return organization_aliases.get(organization_id)
+
+
+def _organization_saved(instance, using, **kwargs):
+    # the copies made by setup_org_databases do not change the routing
+    if using == DEFAULT_DB_ALIAS:
+        organization_aliases.update(instance)
+
+
+def _organization_deleted(instance, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS:
+        organization_aliases.remove(instance)
+
+
+post_save.connect(
+    _organization_saved,
+    sender=swapper.get_model_name('openwisp_users', 'Organization'),
+    dispatch_uid='openwisp_utils_organization_alias_saved',
+)
+post_delete.connect(
+    _organization_deleted,
+    sender=swapper.get_model_name('openwisp_users', 'Organization'),
+    dispatch_uid='openwisp_utils_organization_alias_deleted',
+)
+
+
+def activate_organization(organization):
+    """
+    Routes the queries of the routed models which are not bound to
+    an instance to the database of ``organization`` (object or id),
+    returns the token to pass to ``deactivate_organization``
+    """
+    return _current_organization.set(getattr(organization, 'pk', organization))
+
+
+def deactivate_organization(token):
+    _current_organization.reset(token)
+
+
+@contextmanager
+def organization_db(organization):
+    token = activate_organization(organization)
+    try:
+        yield
+    finally:
+        deactivate_organization(token)
+
+
+class OrganizationRouter(object):
+    def _get_organization_id(self, hints):
+        instance = hints.get('instance')
+        if instance is not None:
+            if instance._meta.label == swapper.get_model_name(
+                'openwisp_users', 'Organization'
+            ):
+                return instance.pk
+            organization_id = getattr(instance, 'organization_id', None)
+            if organization_id is not None:
+                return organization_id
+        if hints.get('organization_id') is not None:
+            return hints['organization_id']
+        return _current_organization.get()
+
+    def db_for_read(self, model, **hints):
+        if not is_routed(model):
+            return None
+        return get_organization_alias(self._get_organization_id(hints))
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the shared rows are copied in the database of each organization
+        if not is_routed(obj1.__class__) or not is_routed(obj2.__class__):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+def get_replica_aliases():
+    return getattr(
+        settings,
+        'OPENWISP_REPLICA_DATABASES',
+        [alias for alias in settings.DATABASES if alias.startswith('replica')],
+    )
+
+
+class ReplicaState(object):
+    """
+    Use of the replicas in a request or task
+    """
+
+    __slots__ = ('depth', 'pinned', 'wrote', 'alias')
+
+    def __init__(self, pinned=False):
+        # number of nested use_replica blocks
+        self.depth = 0
+        # the client wrote recently
+        self.pinned = pinned
+        self.wrote = False
+        self.alias = None
+
+
+class use_replica(ContextDecorator):
+    """
+    Reads the data from a replica unless the caller
+    wrote before (or is in a transaction), eg::
+
+        @use_replica()
+        def compute_report():
+            ...
+    """
+
+    def _recreate_cm(self):
+        # each call of a decorated function has its own state
+        return self.__class__()
+
+    def __enter__(self):
+        self._token = None
+        self._state = _replica_state.get()
+        if self._state is None:
+            self._state = ReplicaState()
+            self._token = _replica_state.set(self._state)
+        self._state.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._state.depth -= 1
+        if self._token is not None:
+            _replica_state.reset(self._token)
+        return False
+
+
+class ReplicaRouter(object):
+    def db_for_read(self, model, **hints):
+        state = _replica_state.get()
+        if state is None or not state.depth or state.pinned or state.wrote:
+            return None
+        # related objects are read from the database of the instance
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db is not None:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        if state.alias is None:
+            aliases = get_replica_aliases()
+            if not aliases:
+                return None
+            state.alias = random.choice(aliases)
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _replica_state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replica_aliases():
+            return False
+        return None
+
+
+class ReplicaMiddleware(object):
+    """
+    Keeps the reads of the clients which wrote in the last
+    ``OPENWISP_REPLICA_STICKY_SECONDS`` seconds on the primary
+    """
+
+    cookie_name = 'replica_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'OPENWISP_REPLICA_STICKY_SECONDS', 5)
+
+    def __call__(self, request):
+        state = ReplicaState(pinned=self.cookie_name in request.COOKIES)
+        token = _replica_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_state.reset(token)
+        if state.wrote and get_replica_aliases():
+            response.set_cookie(
+                self.cookie_name,
+                '1',
+                max_age=self.sticky_seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
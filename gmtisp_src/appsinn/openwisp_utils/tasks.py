@@ -1,4 +1,4 @@
-from celery import Task
+from celery import Task, shared_task
 
 from . import settings as app_settings
 
@@ -6,3 +6,15 @@ from . import settings as app_settings
 class OpenwispCeleryTask(Task):
     soft_time_limit = app_settings.CELERY_SOFT_TIME_LIMIT
     time_limit = app_settings.CELERY_HARD_TIME_LIMIT
+
+
+@shared_task(base=OpenwispCeleryTask)
+def refresh_dashboard_chart(key, organizations=None, language=None):
+    """
+    Refreshes the cached results of a dashboard chart in the language
+    of the request which queued it, it is queued only if the cache is
+    shared with the web workers
+    """
+    from .admin_theme.dashboard import refresh_dashboard_chart as refresh
+
+    refresh(key, organizations, language)
@@ -0,0 +1,81 @@
+"""
+Compiles the templates of the project ahead of the first request.
+
+When the cached template loader is enabled (``TEMPLATE_CACHE`` in the
+project settings) each process compiles a template the first time it
+is rendered and keeps it in memory: calling ``warmup_templates`` when
+a worker boots moves the compilation out of the requests.
+"""
+import logging
+import os
+import time
+
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt', '.xml')
+
+
+def _get_loaders(loaders):
+    for loader in loaders:
+        # the cached loader wraps the loaders which find the templates
+        if hasattr(loader, 'loaders'):
+            yield from _get_loaders(loader.loaders)
+        else:
+            yield loader
+
+
+def get_template_names(engine, extensions=TEMPLATE_EXTENSIONS):
+    """
+    Returns the names of the templates found in the
+    directories of the loaders of ``engine``
+    """
+    names = []
+    seen = set()
+    for loader in _get_loaders(engine.template_loaders):
+        if not hasattr(loader, 'get_dirs'):
+            continue
+        for directory in loader.get_dirs():
+            directory = str(directory)
+            for root, _, filenames in os.walk(directory):
+                for filename in filenames:
+                    if not filename.endswith(extensions):
+                        continue
+                    path = os.path.join(root, filename)
+                    name = os.path.relpath(path, directory).replace(os.sep, '/')
+                    if name not in seen:
+                        seen.add(name)
+                        names.append(name)
+    return names
+
+
+def warmup_templates(extensions=TEMPLATE_EXTENSIONS):
+    """
+    Compiles the templates of the django template engines,
+    returns the names of the compiled templates and the
+    names of the ones which could not be compiled
+    """
+    started = time.monotonic()
+    compiled = []
+    failed = []
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        engine = backend.engine
+        for name in get_template_names(engine, extensions):
+            try:
+                engine.get_template(name)
+            except Exception as e:
+                # eg: templates of apps which are not installed,
+                # or which are meant for other template engines
+                logger.debug(f'Could not compile template "{name}": {e}')
+                failed.append(name)
+            else:
+                compiled.append(name)
+    logger.info(
+        f'Compiled {len(compiled)} templates in '
+        f'{time.monotonic() - started:.2f}s ({len(failed)} skipped)'
+    )
+    return compiled, failed
@@ -9,6 +9,7 @@ from django.db import DEFAULT_DB_ALIAS, connections
 from django.test.runner import DiscoverRunner
 from django.test.utils import CaptureQueriesContext
 
+from .instrumentation import raise_on_budget_exceeded
 from .utils import print_color
 
 
@@ -76,9 +77,39 @@ class TimeLoggingTestResult(TextTestResult):
 
 
 class TimeLoggingTestRunner(DiscoverRunner):
+    """
+    Reports the slow tests and makes the requests which exceed
+    their query budget fail (see ``openwisp_utils.instrumentation``).
+
+    The requests are instrumented only if ``InstrumentationMiddleware``
+    is in ``MIDDLEWARE`` or ``OPENWISP_INSTRUMENTATION_TESTS`` is enabled.
+    """
+
+    instrumentation_middleware = (
+        'openwisp_utils.instrumentation.InstrumentationMiddleware'
+    )
+
     def get_resultclass(self):
         return TimeLoggingTestResult
 
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        if (
+            getattr(settings, 'OPENWISP_INSTRUMENTATION_TESTS', False)
+            and self.instrumentation_middleware not in settings.MIDDLEWARE
+        ):
+            self._middleware = settings.MIDDLEWARE
+            settings.MIDDLEWARE = [self.instrumentation_middleware] + list(
+                settings.MIDDLEWARE
+            )
+        raise_on_budget_exceeded(True)
+
+    def teardown_test_environment(self, **kwargs):
+        raise_on_budget_exceeded(False)
+        if hasattr(self, '_middleware'):
+            settings.MIDDLEWARE = self._middleware
+        super().teardown_test_environment(**kwargs)
+
 
 class CaptureOutput(object):
     def __call__(self, function):
@@ -1,3 +1,5 @@
+import os
+import threading
 from collections import OrderedDict
 from copy import deepcopy
 
@@ -67,6 +69,30 @@ def print_color(string, color_name, end='\n'):
     print(f'\033[{color}m{string}\033[0m', end=end)
 
 
+# requests sessions are not thread safe, each thread has its own
+_retryable_sessions = threading.local()
+
+
+def _get_retryable_session(retry_kwargs):
+    """
+    Returns a session configured with ``retry_kwargs``, sessions are
+    reused by the following calls with the same configuration in the
+    same thread and process, so that their connections are kept alive.
+    """
+    sessions = getattr(_retryable_sessions, 'sessions', None)
+    if sessions is None:
+        sessions = _retryable_sessions.sessions = {}
+    key = (os.getpid(), repr(sorted(retry_kwargs.items())))
+    session = sessions.get(key)
+    if session is None:
+        session = requests.Session()
+        retries = Retry(**retry_kwargs)
+        session.mount('https://', HTTPAdapter(max_retries=retries))
+        session.mount('http://', HTTPAdapter(max_retries=retries))
+        sessions[key] = session
+    return session
+
+
 def retryable_request(
     method,
     timeout=(4, 8),
@@ -83,19 +109,34 @@ def retryable_request(
         dict(
             total=max_retries,
             backoff_factor=backoff_factor,
-            status_forcelist=status_forcelist,
-            allowed_methods=allowed_methods,
+            status_forcelist=tuple(status_forcelist),
+            allowed_methods=tuple(allowed_methods),
             backoff_jitter=backoff_jitter,
         )
     )
-    request_session = requests.Session()
-    retries = Retry(**retry_kwargs)
-    request_session.mount('https://', HTTPAdapter(max_retries=retries))
-    request_session.mount('http://', HTTPAdapter(max_retries=retries))
+    request_session = _get_retryable_session(retry_kwargs)
     request_method = getattr(request_session, method)
     return request_method(timeout=timeout, **kwargs)
 
 
+# cache backends whose data is not visible to other processes
+_PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache(alias='default'):
+    """
+    Returns ``True`` if the data of the ``alias`` cache is shared by
+    the processes of the application (eg: redis or memcached), the
+    web workers and the celery workers do not see each other's
+    writes to a local memory cache.
+    """
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    return bool(backend) and backend not in _PROCESS_LOCAL_CACHES
+
+
 
 
 from swapper import load_model
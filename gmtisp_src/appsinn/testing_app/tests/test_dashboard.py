@@ -1,11 +1,14 @@
+import time
 from collections import OrderedDict
 from copy import deepcopy
 from unittest import TestCase as UnitTestCase
 from unittest.mock import patch
 
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase as DjangoTestCase
 from django.urls import reverse
+from django.utils import translation
 from django.utils.timezone import localdate, now, timedelta
 from openwisp_utils.admin_theme import (
     register_dashboard_chart,
@@ -13,7 +16,12 @@ from openwisp_utils.admin_theme import (
     unregister_dashboard_chart,
     unregister_dashboard_template,
 )
-from openwisp_utils.admin_theme.dashboard import get_dashboard_context
+from openwisp_utils.admin_theme.dashboard import (
+    DASHBOARD_CHARTS,
+    get_chart_cache_key,
+    get_dashboard_context,
+)
+from openwisp_utils.tasks import refresh_dashboard_chart
 
 from ..models import Operator, Project, RadiusAccounting
 from . import AdminTestMixin, CreateMixin
@@ -294,3 +302,75 @@ class TestAdminDashboard(AdminTestMixin, CreateMixin, DjangoTestCase):
             context['dashboard_charts'][1]['query_params']['labels'][0],
             '&lt;strong&gt;Projects with operators&lt;/strong&gt;',
         )
+
+    @patch('openwisp_utils.admin_theme.settings.DASHBOARD_CACHE_TIMEOUT', 60)
+    def test_dashboard_chart_cache(self):
+        cache.clear()
+        project = Project.objects.create(name='test')
+        Operator.objects.create(project=project, first_name='a', last_name='b')
+        mocked_request = MockRequest(user=MockUser(is_superuser=True))
+        context = get_dashboard_context(mocked_request)
+        chart_name = 'Operator Project Distribution'
+        key = next(
+            key
+            for key, chart in context['dashboard_charts'].items()
+            if chart['name'] == chart_name
+        )
+        chart = context['dashboard_charts'][key]
+        self.assertEqual(chart['query_params']['values'], [1])
+        self.assertFalse(context['dashboard_chart_timings'][chart_name]['cached'])
+
+        with self.subTest('results are read from the cache'):
+            Project.objects.all().delete()
+            with self.assertNumQueries(0):
+                context = get_dashboard_context(mocked_request)
+            chart = context['dashboard_charts'][key]
+            self.assertEqual(chart['query_params']['values'], [1])
+            self.assertTrue(context['dashboard_chart_timings'][chart_name]['cached'])
+
+        with self.subTest('results are cached per language'):
+            with translation.override('it'):
+                context = get_dashboard_context(mocked_request)
+            self.assertFalse(context['dashboard_chart_timings'][chart_name]['cached'])
+
+        with self.subTest('stale results are refreshed in the background'):
+            with patch(
+                'openwisp_utils.admin_theme.dashboard._now',
+                return_value=time.time() + 61,
+            ), patch(
+                'openwisp_utils.admin_theme.dashboard.is_shared_cache',
+                return_value=True,
+            ), patch(
+                'openwisp_utils.tasks.refresh_dashboard_chart.delay'
+            ) as delay:
+                context = get_dashboard_context(mocked_request)
+            self.assertEqual(delay.call_count, len(context['dashboard_charts']))
+            delay.assert_any_call(key, None, translation.get_language())
+            chart = context['dashboard_charts'][key]
+            self.assertEqual(chart['query_params']['values'], [1])
+
+        with self.subTest('refresh task updates the cache'):
+            refresh_dashboard_chart.delay(key)
+            context = get_dashboard_context(mocked_request)
+            chart = context['dashboard_charts'][key]
+            self.assertEqual(chart['query_params']['values'], [])
+
+        with self.subTest('refresh task computes the chart in the passed language'):
+            with translation.override('it'):
+                cache_key = get_chart_cache_key(key, DASHBOARD_CHARTS[key], None)
+            cache.delete(cache_key)
+            refresh_dashboard_chart.delay(key, None, 'it')
+            self.assertIsNotNone(cache.get(cache_key))
+
+        with self.subTest('stale results are recomputed with a local cache'):
+            project = Project.objects.create(name='test')
+            Operator.objects.create(project=project, first_name='c', last_name='d')
+            with patch(
+                'openwisp_utils.admin_theme.dashboard._now',
+                return_value=time.time() + 61,
+            ), patch('openwisp_utils.tasks.refresh_dashboard_chart.delay') as delay:
+                context = get_dashboard_context(mocked_request)
+            delay.assert_not_called()
+            chart = context['dashboard_charts'][key]
+            self.assertEqual(chart['query_params']['values'], [1])
+            self.assertFalse(context['dashboard_chart_timings'][chart_name]['cached'])
@@ -1,4 +1,6 @@
+import importlib
 import unittest
+from unittest import mock
 
 from openwisp_utils.loaders import DependencyLoader
 from openwisp_utils.staticfiles import DependencyFinder
@@ -14,3 +16,15 @@ class TestDependencyDiscovery(unittest.TestCase):
         loader = DependencyLoader(engine=None)
         self.assertIsInstance(loader.get_dirs(), list)
         self.assertIn('openwisp_controller', loader.get_dirs()[0])
+
+    def test_dependency_loader_dirs_cached(self):
+        loader = DependencyLoader(engine=None)
+        loader.dependencies = ['openwisp_utils']
+        with mock.patch(
+            'openwisp_utils.loaders.importlib.import_module',
+            wraps=importlib.import_module,
+        ) as import_module:
+            dirs = loader.get_dirs()
+            self.assertEqual(loader.get_dirs(), dirs)
+        import_module.assert_called_once_with('openwisp_utils')
+        self.assertTrue(dirs[0].endswith('openwisp_utils/templates'))
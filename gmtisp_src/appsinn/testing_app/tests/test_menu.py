@@ -10,6 +10,8 @@ from openwisp_utils.admin_theme.menu import (
     MenuGroup,
     MenuLink,
     ModelLink,
+    _compile_menu_groups,
+    build_menu_groups,
     register_menu_group,
     register_menu_subitem,
 )
@@ -401,3 +403,39 @@ class TestMenuSchema(TestCase):
             self.assertEqual(len(context_items), 1)
             self.assertEqual(context_items[0].get('label'), link_context.get('label'))
             self.assertEqual(context_items[0].get('url'), link_context.get('url'))
+
+    @patch('openwisp_utils.admin_theme.menu.MENU', SortedOrderedDict())
+    def test_build_menu_groups_cache(self):
+        register_menu_group(position=100, config=self._get_menu_group_config())
+        request = self.factory.get(reverse('admin:index'))
+        request.user = get_user_model().objects.create_superuser(
+            username='administrator', password='admin', email='test@test.org'
+        )
+        menu = build_menu_groups(request)
+        self.assertEqual(len(menu[0]['sub_items']), 2)
+        hits = _compile_menu_groups.cache_info().hits
+        menu[0]['sub_items'].pop()
+        with self.assertNumQueries(0):
+            menu = build_menu_groups(request)
+        self.assertEqual(_compile_menu_groups.cache_info().hits, hits + 1)
+        self.assertEqual(len(menu[0]['sub_items']), 2)
+
+        with self.subTest('menu compiled for the permissions of the user'):
+            request.user = get_user_model().objects.create(
+                username='operator',
+                password='pass',
+                email='email@email',
+                is_staff=True,
+            )
+            menu = build_menu_groups(request)
+            self.assertEqual(len(menu[0]['sub_items']), 1)
+
+        with self.subTest('cache cleared when the menu changes'):
+            register_menu_subitem(
+                group_position=100,
+                item_position=3,
+                config=self._get_menu_link_config(label='new'),
+            )
+            self.assertEqual(_compile_menu_groups.cache_info().currsize, 0)
+            menu = build_menu_groups(request)
+            self.assertEqual(len(menu[0]['sub_items']), 2)
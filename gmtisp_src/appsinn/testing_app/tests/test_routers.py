@@ -0,0 +1,97 @@
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.views import View
+from openwisp_utils.mixins import ReplicaReadMixin
+from openwisp_utils.routers import ReplicaMiddleware, ReplicaRouter, use_replica
+
+from ..models import Shelf
+
+router = ReplicaRouter()
+
+
+class ReplicaView(ReplicaReadMixin, View):
+    def get(self, request):
+        return HttpResponse(router.db_for_read(Shelf) or DEFAULT_DB_ALIAS)
+
+    def post(self, request):
+        return HttpResponse(router.db_for_read(Shelf) or DEFAULT_DB_ALIAS)
+
+
+@override_settings(OPENWISP_REPLICA_DATABASES=['replica'])
+class TestReplicaRouter(SimpleTestCase):
+    factory = RequestFactory()
+
+    def test_opt_in(self):
+        self.assertIsNone(router.db_for_read(Shelf))
+        with use_replica():
+            self.assertEqual(router.db_for_read(Shelf), 'replica')
+            with use_replica():
+                self.assertEqual(router.db_for_read(Shelf), 'replica')
+            self.assertEqual(router.db_for_read(Shelf), 'replica')
+        self.assertIsNone(router.db_for_read(Shelf))
+
+        with self.subTest('Decorator'):
+
+            @use_replica()
+            def read():
+                return router.db_for_read(Shelf)
+
+            self.assertEqual(read(), 'replica')
+            self.assertIsNone(router.db_for_read(Shelf))
+
+        with self.subTest('No replica configured'):
+            with override_settings(OPENWISP_REPLICA_DATABASES=[]), use_replica():
+                self.assertIsNone(router.db_for_read(Shelf))
+
+    def test_primary(self):
+        with self.subTest('Writes'):
+            with use_replica():
+                self.assertIsNone(router.db_for_write(Shelf))
+                # reads its own writes
+                self.assertIsNone(router.db_for_read(Shelf))
+
+        with self.subTest('Transactions'):
+            with mock.patch.object(
+                connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True
+            ), use_replica():
+                self.assertIsNone(router.db_for_read(Shelf))
+
+        with self.subTest('Related objects'):
+            shelf = Shelf()
+            shelf._state.db = DEFAULT_DB_ALIAS
+            with use_replica():
+                self.assertIsNone(router.db_for_read(Shelf, instance=shelf))
+
+    def test_migrations(self):
+        self.assertFalse(router.allow_migrate('replica', 'testing_app'))
+        self.assertIsNone(router.allow_migrate(DEFAULT_DB_ALIAS, 'testing_app'))
+
+    def test_middleware(self):
+        def write(request):
+            router.db_for_write(Shelf)
+            return HttpResponse()
+
+        response = ReplicaMiddleware(write)(self.factory.get('/'))
+        self.assertIn(ReplicaMiddleware.cookie_name, response.cookies)
+        self.assertEqual(
+            response.cookies[ReplicaMiddleware.cookie_name]['max-age'], 5
+        )
+
+        response = ReplicaMiddleware(lambda request: HttpResponse())(
+            self.factory.get('/')
+        )
+        self.assertNotIn(ReplicaMiddleware.cookie_name, response.cookies)
+
+        with self.subTest('Clients which wrote recently read from the primary'):
+            request = self.factory.get('/')
+            request.COOKIES[ReplicaMiddleware.cookie_name] = '1'
+            response = ReplicaMiddleware(ReplicaView.as_view())(request)
+            self.assertEqual(response.content, b'default')
+
+    def test_view_mixin(self):
+        view = ReplicaMiddleware(ReplicaView.as_view())
+        self.assertEqual(view(self.factory.get('/')).content, b'replica')
+        self.assertEqual(view(self.factory.post('/')).content, b'default')
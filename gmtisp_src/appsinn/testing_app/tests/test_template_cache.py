@@ -0,0 +1,84 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import SimpleTestCase, override_settings
+from openwisp_utils.loaders import DependencyLoader
+from openwisp_utils.template_cache import get_template_names, warmup_templates
+
+
+class TestTemplateCacheSetting(SimpleTestCase):
+    def test_template_cache_setting(self):
+        loaders = engines['django'].engine.template_loaders
+        self.assertEqual(isinstance(loaders[0], CachedLoader), settings.TEMPLATE_CACHE)
+        if settings.TEMPLATE_CACHE:
+            # the cached loader wraps the loaders of the project
+            self.assertIn(
+                DependencyLoader, [type(loader) for loader in loaders[0].loaders]
+            )
+
+
+class TestTemplateCache(SimpleTestCase):
+    def setUp(self):
+        self.template_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.template_dir.cleanup)
+        templates = {
+            'ok.html': '{{ value }}',
+            'mail/body.txt': 'Hello {{ user }}',
+            'broken.html': '{% if %}',
+            'style.css': 'body {}',
+        }
+        for name, content in templates.items():
+            path = os.path.join(self.template_dir.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(content)
+        self.templates = override_settings(
+            TEMPLATES=[
+                {
+                    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+                    'DIRS': [self.template_dir.name],
+                    'OPTIONS': {
+                        'loaders': [
+                            (
+                                'django.template.loaders.cached.Loader',
+                                ['django.template.loaders.filesystem.Loader'],
+                            )
+                        ]
+                    },
+                }
+            ]
+        )
+        self.templates.enable()
+        self.addCleanup(self.templates.disable)
+
+    def test_get_template_names(self):
+        names = get_template_names(engines['django'].engine)
+        self.assertEqual(sorted(names), ['broken.html', 'mail/body.txt', 'ok.html'])
+
+    def test_warmup_templates(self):
+        compiled, failed = warmup_templates()
+        self.assertEqual(sorted(compiled), ['mail/body.txt', 'ok.html'])
+        self.assertEqual(failed, ['broken.html'])
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIn('ok.html', loader.get_template_cache)
+        with self.subTest('Extensions'):
+            compiled, failed = warmup_templates(extensions=('.txt',))
+            self.assertEqual(compiled, ['mail/body.txt'])
+            self.assertEqual(failed, [])
+
+    def test_warmup_templates_command(self):
+        stdout = StringIO()
+        call_command('warmup_templates', verbosity=2, stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn('Skipped broken.html', output)
+        self.assertIn('Compiled 2 templates', output)
+        with self.subTest('Extensions'):
+            stdout = StringIO()
+            call_command('warmup_templates', extensions=['.txt'], stdout=stdout)
+            self.assertIn('Compiled 1 templates', stdout.getvalue())
+            self.assertIn('0 skipped', stdout.getvalue())
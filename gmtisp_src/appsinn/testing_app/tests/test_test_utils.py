@@ -1,8 +1,12 @@
 import sys
 import unittest
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.dispatch import Signal
-from django.test import TestCase, override_settings
+from django.test import TestCase, modify_settings, override_settings
+from django.urls import reverse_lazy
+from openwisp_utils import instrumentation
 from openwisp_utils.tests import (
     AssertNumQueriesSubTestMixin,
     TimeLoggingTestRunner,
@@ -64,6 +68,29 @@ class TestUtils(TestCase):
         self.assertIn('Ran 1 test', stderr.getvalue())
         self.assertIn('OK', stderr.getvalue())
 
+    @unittest.mock.patch('django.test.runner.DiscoverRunner.setup_test_environment')
+    @unittest.mock.patch(
+        'django.test.runner.DiscoverRunner.teardown_test_environment'
+    )
+    def test_time_logging_runner_instrumentation(self, *args):
+        raise_exceeded = instrumentation._raise_exceeded
+        self.addCleanup(instrumentation.raise_on_budget_exceeded, raise_exceeded)
+        middleware = TimeLoggingTestRunner.instrumentation_middleware
+
+        with self.subTest('Requests are not instrumented by default'):
+            runner = TimeLoggingTestRunner()
+            runner.setup_test_environment()
+            self.assertNotIn(middleware, settings.MIDDLEWARE)
+            runner.teardown_test_environment()
+
+        with self.subTest('Requests are instrumented if enabled'):
+            with override_settings(OPENWISP_INSTRUMENTATION_TESTS=True):
+                runner = TimeLoggingTestRunner()
+                runner.setup_test_environment()
+                self.assertEqual(settings.MIDDLEWARE[0], middleware)
+                runner.teardown_test_environment()
+                self.assertNotIn(middleware, settings.MIDDLEWARE)
+
     @capture_stdout()
     def test_print_color(self, captured_output):
         print_color('This is the printed in Red Bold', color_name='red_bold')
@@ -96,3 +123,54 @@ class TestAssertNumQueriesSubTest(AssertNumQueriesSubTestMixin, TestCase):
             with self.assertNumQueries(1):
                 Shelf.objects.count()
             patched_subtest.assert_called_once()
+
+
+@modify_settings(
+    MIDDLEWARE={'prepend': 'openwisp_utils.instrumentation.InstrumentationMiddleware'}
+)
+class TestInstrumentation(TestCase):
+    url = reverse_lazy('instrumentation_stats')
+
+    def setUp(self):
+        instrumentation.registry.reset()
+        admin = get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='tester'
+        )
+        self.client.force_login(admin)
+
+    def test_instrumentation_stats(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        # the stats of a request are recorded after its response is ready
+        stats = response.data['instrumentation_stats']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['max_queries'], 0)
+        self.assertEqual(sum(stats['histogram'].values()), 1)
+
+    def test_query_budget(self):
+        raise_exceeded = instrumentation._raise_exceeded
+        self.addCleanup(instrumentation.raise_on_budget_exceeded, raise_exceeded)
+        budget = instrumentation.query_budget({'instrumentation_stats': 0})
+
+        with self.subTest('Failing in tests'):
+            instrumentation.raise_on_budget_exceeded(True)
+            middleware = instrumentation.InstrumentationMiddleware(lambda r: None)
+            stats = instrumentation.RequestStats()
+            stats.queries = 1
+            with budget, self.assertRaises(instrumentation.QueryBudgetExceeded):
+                middleware.check_budget('instrumentation_stats', stats)
+            # the views without a budget are not checked
+            middleware.check_budget('other', stats)
+
+        with self.subTest('Logged otherwise'):
+            instrumentation.raise_on_budget_exceeded(False)
+            with budget, self.assertLogs(instrumentation.logger, 'WARNING'):
+                response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+
+        with self.subTest('Within the budget'):
+            instrumentation.raise_on_budget_exceeded(True)
+            with instrumentation.query_budget({'instrumentation_stats': 100}):
+                response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
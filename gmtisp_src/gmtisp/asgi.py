@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gmtisp.settings")
 
 application = get_asgi_application()
+
+if getattr(settings, 'TEMPLATE_CACHE', False):
+    # compiles the templates before the worker serves the first request
+    from openwisp_utils.template_cache import warmup_templates
+
+    warmup_templates()
@@ -89,15 +89,43 @@ def get_organization_db(organization=None):
         return get_organization_db_config(organization)
     return get_default_db_config()
 
-# Ensure default database is set up first
+def get_connection_options():
+    """
+    Keeps the connections to the databases of the organizations and to the
+    replica open between the requests (psycopg2 has no pool), checking that
+    they are still usable before reusing them.
+    """
+    return {
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', default=60),
+        'CONN_HEALTH_CHECKS': True,
+    }
+
+# Ensure default database is set up first, its connections
+# keep the global CONN_MAX_AGE of django
 DATABASES = {
-    'default': get_default_db_config(),  # Make sure the default DB config is applied
+    'default': get_default_db_config(),
 }
 
-# # Add organization-specific configurations dynamically
-# for org_slug in get_organization_slugs():
-#     db_alias = f"db_{org_slug}"
-#     DATABASES[db_alias] = get_organization_db(org_slug)  # Organization-specific configurations
+# Add organization-specific configurations dynamically,
+# the data of the organizations is routed by openwisp_utils.routers
+for org_slug in get_organization_slugs():
+    if org_slug in ('default', 'replica'):
+        continue
+    org_config = get_organization_db(org_slug)
+    if org_config == get_default_db_config():
+        # incomplete configuration: the organization uses the default database
+        continue
+    DATABASES[f"db_{org_slug}"] = {**org_config, **get_connection_options()}
+
+# Read-only replica of the default database (REPLICA_DB_* variables),
+# used by the views and tasks which opt in, see openwisp_utils.routers
+if env('REPLICA_DB_NAME', default=None):
+    DATABASES['replica'] = {
+        **get_organization_db_config('replica'),
+        **get_connection_options(),
+        # the tests read the data written in the default database
+        'TEST': {'MIRROR': 'default'},
+    }
 
 # Logging for debugging
 logger.info("DATABASES configured: %s", DATABASES)
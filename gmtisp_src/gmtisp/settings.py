@@ -96,6 +96,7 @@ LOGIN_REDIRECT_URL = '/dashboard/'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'openwisp_utils.routers.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # for serving static files
@@ -107,9 +108,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'djangosaml2.middleware.SamlSessionMiddleware',
     'openwisp_users.middleware.PasswordExpirationMiddleware',
+    'openwisp_users.tenancy.TenancyContextMiddleware',
 ]
 if DEBUG:
     MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+# records the queries, cache lookups and latency of each view,
+# see /api/v1/instrumentation/ (staff users only)
+if env.bool('INSTRUMENTATION', default=False):
+    MIDDLEWARE.insert(0, 'openwisp_utils.instrumentation.InstrumentationMiddleware')
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'openwisp_users.password_validation.PasswordReuseValidator'}
@@ -148,6 +154,13 @@ TEMPLATES = [
         },
     }
 ]
+# templates are compiled once per process and kept in memory,
+# the wsgi/asgi workers compile all of them when they boot
+TEMPLATE_CACHE = env.bool('TEMPLATE_CACHE', default=not DEBUG)
+if TEMPLATE_CACHE:
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', TEMPLATES[0]['OPTIONS']['loaders']),
+    ]
 
 SAML_ALLOWED_HOSTS = []
 SAML_USE_NAME_ID_AS_USERNAME = True
@@ -177,6 +190,22 @@ try:
 except ImportError:
     raise
 
+# the accounting data of the organizations which have
+# a "db_<slug>" database is stored in their database, the
+# views and tasks which opt in read from the replica if configured
+DATABASE_ROUTERS = [
+    'openwisp_utils.routers.OrganizationRouter',
+    'openwisp_utils.routers.ReplicaRouter',
+]
+# seconds during which the clients which wrote read from the primary
+OPENWISP_REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', default=5)
+if TESTING:
+    # database of the organization with slug "tenant", used by the routing tests
+    DATABASES['db_tenant'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+
 
 # ---------------------------------------------- logging
 LOGGING = {
@@ -359,6 +388,7 @@ else:
     OPENWISP_RADIUS_GROUPREPLY_ADMIN = True
     OPENWISP_RADIUS_USERGROUP_ADMIN = True
     OPENWISP_RADIUS_USER_ADMIN_RADIUSTOKEN_INLINE = True
+    OPENWISP_RADIUS_MONITORING_BATCH_ACCOUNTING_METRICS = False
     CELERY_TASK_ALWAYS_EAGER = True
     CELERY_TASK_EAGER_PROPAGATES = True
     CELERY_BROKER_URL = 'memory://'
@@ -406,6 +436,21 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': crontab(hour=1, minute=50),
         'relative': True,
     },
+    'flush_user_activity': {
+        'task': 'openwisp_radius.tasks.flush_user_activity',
+        'schedule': crontab(minute='*'),
+        'relative': True,
+    },
+    'process_pending_payment_events': {
+        'task': 'gmtisp_billing.tasks.process_pending_payment_events',
+        'schedule': crontab(minute='*/5'),
+        'relative': True,
+    },
+    'aggregate_usage': {
+        'task': 'gmtisp_billing.tasks.aggregate_usage',
+        'schedule': crontab(minute='*/10'),
+        'relative': True,
+    },
 }
 
 # ---------------------------------------------- Caching
@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gmtisp.settings")
 
 application = get_wsgi_application()
+
+if getattr(settings, 'TEMPLATE_CACHE', False):
+    # compiles the templates before the worker serves the first request
+    from openwisp_utils.template_cache import warmup_templates
+
+    warmup_templates()